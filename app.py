@@ -5,7 +5,9 @@ import config
 from routes.auth import auth_bp
 from routes.plans import plans_bp
 from routes.biography import biography_bp
-from sqlalchemy.sql import text
+from db import WRITE_ENGINE
+import migrations
+from services import scoring_queue, generation_jobs, db_metrics, auth, passwords, question_bank
 
 print("OPENAI_API_KEY:", config.OPENAI_API_KEY)
 # 初始化 Flask 應用
@@ -17,6 +19,9 @@ app.config["SECRET_KEY"] = config.SECRET_KEY
 # 初始化 CORS，允許特定來源
 CORS(app, resources={r"/*": {"origins": ["http://localhost:5000", "http://127.0.0.1:5000"]}})
 
+# 每個請求的 SQL 陳述式計數（X-SQL-Statements）
+db_metrics.init_app(app)
+
 # 初始化快取
 cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
 cache.clear()
@@ -25,13 +30,24 @@ app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(plans_bp, url_prefix='/plans')
 app.register_blueprint(biography_bp, url_prefix='/biography')
 
-# 初始化資料庫
+# 初始化資料庫（WAL 等 PRAGMA 由 db.py 在每條連線建立時套用）
 def setup_database():
-    with config.ENGINE.connect() as conn:
-        conn.execute(text("PRAGMA journal_mode=WAL"))
-        print("WAL mode enabled")
+    for name in migrations.migrate(WRITE_ENGINE):
+        print(f"Applied migration {name}")
 setup_database()
 
+# 密碼雜湊 process pool 需在任何背景執行緒啟動前 fork
+passwords.start_pool()
+
+# 啟動背景評分與自傳生成 worker（每個 gunicorn worker 各自一組）
+if config.ASYNC_SCORING:
+    scoring_queue.start_workers()
+generation_jobs.start_workers()
+# 其他 worker / 主機登出的 token 定期同步到本 process 的撤銷清單
+auth.start_revocation_sync()
+# 題庫範本的品質統計定期同步到本 process
+question_bank.start_stats_sync()
+
 @app.route('/')
 def hello():
     return render_template('index.html')
@@ -0,0 +1,113 @@
+# benchmarks/bench_auth.py
+"""
+JWT 驗證的每請求成本
+--------------------------------------------------
+比較舊的 token_required（每次 jwt.decode）與 services.auth（LRU 快取 + 撤銷清單）：
+- verify：單純函式呼叫的平均微秒數（冷快取 / 熱快取）
+- request：Flask test client 打一個受保護的空端點，含路由與 JSON 回應的完整成本
+    python benchmarks/bench_auth.py --tokens 1000 --rounds 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from functools import wraps
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bench_auth_")
+os.environ["DATABASE"] = os.path.join(_tmp, "bench.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-with-enough-length-for-hs256")
+
+import jwt  # noqa: E402
+from flask import Flask, jsonify, request  # noqa: E402
+
+import config  # noqa: E402
+from services import auth  # noqa: E402
+
+
+def legacy_token_required(f):
+    """舊版 routes/biography.py 的 token_required"""
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token or not token.startswith('Bearer '):
+            return jsonify({"error": "Token is missing"}), 401
+        try:
+            token = token.split(" ")[1]
+            payload = jwt.decode(token, config.SECRET_KEY, algorithms=["HS256"])
+            request.user_id = payload['user_id']
+        except jwt.ExpiredSignatureError:
+            return jsonify({"error": "Token has expired"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "Invalid token"}), 401
+        return f(*args, **kwargs)
+    return decorator
+
+
+def make_app() -> Flask:
+    app = Flask(__name__)
+
+    @app.route("/legacy")
+    @legacy_token_required
+    def legacy():
+        return jsonify({"user_id": request.user_id})
+
+    @app.route("/cached")
+    @auth.token_required
+    def cached():
+        return jsonify({"user_id": request.user_id})
+
+    return app
+
+
+def per_call_us(fn, tokens, rounds: int) -> float:
+    picks = [random.choice(tokens) for _ in range(rounds)]
+    start = time.perf_counter()
+    for token in picks:
+        fn(token)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1000, help="輪詢中的不同使用者 token 數")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    tokens = [auth.issue_token(uid) for uid in range(1, args.tokens + 1)]
+
+    legacy_us = per_call_us(lambda t: jwt.decode(t, config.SECRET_KEY, algorithms=["HS256"]), tokens, args.rounds)
+    cold_start = time.perf_counter()
+    for token in tokens:
+        auth.verify(token)
+    cold_us = (time.perf_counter() - cold_start) / len(tokens) * 1e6
+    warm_us = per_call_us(auth.verify, tokens, args.rounds)
+
+    print(f"{'verify':<24}{'µs/call':>10}")
+    print(f"{'jwt.decode (legacy)':<24}{legacy_us:>10.2f}")
+    print(f"{'auth.verify cold':<24}{cold_us:>10.2f}")
+    print(f"{'auth.verify warm':<24}{warm_us:>10.2f}{legacy_us / warm_us:>9.1f}x")
+
+    client = make_app().test_client()
+    headers = [{"Authorization": f"Bearer {t}"} for t in tokens]
+    rounds = max(args.rounds // 10, 1)
+    results = {}
+    for path in ("/legacy", "/cached"):
+        picks = [random.choice(headers) for _ in range(rounds)]
+        start = time.perf_counter()
+        for h in picks:
+            assert client.get(path, headers=h).status_code == 200
+        results[path] = (time.perf_counter() - start) / rounds * 1e6
+    print()
+    print(f"{'request':<24}{'µs/request':>10}")
+    print(f"{'legacy token_required':<24}{results['/legacy']:>10.1f}")
+    print(f"{'auth.token_required':<24}{results['/cached']:>10.1f}"
+          f"  (auth overhead saved ≈ {results['/legacy'] - results['/cached']:.1f} µs)")
+
+
+if __name__ == "__main__":
+    main()
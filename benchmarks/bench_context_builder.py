@@ -0,0 +1,109 @@
+# benchmarks/bench_context_builder.py
+"""
+自傳 prompt 大小與摘要快取
+--------------------------------------------------
+合成一位答完全部題目的使用者（THEMES × 3 個故事 × 6 題），以假的 OpenAI client 比較：
+- legacy：舊的 build_prompt，逐字串接所有問答
+- budgeted：context_builder 依 CONTEXT_TOKEN_BUDGET 整理後的素材
+並記錄第一次生成、重複生成、只修改一則回答後再生成時需要的摘要呼叫數與耗時。
+    python benchmarks/bench_context_builder.py --answer-chars 300 --budget 6000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bench_context_")
+os.environ["LLM_CACHE_DB"] = os.path.join(_tmp, "llm_cache.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+THEMES = ["童年", "教育", "職業", "家庭", "夢想"]
+STORIES_PER_THEME = 3
+QUESTIONS_PER_STORY = 6
+
+
+class StubOpenAI:
+    """chat.completions.create 睡 latency 秒後回傳長度約為 max_tokens 的摘要"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, max_tokens=200, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        content = "摘要" * (max_tokens // 3)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def make_qa_data(answer_chars: int) -> list[dict]:
+    rng = random.Random(0)
+    data = []
+    for theme in THEMES:
+        for story in range(1, STORIES_PER_THEME + 1):
+            for i in range(QUESTIONS_PER_STORY):
+                data.append({
+                    "theme": theme,
+                    "story_id": story,
+                    "question": f"{theme}故事{story}的第{i + 1}個問題是什麼？",
+                    "answer": "".join(rng.choice("我記得那年夏天在台南外婆家門口的榕樹下") for _ in range(answer_chars)),
+                    "image_path": "static/uploads/photo.jpg" if i == 0 else None,
+                    "detail_score": rng.random(),
+                    "emotion_score": rng.random(),
+                    "reflection_score": rng.random(),
+                    "redundancy": rng.random() * 0.8,
+                })
+    return data
+
+
+def legacy_qa_text(qa_data: list[dict]) -> str:
+    """舊版 build_prompt 的串接方式"""
+    qa_text = ""
+    for qa in qa_data:
+        qa_text += f"主題：{qa['theme']}\n問題：{qa['question']}\n回答：{qa['answer']}\n"
+        if qa['image_path']:
+            qa_text += f"相關圖片：{qa['image_path']}\n"
+        qa_text += "\n"
+    return qa_text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answer-chars", type=int, default=300, help="每則回答的字數")
+    parser.add_argument("--budget", type=int, default=6000, help="CONTEXT_TOKEN_BUDGET")
+    parser.add_argument("--latency", type=float, default=0.5, help="模擬每次摘要呼叫的秒數")
+    args = parser.parse_args()
+
+    from services import context_builder, llm
+    stub = StubOpenAI(args.latency)
+    llm._client = stub
+
+    qa_data = make_qa_data(args.answer_chars)
+    legacy_tokens = context_builder.count_tokens(legacy_qa_text(qa_data))
+    tokenizer = "tiktoken" if context_builder._ENCODING is not None else "heuristic"
+    print(f"questions={len(qa_data)} answer_chars={args.answer_chars} budget={args.budget} tokenizer={tokenizer}")
+    print(f"{'run':<22}{'tokens':>8}{'summaries':>11}{'seconds':>9}")
+    print(f"{'legacy (no budget)':<22}{legacy_tokens:>8}{0:>11}{0:>9.2f}")
+
+    def run(label: str):
+        calls = stub.calls
+        start = time.perf_counter()
+        context = context_builder.build_context(qa_data, budget=args.budget)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22}{context_builder.count_tokens(context):>8}{stub.calls - calls:>11}{elapsed:>9.2f}")
+
+    run("budgeted, cold")
+    run("budgeted, repeat")
+    qa_data[0]["answer"] += "後來我才知道那是最後一次。"
+    run("one answer edited")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/bench_db_locking.py
+"""
+SQLite 鎖競爭負載測試
+--------------------------------------------------
+模擬 gunicorn 多個 worker process × 多執行緒同時讀寫，比較：
+- legacy：舊 config.py 的單一 engine（pool_size=5, max_overflow=10, ?timeout=N），讀寫共用
+- tuned ：db.make_engines 的讀寫分離連線池、每連線 PRAGMA 與 BEGIN IMMEDIATE
+統計 database is locked 錯誤數、讀寫吞吐量與 p95 延遲。
+    python benchmarks/bench_db_locking.py --processes 4 --threads 16 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WRITE_RATIO = 0.3
+
+
+def _write(engine, text, user_id: int, hold: float) -> None:
+    """仿 submit_answer 寫入階段：回答、進度、下一題、題數，交易中夾雜 Python 處理時間"""
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO answers (user_id, question_id, answer, length) VALUES (:uid, 1, 'x', 1)"),
+            {"uid": user_id},
+        )
+        time.sleep(hold)
+        conn.execute(
+            text("""INSERT INTO user_progress (user_id, answer_count, total_length) VALUES (:uid, 1, 1)
+                     ON CONFLICT (user_id) DO UPDATE SET answer_count = answer_count + 1"""),
+            {"uid": user_id},
+        )
+        conn.execute(
+            text("""INSERT INTO questions (user_id, content, question_order, theme, story_id)
+                     VALUES (:uid, 'q', 1, '童年', 1)"""),
+            {"uid": user_id},
+        )
+
+
+def _read(engine, text, user_id: int) -> None:
+    with engine.connect() as conn:
+        conn.execute(
+            text("SELECT answer_count, total_length FROM user_progress WHERE user_id = :uid"), {"uid": user_id}
+        ).fetchall()
+        conn.execute(
+            text("SELECT id, content FROM questions WHERE user_id = :uid ORDER BY id DESC LIMIT 1"), {"uid": user_id}
+        ).fetchall()
+
+
+def _worker(mode: str, path: str, args, results) -> None:
+    import threading
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.sql import text
+
+    if mode == "legacy":
+        write_engine = read_engine = create_engine(
+            f"sqlite:///{path}?timeout={args.busy_timeout}", pool_size=5, max_overflow=10
+        )
+    else:
+        os.environ["SQLITE_BUSY_TIMEOUT_MS"] = str(int(args.busy_timeout * 1000))
+        import db
+        write_engine, read_engine = db.make_engines(f"sqlite:///{path}")
+
+    stats = {"locked": 0, "other_errors": 0, "writes": [], "reads": [], "lock": threading.Lock()}
+    deadline = time.time() + args.seconds
+
+    def run():
+        rnd = random.Random()
+        while time.time() < deadline:
+            user_id = rnd.randint(1, 1000)
+            is_write = rnd.random() < WRITE_RATIO
+            start = time.perf_counter()
+            try:
+                if is_write:
+                    _write(write_engine, text, user_id, args.hold)
+                else:
+                    _read(read_engine, text, user_id)
+            except OperationalError as e:
+                with stats["lock"]:
+                    stats["locked" if "database is locked" in str(e) else "other_errors"] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with stats["lock"]:
+                stats["writes" if is_write else "reads"].append(elapsed)
+
+    threads = [threading.Thread(target=run) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put({k: v for k, v in stats.items() if k != "lock"})
+
+
+def run_mode(mode: str, args) -> dict:
+    from sqlalchemy import create_engine
+    import migrations
+
+    path = os.path.join(tempfile.mkdtemp(prefix=f"bench_lock_{mode}_"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.migrate(engine)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_worker, args=(mode, path, args, results)) for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    writes = [w for c in collected for w in c["writes"]]
+    reads = [r for c in collected for r in c["reads"]]
+    return {
+        "locked": sum(c["locked"] for c in collected),
+        "other_errors": sum(c["other_errors"] for c in collected),
+        "writes_per_s": len(writes) / args.seconds,
+        "reads_per_s": len(reads) / args.seconds,
+        "write_p95_ms": _p95(writes),
+        "read_p95_ms": _p95(reads),
+    }
+
+
+def _p95(samples: list[float]) -> float:
+    if not samples:
+        return 0
+    return statistics.quantiles(samples, n=20)[-1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4, help="模擬 gunicorn worker 數")
+    parser.add_argument("--threads", type=int, default=16, help="每個 process 的並行請求數")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--hold", type=float, default=0.002, help="寫入交易中的處理時間（秒）")
+    parser.add_argument("--busy-timeout", type=float, default=1.0, help="兩種模式共用的 busy timeout（秒）")
+    args = parser.parse_args()
+
+    rows = [(mode, run_mode(mode, args)) for mode in ("legacy", "tuned")]
+    print(f"{'mode':<8}{'locked':>8}{'other':>7}{'writes/s':>10}{'reads/s':>10}{'write p95':>12}{'read p95':>11}")
+    for mode, r in rows:
+        print(f"{mode:<8}{r['locked']:>8}{r['other_errors']:>7}{r['writes_per_s']:>10.0f}{r['reads_per_s']:>10.0f}"
+              f"{r['write_p95_ms']:>10.1f}ms{r['read_p95_ms']:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
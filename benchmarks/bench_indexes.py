@@ -0,0 +1,124 @@
+# benchmarks/bench_indexes.py
+"""
+熱門查詢的索引前後比較
+--------------------------------------------------
+建立合成資料庫（預設 10 萬名使用者），先只套用到 0002（無索引），
+量測各查詢的 EXPLAIN QUERY PLAN 與平均耗時，再套用 0003 索引後重測。
+    python benchmarks/bench_indexes.py --users 100000 --samples 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import migrations  # noqa: E402
+
+THEMES = ["童年", "教育", "職業", "家庭", "夢想"]
+
+QUERIES = {
+    "theme_history": """
+        SELECT a.answer FROM answers a JOIN questions q ON a.question_id = q.id
+        WHERE a.user_id = :uid AND q.theme = :thm AND a.question_id <> :qid ORDER BY a.id""",
+    "theme_count": "SELECT COUNT(*) FROM questions WHERE user_id = :uid AND theme = :thm",
+    "story_count": "SELECT COUNT(*) FROM questions WHERE user_id = :uid AND theme = :thm AND story_id = :sid",
+    "latest_question": "SELECT id, content FROM questions WHERE user_id = :uid ORDER BY id DESC LIMIT 1",
+    "progress_count": "SELECT COUNT(*) FROM answers WHERE user_id = :uid",
+    "progress_sum": "SELECT COALESCE(SUM(length), 0) FROM answers WHERE user_id = :uid",
+    "preview": "SELECT id, content FROM biographies WHERE user_id = :uid ORDER BY created_at DESC LIMIT 1",
+    "qa_data": """
+        SELECT q.theme, q.content, a.answer, ai.image_path FROM questions q
+        LEFT JOIN answers a ON q.id = a.question_id AND a.user_id = :uid
+        LEFT JOIN answer_images ai ON ai.question_id = q.id AND ai.user_id = :uid
+        WHERE q.user_id = :uid ORDER BY q.question_order""",
+}
+
+
+def populate(path: str, users: int, per_user: int) -> None:
+    conn = sqlite3.connect(path)
+    base = datetime(2025, 1, 1)
+    qid = 0
+    questions, answers, bios = [], [], []
+    for uid in range(1, users + 1):
+        for order in range(1, per_user + 1):
+            qid += 1
+            theme = THEMES[(order - 1) // 6 % len(THEMES)]
+            questions.append((qid, uid, f"問題 {order}", order, theme, (order - 1) // 3 + 1))
+            answers.append((uid, qid, f"使用者 {uid} 的第 {order} 個回答", 20))
+        bios.append((uid, f"使用者 {uid} 的自傳", "自然", "中文", base + timedelta(minutes=uid)))
+        if len(questions) >= 50000:
+            _flush(conn, questions, answers, bios)
+    _flush(conn, questions, answers, bios)
+    conn.close()
+
+
+def _flush(conn, questions, answers, bios) -> None:
+    conn.executemany(
+        "INSERT INTO questions (id, user_id, content, question_order, theme, story_id) VALUES (?, ?, ?, ?, ?, ?)",
+        questions)
+    conn.executemany("INSERT INTO answers (user_id, question_id, answer, length) VALUES (?, ?, ?, ?)", answers)
+    conn.executemany(
+        "INSERT INTO biographies (user_id, content, style, language, created_at) VALUES (?, ?, ?, ?, ?)", bios)
+    conn.commit()
+    questions.clear()
+    answers.clear()
+    bios.clear()
+
+
+def measure(path: str, sample_users: list[int], per_user: int) -> dict:
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, sql in QUERIES.items():
+        params = {"uid": sample_users[0], "thm": THEMES[0], "sid": 1, "qid": 1}
+        plan = " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        timings = []
+        for uid in sample_users:
+            params = {"uid": uid, "thm": THEMES[0], "sid": 1, "qid": (uid - 1) * per_user + 1}
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (statistics.mean(timings), plan)
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--questions-per-user", type=int, default=6)
+    parser.add_argument("--samples", type=int, default=50, help="每個查詢抽樣的使用者數")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_idx_"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.migrate(engine, target=2)
+
+    start = time.perf_counter()
+    populate(path, args.users, args.questions_per_user)
+    print(f"populated {args.users} users in {time.perf_counter() - start:.1f}s ({path})")
+
+    sample_users = random.sample(range(1, args.users + 1), min(args.samples, args.users))
+    before = measure(path, sample_users, args.questions_per_user)
+    migrations.migrate(engine)
+    after = measure(path, sample_users, args.questions_per_user)
+
+    print(f"{'query':<16}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in QUERIES:
+        b, a = before[name][0], after[name][0]
+        print(f"{name:<16}{b:>12.3f}{a:>12.3f}{b / a if a else float('inf'):>9.0f}x")
+    print()
+    for name in QUERIES:
+        print(f"{name}\n  before: {before[name][1]}\n  after:  {after[name][1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_login_burst.py
+"""
+登入尖峰對其他 API 的影響
+--------------------------------------------------
+以多條執行緒連續打 /auth/login，同時量測 /biography/next-question 的延遲，
+比較雜湊在請求執行緒內計算（PASSWORD_HASH_WORKERS=0，舊行為）與放進 process pool。
+每種模式在獨立子 process 中執行（設定於 import 時讀取）。
+    python benchmarks/bench_login_burst.py --logins 16 --seconds 5 --hash-workers 2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _probe(client, headers, seconds: float) -> list[float]:
+    latencies = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        assert client.get("/biography/next-question", headers=headers).status_code == 200
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> dict:
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": statistics.quantiles(latencies, n=20)[-1] * 1000,
+        "requests": len(latencies),
+    }
+
+
+def child(args) -> None:
+    tmp = tempfile.mkdtemp(prefix="bench_login_")
+    os.environ.update(
+        DATABASE=os.path.join(tmp, "bench.db"),
+        LLM_CACHE_DB=os.path.join(tmp, "llm_cache.db"),
+        SECRET_KEY="bench-secret-key-with-enough-length-for-hs256",
+        OPENAI_API_KEY="sk-bench",
+    )
+    from app import app
+
+    client = app.test_client()
+    assert client.post("/auth/register", json={"email": "probe@bench.local", "password": "pw"}).status_code == 201
+    for i in range(args.logins):
+        client.post("/auth/register", json={"email": f"user{i}@bench.local", "password": "pw"})
+    token = client.post("/auth/login", json={"email": "probe@bench.local", "password": "pw"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    baseline = _probe(client, headers, args.seconds)
+
+    stop = threading.Event()
+    logins = [0]
+    lock = threading.Lock()
+
+    def login_loop(i):
+        while not stop.is_set():
+            r = client.post("/auth/login", json={"email": f"user{i}@bench.local", "password": "pw"})
+            if r.status_code == 200:
+                with lock:
+                    logins[0] += 1
+
+    threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(args.logins)]
+    for t in threads:
+        t.start()
+    start = time.perf_counter()
+    burst = _probe(client, headers, args.seconds)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in threads:
+        t.join()
+
+    print(json.dumps({
+        "baseline": _summary(baseline),
+        "burst": _summary(burst),
+        "logins_per_s": logins[0] / elapsed,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=16, help="同時登入的執行緒數")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    rows = []
+    for mode, workers in (("inline", 0), ("pool", args.hash_workers)):
+        env = dict(os.environ, PASSWORD_HASH_WORKERS=str(workers))
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", "--logins", str(args.logins), "--seconds", str(args.seconds)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        rows.append((mode, json.loads(out.strip().splitlines()[-1])))
+
+    print(f"{'mode':<8}{'idle p50':>10}{'idle p95':>10}{'burst p50':>11}{'burst p95':>11}{'logins/s':>10}")
+    for mode, r in rows:
+        print(f"{mode:<8}{r['baseline']['p50_ms']:>8.1f}ms{r['baseline']['p95_ms']:>8.1f}ms"
+              f"{r['burst']['p50_ms']:>9.1f}ms{r['burst']['p95_ms']:>9.1f}ms{r['logins_per_s']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
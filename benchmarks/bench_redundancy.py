@@ -0,0 +1,85 @@
+# benchmarks/bench_redundancy.py
+"""
+回答重複度：difflib vs MinHash
+--------------------------------------------------
+合成長篇中文回答，比較每次提交回答時計算重複度的成本：
+- difflib last：舊做法，只和前一則回答做 SequenceMatcher
+- difflib all：同樣的方法比對所有既有回答（舊做法要涵蓋完整歷史的成本）
+- minhash：算新回答的簽章，再與已存的簽章一次比對（services/redundancy.py）
+並以「改寫最早一則回答」的新回答檢查各方法是否偵測得到重複。
+    python benchmarks/bench_redundancy.py --chars 1500 --history 10 50 100
+"""
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services import redundancy  # noqa: E402
+
+_vocab_rng = random.Random(1)
+_CHARS = [chr(c) for c in _vocab_rng.sample(range(0x4E00, 0x9FA6), 2500)]  # 常用字數量級
+WORDS = ["".join(_vocab_rng.choices(_CHARS, k=_vocab_rng.choice((1, 2, 2, 2, 3)))) for _ in range(8000)]
+PUNCTUATION = "，，，。！"
+
+
+def make_answer(rng: random.Random, chars: int) -> str:
+    out = []
+    length = 0
+    while length < chars:
+        piece = rng.choice(WORDS) + (rng.choice(PUNCTUATION) if rng.random() < 0.15 else "")
+        out.append(piece)
+        length += len(piece)
+    return "".join(out)
+
+
+def paraphrase(rng: random.Random, text: str, ratio: float = 0.15) -> str:
+    """隨機替換約 ratio 比例的詞，模擬換句話說重講同一件事"""
+    pieces = [text[i:i + 2] for i in range(0, len(text), 2)]
+    for i in range(len(pieces)):
+        if rng.random() < ratio:
+            pieces[i] = rng.choice(WORDS)
+    return "".join(pieces)
+
+
+def timed(fn, repeat: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = fn()
+    return (time.perf_counter() - start) / repeat * 1000, value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chars", type=int, default=1500, help="每則回答的字數")
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 50, 100], help="既有回答數")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"answer_chars={args.chars} shingle={redundancy.SHINGLE} num_perm={redundancy.NUM_PERM}")
+    print(f"{'history':>8}  {'method':<14}{'ms/answer':>11}{'repeat_of_oldest':>18}{'fresh':>8}")
+    for n in args.history:
+        history = [make_answer(rng, args.chars) for _ in range(n)]
+        signatures = [redundancy.signature(text) for text in history]  # 已存於 answers.minhash
+        repeated = paraphrase(rng, history[0])
+        fresh = make_answer(rng, args.chars)
+
+        methods = {
+            "difflib last": lambda text: difflib.SequenceMatcher(None, text, history[-1]).ratio(),
+            "difflib all": lambda text: max(difflib.SequenceMatcher(None, text, h).ratio() for h in history),
+            "minhash": lambda text: redundancy.score(redundancy.signature(text), signatures),
+        }
+        for name, method in methods.items():
+            repeat = 1 if name == "difflib all" else args.repeat
+            ms, hit = timed(lambda: method(repeated), repeat)
+            miss = method(fresh)
+            print(f"{n:>8}  {name:<14}{ms:>11.2f}{hit:>18.2f}{miss:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
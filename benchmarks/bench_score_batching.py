@@ -0,0 +1,115 @@
+# benchmarks/bench_score_batching.py
+"""
+LLM 評分：逐段呼叫 vs 微批次
+--------------------------------------------------
+多個執行緒（模擬同一 worker 內不同使用者的請求或背景評分執行緒）同時呼叫 follow_up.score_answer，
+假的 OpenAI client 延遲 = 固定往返 + 每段回答約 20 個輸出 token 的生成時間，
+同時呼叫數受 LLM_MAX_CONCURRENCY 限制。比較 SCORE_BATCH_WINDOW=0（逐段）與開啟微批次的
+吞吐量、p50 / p95 與 LLM 呼叫數；--bad-json 讓部分批次回應無法解析以檢查退回逐段評分。
+    python benchmarks/bench_score_batching.py --threads 32 --answers 256 --window 0.05
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bench_score_batching_")
+os.environ["LLM_CACHE_DB"] = os.path.join(_tmp, "llm_cache.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+SCORE = {"detail": 0.7, "emotion": 0.6, "reflection": 0.5}
+
+
+class StubOpenAI:
+    def __init__(self, base: float, per_token: float, bad_json: float):
+        self.base = base
+        self.per_token = per_token
+        self.bad_json = bad_json
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        n = prompt.count("<answer id=")
+        with self._lock:
+            self.calls += 1
+            bad = n and self._rng.random() < self.bad_json
+        time.sleep(self.base + max(n, 1) * 20 * self.per_token)
+        if not n:
+            content = json.dumps(SCORE)
+        elif bad:
+            content = "抱歉，以下是評分：" + json.dumps([SCORE] * n)
+        else:
+            content = json.dumps([SCORE] * n)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def run(follow_up, stub, window: float, threads: int, answers: int, offset: int) -> dict:
+    follow_up._BATCHER = follow_up._ScoreBatcher(
+        window, follow_up.config.SCORE_BATCH_MAX, idle_below=follow_up._BATCHER.idle_below
+    )
+    texts = [f"第 {offset + i} 則回答：我小時候住在台南外婆家，門口有一棵大榕樹。" for i in range(answers)]
+    latencies = []
+    lock = threading.Lock()
+    calls = stub.calls
+
+    def worker(chunk):
+        for text in chunk:
+            start = time.perf_counter()
+            assert follow_up.score_answer(text) == (0.7, 0.6, 0.5)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(texts[i::threads],)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": answers / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "calls": stub.calls - calls,
+        "fallbacks": follow_up._BATCHER.fallbacks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32, help="同時評分的執行緒數")
+    parser.add_argument("--answers", type=int, default=256)
+    parser.add_argument("--window", type=float, default=0.05, help="SCORE_BATCH_WINDOW（秒）")
+    parser.add_argument("--base", type=float, default=0.5, help="每次呼叫的固定往返秒數")
+    parser.add_argument("--per-token", type=float, default=0.01, help="每個輸出 token 的生成秒數")
+    parser.add_argument("--bad-json", type=float, default=0.0, help="批次回應無法解析的比例")
+    args = parser.parse_args()
+
+    import config
+    from services import follow_up, llm
+    stub = StubOpenAI(args.base, args.per_token, args.bad_json)
+    llm._client = stub
+
+    print(f"threads={args.threads} answers={args.answers} max_concurrency={config.LLM_MAX_CONCURRENCY} "
+          f"batch_max={config.SCORE_BATCH_MAX} bad_json={args.bad_json}")
+    print(f"{'mode':<14}{'answers/s':>10}{'p50':>8}{'p95':>8}{'calls':>7}{'fallbacks':>11}")
+    for i, (label, window) in enumerate((("single", 0.0), (f"batch {args.window * 1000:.0f}ms", args.window))):
+        r = run(follow_up, stub, window, args.threads, args.answers, offset=i * args.answers)
+        print(f"{label:<14}{r['throughput']:>10.1f}{r['p50']:>7.2f}s{r['p95']:>7.2f}s{r['calls']:>7}{r['fallbacks']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_sections.py
+"""
+逐故事草稿 + 串接 vs 單一 prompt
+--------------------------------------------------
+合成一位答完全部題目的使用者（THEMES × 3 個故事 × 6 題），以假的 OpenAI client
+（延遲 = 固定往返 + 每個輸出 token 的生成時間）比較兩種 BIOGRAPHY_ENGINE：
+- single：整份問答（依 CONTEXT_TOKEN_BUDGET 整理）放入一個 prompt
+- sections：每個故事平行寫一段，再依主題串接
+各跑第一次生成、重複生成、只修改一則回答後再生成，記錄耗時、呼叫數與送出 / 產生的 token 數。
+假 client 產生的長度：prompt 指定「約 N 字」時為 N token，否則為 max_tokens。
+    python benchmarks/bench_sections.py --answer-chars 300 --per-token 0.01
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bench_sections_")
+os.environ["LLM_CACHE_DB"] = os.path.join(_tmp, "llm_cache.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from bench_context_builder import make_qa_data  # noqa: E402
+
+
+class StubOpenAI:
+    """chat.completions.create 依輸出長度模擬生成時間，並累計 token 數"""
+
+    def __init__(self, base: float, per_token: float):
+        self.base = base
+        self.per_token = per_token
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, max_tokens=800, **kwargs):
+        from services.context_builder import count_tokens
+        self.calls += 1
+        self.prompt_tokens += sum(count_tokens(m["content"]) for m in messages)
+        words = re.search(r"約 (\d+) 字", messages[-1]["content"])
+        produced = min(int(words.group(1)), max_tokens) if words else max_tokens
+        self.completion_tokens += produced
+        time.sleep(self.base + produced * self.per_token)
+        content = "段" * produced
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answer-chars", type=int, default=300, help="每則回答的字數")
+    parser.add_argument("--base", type=float, default=0.3, help="每次呼叫的固定往返秒數")
+    parser.add_argument("--per-token", type=float, default=0.01, help="每個輸出 token 的生成秒數")
+    args = parser.parse_args()
+
+    import config
+    from services import biography_writer, llm
+
+    stub = StubOpenAI(args.base, args.per_token)
+    llm._client = stub
+    opts = biography_writer.parse_options({})
+
+    print(f"questions={len(make_qa_data(args.answer_chars))} answer_chars={args.answer_chars} "
+          f"section_max_tokens={config.SECTION_MAX_TOKENS}")
+    print(f"{'engine':<10}{'run':<20}{'seconds':>9}{'calls':>7}{'prompt_tok':>12}{'output_tok':>12}")
+    for engine in ("single", "sections"):
+        config.BIOGRAPHY_ENGINE = engine
+        qa_data = make_qa_data(args.answer_chars)
+        for label in ("cold", "repeat", "one answer edited"):
+            if label == "one answer edited":
+                qa_data[0]["answer"] += "後來我才知道那是最後一次。"
+            calls, sent, produced = stub.calls, stub.prompt_tokens, stub.completion_tokens
+            start = time.perf_counter()
+            biography_writer.write(qa_data, opts)
+            elapsed = time.perf_counter() - start
+            print(f"{engine:<10}{label:<20}{elapsed:>9.2f}{stub.calls - calls:>7}"
+                  f"{stub.prompt_tokens - sent:>12}{stub.completion_tokens - produced:>12}")
+
+
+if __name__ == "__main__":
+    main()
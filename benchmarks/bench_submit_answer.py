@@ -0,0 +1,134 @@
+# benchmarks/bench_submit_answer.py
+"""
+POST /biography/answer 延遲基準測試
+--------------------------------------------------
+以假的 OpenAI client 模擬 gpt-4o 往返延遲，量測 submit_answer 的 p50 / p95。
+陳述式數只列出供參考，預算的回歸檢查在 tests/test_submit_answer_queries.py。
+    python benchmarks/bench_submit_answer.py                # 並行管線
+    python benchmarks/bench_submit_answer.py --sequential   # 模擬舊的逐一呼叫
+    python benchmarks/bench_submit_answer.py --async-scoring  # 評分交給背景佇列
+    python benchmarks/bench_submit_answer.py --async-scoring --prefetch  # 輸入中先送草稿預取追問
+    python benchmarks/bench_submit_answer.py --async-scoring --bank-fraction 0.5  # 一半追問由題庫提供
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bench_answer_")
+os.environ["DATABASE"] = os.path.join(_tmp, "bench.db")
+os.environ["LLM_CACHE_DB"] = os.path.join(_tmp, "llm_cache.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-for-local-runs-only")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+
+class StubOpenAI:
+    """只實作 chat.completions.create，固定睡 latency 秒後回傳。"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.follow_up_calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        time.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        if "請只回 JSON" in prompt:
+            content = '{"detail":0.7,"emotion":0.6,"reflection":0.5}'
+        else:
+            self.follow_up_calls += 1
+            content = "那時候的你內心有什麼感受？這件事後來如何影響你的想法？"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5, help="模擬每次 LLM 往返秒數")
+    parser.add_argument("--users", type=int, default=4, help="同時作答的使用者數")
+    parser.add_argument("--answers", type=int, default=5, help="每位使用者提交的回答數")
+    parser.add_argument("--sequential", action="store_true", help="評分與追問逐一執行（舊行為）")
+    parser.add_argument("--async-scoring", action="store_true", help="評分交給背景佇列，請求只等追問")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="提交前先送出少了結尾的草稿，並等待一次 LLM 往返（模擬使用者繼續輸入）")
+    parser.add_argument("--bank-fraction", type=float, default=0.0, help="QUESTION_BANK_FRACTION，由題庫提供的追問比例")
+    args = parser.parse_args()
+    os.environ["ASYNC_SCORING"] = "1" if args.async_scoring else "0"
+    os.environ["QUESTION_BANK_FRACTION"] = str(args.bank_fraction)
+
+    import config
+    import jwt
+    from services import follow_up, llm
+    stub = StubOpenAI(args.latency)
+    llm._client = stub
+
+    from app import app  # 啟動時自動套用 migrations
+    from routes import biography
+
+    if args.sequential:
+        def sequential(answer, theme, score_history, follow_up_history=None, llm_score=True):
+            metrics = follow_up.evaluate_answer(answer, score_history)
+            next_question = None
+            if follow_up_history is not None:
+                next_question = follow_up.get_next_question(answer, theme, follow_up_history)
+            return metrics, next_question
+        biography.score_and_follow_up = sequential
+
+    latencies = []
+    statements = []
+    lock = threading.Lock()
+
+    def run_user(user_id: int):
+        client = app.test_client()
+        token = jwt.encode(
+            {"user_id": user_id, "exp": datetime.utcnow() + timedelta(hours=1)},
+            config.SECRET_KEY, algorithm="HS256",
+        )
+        headers = {"Authorization": f"Bearer {token}"}
+        qid = client.get("/biography/next-question", headers=headers).get_json()["question"]["id"]
+        for i in range(args.answers):
+            answer = f"我是第 {user_id} 位，小時候住在台南，第 {i} 件難忘的事是和外婆去市場。"
+            if args.prefetch:
+                draft = client.post("/biography/answer/draft", json={"question_id": qid, "draft": answer[:-4]},
+                                    headers=headers)
+                assert draft.status_code == 202, draft.get_json()
+                time.sleep(args.latency + 0.2)  # 輸入時間，不計入延遲
+            start = time.perf_counter()
+            rsp = client.post("/biography/answer", json={"question_id": qid, "answer": answer}, headers=headers)
+            elapsed = time.perf_counter() - start
+            body = rsp.get_json()
+            assert rsp.status_code == 200, body
+            qid = body["question"]["id"]
+            with lock:
+                latencies.append(elapsed)
+                statements.append(int(rsp.headers["X-SQL-Statements"]))
+
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(run_user, range(1, args.users + 1)))
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    mode = "sequential" if args.sequential else "pipelined"
+    if args.async_scoring:
+        mode += "+async-scoring"
+    if args.prefetch:
+        mode += "+prefetch"
+    if args.bank_fraction:
+        mode += f"+bank{args.bank_fraction:g}"
+    print(f"mode={mode} latency={args.latency}s requests={len(latencies)}")
+    print(f"p50={statistics.median(latencies):.3f}s p95={p95:.3f}s max={latencies[-1]:.3f}s")
+    print(f"sql statements per request: max={max(statements)} budget={biography.SUBMIT_ANSWER_MAX_STATEMENTS}")
+    print(f"follow-up LLM calls: {stub.follow_up_calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_transcription.py
+"""
+長錄音轉錄耗時
+--------------------------------------------------
+產生「說話（正弦波）＋短暫靜音」交錯的合成 WAV，以假的 Whisper client
+（延遲 = 固定往返 + 每秒音訊的處理時間）比較：
+- whole：整個檔案一次送出（舊行為）
+- split：依靜音切段後平行轉錄
+- cached：同一檔案再次上傳，命中逐字稿快取
+    python benchmarks/bench_transcription.py --minutes 20 --segment 120 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bench_transcribe_")
+os.environ["LLM_CACHE_DB"] = os.path.join(_tmp, "llm_cache.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["TRANSCRIBER"] = "openai"
+
+RATE = 16000
+
+
+class StubWhisper:
+    """只實作 audio.transcriptions.create，依音訊長度睡眠後回傳"""
+
+    def __init__(self, base: float, per_second: float):
+        self.base = base
+        self.per_second = per_second
+        self.calls = 0
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, file, language):
+        with wave.open(file, "rb") as w:
+            seconds = w.getnframes() / w.getframerate()
+        self.calls += 1
+        time.sleep(self.base + seconds * self.per_second)
+        return SimpleNamespace(text=f"{seconds:.0f}秒。")
+
+
+def make_wav(path: str, minutes: float) -> None:
+    rng = np.random.default_rng(0)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        remaining = minutes * 60
+        while remaining > 0:
+            speech = min(rng.uniform(5, 30), remaining)
+            t = np.arange(int(speech * RATE)) / RATE
+            w.writeframes((0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2").tobytes())
+            pause = rng.uniform(0.5, 2.0)
+            w.writeframes(np.zeros(int(pause * RATE), dtype="<i2").tobytes())
+            remaining -= speech + pause
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=20)
+    parser.add_argument("--segment", type=float, default=120, help="AUDIO_SEGMENT_SECONDS")
+    parser.add_argument("--workers", type=int, default=4, help="AUDIO_TRANSCRIBE_WORKERS")
+    parser.add_argument("--base", type=float, default=0.5, help="每次呼叫的固定往返秒數")
+    parser.add_argument("--per-second", type=float, default=0.01, help="每秒音訊的處理秒數")
+    args = parser.parse_args()
+    os.environ["AUDIO_SEGMENT_SECONDS"] = str(args.segment)
+    os.environ["AUDIO_TRANSCRIBE_WORKERS"] = str(args.workers)
+
+    import config
+    from services import llm, transcription
+
+    stub = StubWhisper(args.base, args.per_second)
+    llm._client = stub
+    path = os.path.join(_tmp, "recording.wav")
+    make_wav(path, args.minutes)
+
+    start = time.perf_counter()
+    llm.transcribe(path, language="zh")
+    whole = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transcription.transcribe(path, "a" * 64, "zh")
+    split = time.perf_counter() - start
+    segments = stub.calls - 1
+
+    start = time.perf_counter()
+    transcription.transcribe(path, "a" * 64, "zh")
+    cached = time.perf_counter() - start
+
+    print(f"audio={args.minutes:.0f}min segment<={config.AUDIO_SEGMENT_SECONDS:.0f}s workers={args.workers}")
+    print(f"{'mode':<8}{'seconds':>10}{'calls':>8}")
+    print(f"{'whole':<8}{whole:>10.2f}{1:>8}")
+    print(f"{'split':<8}{split:>10.2f}{segments:>8}{whole / split:>8.1f}x")
+    print(f"{'cached':<8}{cached:>10.4f}{stub.calls - 1 - segments:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# db.py
+"""
+資料庫連線層
+--------------------------------------------------
+分成寫入與讀取兩組連線池，SQL 本身集中在 repositories/。
+
+SQLite（預設）同一時間只允許一個 writer：
+- WRITE_ENGINE：每個 process 只有 DB_WRITE_POOL_SIZE（預設 1）條連線，
+  寫入在 process 內排隊取連線，而不是一起擠進 SQLite 的 busy handler；
+  交易一律以 BEGIN IMMEDIATE 開始，避免「先讀後寫」升級鎖時直接 database is locked。
+- READ_ENGINE：唯讀（query_only）連線池，WAL 模式下讀取不會被 writer 擋住，
+  /preview、/versions、/progress 等純讀取端點都走這裡。
+每條新連線都透過 connect 事件套用調校過的 PRAGMA。
+
+PostgreSQL：多台 API 主機共用同一個資料庫，寫入端為一般連線池（pre_ping 偵測斷線），
+讀取端可由 DATABASE_READ_URL 指向唯讀副本，並以 default_transaction_read_only 防止誤寫。
+"""
+from __future__ import annotations
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+import config
+
+
+def _apply_pragmas(dbapi_conn, read_only: bool) -> None:
+    cursor = dbapi_conn.cursor()
+    if not read_only:
+        cursor.execute("PRAGMA journal_mode=WAL")  # 寫入端設定一次即持久化於檔案
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # WAL 下 NORMAL 仍可保證一致性，省去每次 commit 的 fsync
+    cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}")  # 負值單位為 KiB
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _make_sqlite_engines(url: str, read_url: str):
+    write_engine = create_engine(
+        url,
+        pool_size=config.DB_WRITE_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+    )
+    read_engine = create_engine(
+        read_url,
+        pool_size=config.DB_READ_POOL_SIZE,
+        max_overflow=config.DB_READ_POOL_SIZE,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+    )
+
+    @event.listens_for(write_engine, "connect")
+    def _on_write_connect(dbapi_conn, _record):
+        # 交給 begin 事件自行下 BEGIN IMMEDIATE（SQLAlchemy 的 pysqlite 建議做法）
+        dbapi_conn.isolation_level = None
+        _apply_pragmas(dbapi_conn, read_only=False)
+
+    @event.listens_for(write_engine, "begin")
+    def _on_write_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(read_engine, "connect")
+    def _on_read_connect(dbapi_conn, _record):
+        _apply_pragmas(dbapi_conn, read_only=True)
+
+    return write_engine, read_engine
+
+
+def _make_postgres_engines(url: str, read_url: str):
+    write_engine = create_engine(
+        url,
+        pool_size=config.DB_WRITE_POOL_SIZE,
+        max_overflow=config.DB_WRITE_POOL_SIZE,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+    )
+    read_engine = create_engine(
+        read_url,
+        pool_size=config.DB_READ_POOL_SIZE,
+        max_overflow=config.DB_READ_POOL_SIZE,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        connect_args={"options": "-c default_transaction_read_only=on"},
+    )
+    return write_engine, read_engine
+
+
+def make_engines(url: str, read_url: str | None = None):
+    """建立 (write_engine, read_engine)；基準測試也用這個函式建立獨立的連線池"""
+    read_url = read_url or url
+    if make_url(url).get_backend_name() == "postgresql":
+        return _make_postgres_engines(url, read_url)
+    return _make_sqlite_engines(url, read_url)
+
+
+WRITE_ENGINE, READ_ENGINE = make_engines(config.DATABASE_URL, config.DATABASE_READ_URL)
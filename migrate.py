@@ -0,0 +1,52 @@
+# migrate.py
+"""
+資料庫遷移工具（取代 inspect_db.py 與 python models/*.py）
+    python migrate.py            # 套用所有尚未執行的遷移
+    python migrate.py --to 2     # 只升級到指定版本
+    python migrate.py --status   # 列出各遷移是否已套用
+    python migrate.py --inspect  # 列出資料表與欄位
+"""
+import argparse
+
+from sqlalchemy import inspect
+
+import migrations
+from db import WRITE_ENGINE
+
+
+def inspect_tables(engine):
+    insp = inspect(engine)
+    print("📋 資料表清單：")
+    for table in insp.get_table_names():
+        print(f"🧱 {table}")
+        for col in insp.get_columns(table):
+            print(f"   {col['name']} ({col['type']})")
+        for idx in insp.get_indexes(table):
+            print(f"   ⚡ {idx['name']} ({', '.join(idx['column_names'])})")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--to", type=int, help="升級到指定版本為止")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--inspect", action="store_true")
+    args = parser.parse_args()
+
+    if args.inspect:
+        inspect_tables(WRITE_ENGINE)
+        return
+    if args.status:
+        done = migrations.applied(WRITE_ENGINE)
+        for version, name in migrations.available():
+            print(f"{'✅' if version in done else '⏳'} {name}")
+        return
+
+    ran = migrations.migrate(WRITE_ENGINE, target=args.to)
+    for name in ran:
+        print(f"🛠️  {name}")
+    print("✅ 資料庫結構已是最新" if not ran else f"✅ 套用 {len(ran)} 個遷移")
+
+
+if __name__ == "__main__":
+    main()
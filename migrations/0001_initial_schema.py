@@ -0,0 +1,110 @@
+# migrations/0001_initial_schema.py
+"""
+初始結構：取代 models/*.py 與 inspect_db.py 的建表 / 補欄位腳本。
+全部使用 IF NOT EXISTS 與欄位檢查，已在使用中的資料庫也能直接套用。
+"""
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+
+from migrations import id_column
+
+
+def _add_columns(conn, table, columns):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    for name, col_type in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}"))
+
+
+def upgrade(conn):
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS users (
+            {id_column(conn)},
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    '''))
+
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS plans (
+            {id_column(conn)},
+            name TEXT NOT NULL,
+            word_limit INTEGER NOT NULL
+        )
+    '''))
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS user_plans (
+            {id_column(conn)},
+            user_id INTEGER NOT NULL,
+            plan_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (plan_id) REFERENCES plans(id)
+        )
+    '''))
+    for plan_id, name, word_limit in [(1, "免費", 500), (2, "進階", 1000), (3, "高級", 0)]:
+        conn.execute(
+            text("INSERT INTO plans (id, name, word_limit) VALUES (:id, :name, :limit) ON CONFLICT (id) DO NOTHING"),
+            {"id": plan_id, "name": name, "limit": word_limit},
+        )
+    if conn.dialect.name == "postgresql":
+        # 明確指定 id 插入不會推進 SERIAL 序列，需手動對齊
+        conn.execute(text("SELECT setval(pg_get_serial_sequence('plans', 'id'), (SELECT MAX(id) FROM plans))"))
+
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS questions (
+            {id_column(conn)},
+            user_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            question_order INTEGER NOT NULL,
+            theme TEXT NOT NULL,
+            story_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    '''))
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS answers (
+            {id_column(conn)},
+            user_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            answer TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (question_id) REFERENCES questions(id)
+        )
+    '''))
+    _add_columns(conn, "questions", [
+        ("follow_up_strategy", "VARCHAR(50)"),
+        ("context_keywords", "TEXT"),
+        ("expected_answer_type", "VARCHAR(20)"),
+    ])
+    _add_columns(conn, "answers", [
+        ("emotion_score", "REAL"),  # 0~1 分數；PostgreSQL 的 INTEGER 會捨入
+        ("completeness_score", "INTEGER"),
+        ("key_entities", "TEXT"),
+        ("detail_score", "REAL"),
+        ("reflection_score", "REAL"),
+        ("redundancy", "REAL"),
+        ("length", "INTEGER"),
+    ])
+
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS answer_images (
+            {id_column(conn)},
+            user_id INTEGER,
+            question_id INTEGER,
+            image_path TEXT,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''))
+
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS biographies (
+            {id_column(conn)},
+            user_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            style TEXT NOT NULL,
+            language TEXT NOT NULL DEFAULT '中文',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    '''))
+    _add_columns(conn, "biographies", [("title", "TEXT")])
@@ -0,0 +1,51 @@
+# migrations/0002_job_queues.py
+"""背景評分佇列與自傳生成工作（原 models/score_job.py、models/generation_job.py）"""
+from sqlalchemy.sql import text
+
+from migrations import id_column
+
+
+def upgrade(conn):
+    # 回答評分佇列：submit_answer 寫入，背景 worker 取出後回填 answers 分數
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS score_jobs (
+            {id_column(conn)},
+            answer_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            answer TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',  -- pending / running / done / failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            not_before TIMESTAMP,  -- 失敗重試前的等待時間，NULL 為立即可領取
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (answer_id) REFERENCES answers(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    '''))
+
+    # 自傳生成工作：提交後由背景 worker 呼叫 LLM，前端以 job id 查詢狀態
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            {id_column(conn)},
+            user_id INTEGER NOT NULL,
+            params TEXT NOT NULL,           -- JSON，parse_options 的結果
+            params_hash TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',  -- queued / running / done / failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            biography_id INTEGER,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (biography_id) REFERENCES biographies(id)
+        )
+    '''))
+    # 同一使用者、同樣參數同時只能有一筆進行中的工作（重複提交去重）
+    conn.execute(text('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_generation_jobs_active
+        ON generation_jobs (user_id, params_hash)
+        WHERE status IN ('queued', 'running')
+    '''))
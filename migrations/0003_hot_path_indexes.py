@@ -0,0 +1,28 @@
+# migrations/0003_hot_path_indexes.py
+"""
+熱門查詢路徑的複合索引
+--------------------------------------------------
+- submit_answer：依 (user_id, theme, story_id) 計數題目、依 user_id + question_id 串接回答
+- next-question：每位使用者最新一題（user_id, id DESC）
+- preview / versions：依 user_id 取 created_at 最新的自傳
+- 背景佇列：依 status 領取工作、依 user_id 計算待評分數
+"""
+from sqlalchemy.sql import text
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_questions_user_theme_story ON questions (user_id, theme, story_id)",
+    "CREATE INDEX IF NOT EXISTS idx_questions_user_id ON questions (user_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_answers_user_question ON answers (user_id, question_id)",
+    "CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id)",
+    "CREATE INDEX IF NOT EXISTS idx_answer_images_user_question ON answer_images (user_id, question_id)",
+    "CREATE INDEX IF NOT EXISTS idx_biographies_user_created ON biographies (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_score_jobs_status ON score_jobs (status, id)",
+    "CREATE INDEX IF NOT EXISTS idx_score_jobs_user_status ON score_jobs (user_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status, id)",
+]
+
+
+def upgrade(conn):
+    for ddl in INDEXES:
+        conn.execute(text(ddl))
+    conn.execute(text("ANALYZE"))
@@ -0,0 +1,47 @@
+# migrations/0004_user_progress.py
+"""
+每位使用者的進度計數，與 answers / questions 的寫入在同一交易中遞增，
+讓 /progress 與 submit_answer 的分支判斷不必再掃描彙總。
+建立時由既有資料回填。
+"""
+from sqlalchemy.sql import text
+
+
+def upgrade(conn):
+    conn.execute(text('''
+        CREATE TABLE IF NOT EXISTS user_progress (
+            user_id INTEGER PRIMARY KEY,
+            answer_count INTEGER NOT NULL DEFAULT 0,
+            scored_count INTEGER NOT NULL DEFAULT 0,   -- 已有三項 LLM 分數的回答數
+            score_sum REAL NOT NULL DEFAULT 0,         -- Σ (detail + emotion + reflection) / 3
+            total_length INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    '''))
+    conn.execute(text('''
+        CREATE TABLE IF NOT EXISTS user_question_counts (
+            user_id INTEGER NOT NULL,
+            theme TEXT NOT NULL,
+            story_id INTEGER NOT NULL,
+            question_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, theme, story_id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    '''))
+
+    conn.execute(text('''
+        INSERT INTO user_progress (user_id, answer_count, scored_count, score_sum, total_length)
+        SELECT user_id,
+               COUNT(*),
+               COUNT((detail_score + emotion_score + reflection_score) / 3),
+               COALESCE(SUM((detail_score + emotion_score + reflection_score) / 3), 0),
+               COALESCE(SUM(length), 0)
+        FROM answers
+        GROUP BY user_id
+    '''))
+    conn.execute(text('''
+        INSERT INTO user_question_counts (user_id, theme, story_id, question_count)
+        SELECT user_id, theme, story_id, COUNT(*)
+        FROM questions
+        GROUP BY user_id, theme, story_id
+    '''))
@@ -0,0 +1,19 @@
+# migrations/0005_user_plans_unique.py
+"""
+每位使用者只保留一筆方案選擇
+--------------------------------------------------
+舊的 INSERT OR REPLACE 沒有可衝突的唯一鍵，每次選擇都多插一列。
+先保留每位使用者最新（id 最大）的一筆，再建立唯一索引，
+讓 PlanRepo.select_for_user 以 ON CONFLICT (user_id) 在兩種資料庫上都能 upsert。
+"""
+from sqlalchemy.sql import text
+
+
+def upgrade(conn):
+    conn.execute(text('''
+        DELETE FROM user_plans
+        WHERE id NOT IN (SELECT MAX(id) FROM user_plans GROUP BY user_id)
+    '''))
+    conn.execute(text('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_user_plans_user ON user_plans (user_id)
+    '''))
@@ -0,0 +1,20 @@
+# migrations/0006_revoked_tokens.py
+"""
+JWT 撤銷清單：登出時寫入 token 的 jti，各 worker 定期同步到記憶體（services/auth.py）。
+expires_at 為 token 的 exp（epoch 秒），過期後的紀錄可刪除。
+"""
+from sqlalchemy.sql import text
+
+from migrations import id_column
+
+
+def upgrade(conn):
+    conn.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            {id_column(conn)},
+            jti TEXT UNIQUE NOT NULL,
+            user_id INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''))
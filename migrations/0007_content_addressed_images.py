@@ -0,0 +1,45 @@
+# migrations/0007_content_addressed_images.py
+"""
+answer_images 改指向以內容雜湊命名的圖片
+--------------------------------------------------
+舊上傳存成 static/uploads/<user>_<question>_<檔名>，同一張圖常被存很多份。
+對每個仍存在的舊檔計算 sha256，建立（或沿用）static/uploads/<sha256>.<副檔名>，
+再把 answer_images.image_path 改成這個路徑。
+舊檔不刪除：已生成的自傳 markdown 仍可能以舊路徑引用，確認不再需要後可手動清除。
+"""
+import hashlib
+import os
+import shutil
+
+from sqlalchemy.sql import text
+
+UPLOAD_DIR = os.path.join("static", "uploads")
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(64 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def upgrade(conn):
+    paths = [row[0] for row in conn.execute(text(
+        "SELECT DISTINCT image_path FROM answer_images WHERE image_path IS NOT NULL"
+    ))]
+    for old in paths:
+        name = os.path.basename(old.replace("\\", "/"))
+        src = os.path.join(UPLOAD_DIR, name)
+        if not name or not os.path.isfile(src):
+            continue
+        ext = os.path.splitext(name)[1].lower() or ".jpg"
+        blob = os.path.join(UPLOAD_DIR, _sha256(src) + ext)
+        if os.path.abspath(blob) == os.path.abspath(src):
+            continue
+        if not os.path.exists(blob):
+            shutil.copyfile(src, blob)
+        conn.execute(
+            text("UPDATE answer_images SET image_path = :new WHERE image_path = :old"),
+            {"new": blob, "old": old},
+        )
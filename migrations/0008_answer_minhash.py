@@ -0,0 +1,73 @@
+# migrations/0008_answer_minhash.py
+"""
+answers.minhash：回答的 MinHash 簽章（services/redundancy.py）
+--------------------------------------------------
+submit_answer 以簽章比對該使用者的所有既有回答，不再讀取歷史回答全文。
+既有回答在此逐個使用者回填簽章，並以同樣的規則重算 redundancy
+（與該使用者先前其他題目回答的最高相似度），舊的 difflib 比值不再與新值混用。
+簽章計算複製自撰寫當時的 services/redundancy.py，
+遷移不匯入應用程式模組，之後修改 redundancy 不會改變這個遷移的結果。
+"""
+import re
+
+import numpy as np
+from sqlalchemy.sql import text
+
+SHINGLE = 2
+NUM_PERM = 128
+CHUNK = 4096
+_WHITESPACE = re.compile(r"\s+")
+_rng = np.random.default_rng(20240521)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype="<u4")
+
+
+def _signature(answer: str) -> np.ndarray:
+    codes = np.frombuffer(_WHITESPACE.sub("", answer).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    mins = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    if codes.size:
+        if codes.size < SHINGLE:
+            codes = np.pad(codes, (0, SHINGLE - codes.size))
+        n = codes.size - SHINGLE + 1
+        hashed = np.zeros(n, dtype=np.uint64)
+        for i in range(SHINGLE):
+            hashed = (hashed << np.uint64(21)) | codes[i:i + n]
+        hashed = np.unique(hashed)
+        for start in range(0, hashed.size, CHUNK):
+            chunk = hashed[start:start + CHUNK]
+            values = (_A[:, None] * chunk[None, :] + _B[:, None]) >> np.uint64(32)
+            np.minimum(mins, values.min(axis=1), out=mins)
+    return mins.astype("<u4")
+
+
+def _redundancy(signatures: np.ndarray, question_ids: list, i: int) -> float:
+    """第 i 則與更早、不同題目的回答中最相似一則的相似度；空集合為 0"""
+    earlier = [j for j in range(i) if question_ids[j] != question_ids[i]]
+    if not earlier or (signatures[i] == _EMPTY).all():
+        return 0.0
+    matrix = signatures[earlier]
+    sims = (matrix == signatures[i]).mean(axis=1)
+    sims[(matrix == _EMPTY).all(axis=1)] = 0.0
+    return float(sims.max())
+
+
+def upgrade(conn):
+    column_type = "BYTEA" if conn.dialect.name == "postgresql" else "BLOB"
+    conn.execute(text(f"ALTER TABLE answers ADD COLUMN minhash {column_type}"))
+
+    user_ids = [row[0] for row in conn.execute(text("SELECT DISTINCT user_id FROM answers ORDER BY user_id"))]
+    for user_id in user_ids:
+        rows = conn.execute(
+            text("SELECT id, question_id, answer FROM answers WHERE user_id = :uid ORDER BY id"),
+            {"uid": user_id},
+        ).fetchall()
+        signatures = np.stack([_signature(row[2] or "") for row in rows])
+        question_ids = [row[1] for row in rows]
+        conn.execute(
+            text("UPDATE answers SET minhash = :sig, redundancy = :red WHERE id = :id"),
+            [
+                {"id": row[0], "sig": signatures[i].tobytes(), "red": _redundancy(signatures, question_ids, i)}
+                for i, row in enumerate(rows)
+            ],
+        )
@@ -0,0 +1,14 @@
+# migrations/0009_answer_score_source.py
+"""
+answers.score_source：三項分數的來源
+--------------------------------------------------
+local 為本地預評分（services/follow_up.prescore），llm 為 gpt-4o 評分，
+fallback 為同步評分時 LLM 失敗改給的中間分數，NULL 為尚未評分。
+既有已評分的回答皆由 LLM 評分，回填為 llm。
+"""
+from sqlalchemy.sql import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE answers ADD COLUMN score_source TEXT"))
+    conn.execute(text("UPDATE answers SET score_source = 'llm' WHERE detail_score IS NOT NULL"))
@@ -0,0 +1,21 @@
+# migrations/0010_question_prefetch.py
+"""
+question_prefetch：使用者輸入中預先產生的候選追問
+--------------------------------------------------
+每位使用者一列，question_id 為草稿所屬的題目，basis 為產生候選時的草稿，
+expires_at 為失效時間（epoch 秒）；新的草稿覆寫舊的候選（services/prefetch.py）。
+"""
+from sqlalchemy.sql import text
+
+
+def upgrade(conn):
+    conn.execute(text('''
+        CREATE TABLE IF NOT EXISTS question_prefetch (
+            user_id INTEGER PRIMARY KEY,
+            question_id INTEGER NOT NULL,
+            basis TEXT NOT NULL,
+            question TEXT NOT NULL,
+            expires_at INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    '''))
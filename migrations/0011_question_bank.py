@@ -0,0 +1,20 @@
+# migrations/0011_question_bank.py
+"""
+題庫追問的品質統計
+--------------------------------------------------
+questions.template_id：由題庫（services/question_bank.py）產生的題目所用的範本，LLM 產生的為 NULL。
+question_template_stats：每個範本收到的回答數與這些回答的 AQI 總和，回答取得分數時累加，
+供題庫依平均 AQI 排序範本。
+"""
+from sqlalchemy.sql import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE questions ADD COLUMN template_id TEXT"))
+    conn.execute(text('''
+        CREATE TABLE IF NOT EXISTS question_template_stats (
+            template_id TEXT PRIMARY KEY,
+            answered INTEGER NOT NULL DEFAULT 0,
+            aqi_sum REAL NOT NULL DEFAULT 0
+        )
+    '''))
@@ -0,0 +1,99 @@
+# migrations/__init__.py
+"""
+版本化資料庫遷移
+--------------------------------------------------
+每個遷移是本目錄下的 NNNN_名稱.py，提供 upgrade(conn)，conn 為 SQLAlchemy Connection。
+已套用的版本記錄在 schema_migrations；每個遷移在各自的交易中執行，失敗即回滾並停止。
+app 啟動時會自動 migrate，也可手動執行 `python migrate.py`。
+多個 worker 同時啟動時，每個遷移的交易先取得資料庫層級的鎖（SQLite 寫入鎖、PostgreSQL advisory lock），
+再於鎖內重新確認該版本尚未套用，同一個 ALTER TABLE 不會被兩個 process 同時執行。
+DDL 需同時支援 SQLite 與 PostgreSQL：自動遞增主鍵請用 id_column(conn)，
+僅限單一資料庫的語句以 conn.dialect.name 判斷。
+"""
+from __future__ import annotations
+import contextlib
+import importlib
+import logging
+import pkgutil
+import re
+
+from sqlalchemy.sql import text
+
+logger = logging.getLogger(__name__)
+
+_NAME = re.compile(r"^(\d{4})_(\w+)$")
+_LOCK_KEY = 7_240_521  # pg_advisory_xact_lock 的鍵，只供遷移使用
+
+
+def id_column(conn) -> str:
+    """自動遞增主鍵欄位定義：SQLite 為 AUTOINCREMENT，PostgreSQL 為 SERIAL"""
+    if conn.dialect.name == "postgresql":
+        return "id SERIAL PRIMARY KEY"
+    return "id INTEGER PRIMARY KEY AUTOINCREMENT"
+
+
+def available() -> list[tuple[int, str]]:
+    """依版本排序的 (version, module_name)"""
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _NAME.match(info.name)
+        if match:
+            found.append((int(match.group(1)), info.name))
+    return sorted(found)
+
+
+def _ensure_table(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+
+@contextlib.contextmanager
+def _locked(engine):
+    """
+    持有遷移鎖的交易，提交或回滾時釋放
+    SQLite 以一個不影響資料的寫入語句取得寫入鎖（WRITE_ENGINE 本身已是 BEGIN IMMEDIATE，
+    其他 engine 也會在此升級為寫入交易）；PostgreSQL 以交易層級的 advisory lock。
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        else:
+            conn.execute(text("DELETE FROM schema_migrations WHERE 0 = 1"))
+        yield conn
+
+
+def _applied(conn) -> set[int]:
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def applied(engine) -> set[int]:
+    _ensure_table(engine)
+    with engine.connect() as conn:
+        return _applied(conn)
+
+
+def migrate(engine, target: int | None = None) -> list[str]:
+    """套用所有（或到 target 為止）尚未執行的遷移，回傳本次套用的名稱"""
+    done = applied(engine)  # 只用來略過已套用的版本，是否執行以鎖內的結果為準
+    ran = []
+    for version, name in available():
+        if version in done or (target is not None and version > target):
+            continue
+        module = importlib.import_module(f"{__name__}.{name}")
+        with _locked(engine) as conn:
+            if version in _applied(conn):
+                continue  # 其他 process 已在等待鎖的期間套用
+            module.upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                {"v": version, "n": name},
+            )
+        logger.info(f"Applied migration {name}")
+        ran.append(name)
+    return ran
@@ -1,20 +0,0 @@
- 
-# models/user.py
-import sqlite3
-import config
-
-def init_db():
-    conn = sqlite3.connect(config.DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-if __name__ == "__main__":
-    init_db()  # 執行此檔案時初始化資料庫
\ No newline at end of file
@@ -0,0 +1,32 @@
+# repositories/__init__.py
+"""
+資料存取層
+--------------------------------------------------
+routes/ 與 services/ 不直接寫 SQL，改呼叫這裡的 repository：
+
+    from repositories import repos
+    with READ_ENGINE.connect() as conn:
+        row = repos.questions.latest(conn, user_id)
+
+每個方法都接收呼叫端的 conn，交易範圍仍由呼叫端決定（例如 submit_answer 的單一寫入交易）。
+SQL 大多兩種資料庫通用（base.py），語法不同的片段由 sqlite.py / postgres.py 提供，
+依 DATABASE_URL 的 dialect 自動選擇。
+"""
+from db import WRITE_ENGINE
+from repositories import postgres, sqlite
+
+BACKENDS = {
+    "sqlite": sqlite.make_repositories,
+    "postgresql": postgres.make_repositories,
+}
+
+
+def for_engine(engine):
+    """依 engine 的 dialect 建立對應的 repositories（基準測試用來同時測兩種後端）"""
+    try:
+        return BACKENDS[engine.dialect.name]()
+    except KeyError:
+        raise ValueError(f"Unsupported database backend: {engine.dialect.name}")
+
+
+repos = for_engine(WRITE_ENGINE)
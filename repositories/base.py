@@ -0,0 +1,532 @@
+# repositories/base.py
+"""
+兩種資料庫共用的 repository 實作
+--------------------------------------------------
+只使用 SQLite（3.35+）與 PostgreSQL 都支援的語法：RETURNING、ON CONFLICT、
+部分索引、CURRENT_TIMESTAMP。語法不同的片段（工作佇列的逾時判斷與鎖定）
+由 dialect 物件提供，見 sqlite.py / postgres.py。
+所有方法的第一個參數都是呼叫端的 conn，交易範圍由呼叫端決定。
+"""
+from __future__ import annotations
+from datetime import datetime
+
+from sqlalchemy.sql import text
+
+
+class UserRepo:
+    def create(self, conn, email: str, password_hash: str) -> int:
+        """email 重複時拋出 sqlalchemy.exc.IntegrityError"""
+        return conn.execute(
+            text("INSERT INTO users (email, password) VALUES (:email, :password) RETURNING id"),
+            {"email": email, "password": password_hash},
+        ).fetchone()[0]
+
+    def update_password(self, conn, user_id: int, password_hash: str) -> None:
+        conn.execute(
+            text("UPDATE users SET password = :password WHERE id = :uid"),
+            {"password": password_hash, "uid": user_id},
+        )
+
+    def by_email(self, conn, email: str):
+        """(id, password) 或 None"""
+        return conn.execute(
+            text("SELECT id, password FROM users WHERE email = :email"),
+            {"email": email},
+        ).fetchone()
+
+
+class PlanRepo:
+    def list(self, conn) -> list[dict]:
+        rows = conn.execute(text("SELECT id, name, word_limit FROM plans ORDER BY id")).fetchall()
+        return [{"id": row[0], "name": row[1], "word_limit": row[2]} for row in rows]
+
+    def exists(self, conn, plan_id: int) -> bool:
+        return conn.execute(
+            text("SELECT 1 FROM plans WHERE id = :plan_id"), {"plan_id": plan_id}
+        ).fetchone() is not None
+
+    def select_for_user(self, conn, user_id: int, plan_id: int) -> None:
+        """每位使用者一筆（user_plans.user_id 唯一索引，見 0005）"""
+        conn.execute(
+            text("""INSERT INTO user_plans (user_id, plan_id) VALUES (:user_id, :plan_id)
+                     ON CONFLICT (user_id) DO UPDATE SET plan_id = excluded.plan_id"""),
+            {"user_id": user_id, "plan_id": plan_id},
+        )
+
+
+class QuestionRepo:
+    def create(self, conn, user_id: int, content: str, order: int, theme: str, story_id: int,
+               template_id: str | None = None) -> int:
+        """template_id 為題庫範本（services/question_bank.py），LLM 或固定題目為 None"""
+        return conn.execute(
+            text("""INSERT INTO questions (user_id, content, question_order, theme, story_id, template_id)
+                     VALUES (:uid, :cnt, :ord, :thm, :sid, :tid)
+                     RETURNING id"""),
+            {"uid": user_id, "cnt": content, "ord": order, "thm": theme, "sid": story_id, "tid": template_id},
+        ).fetchone()[0]
+
+    def latest(self, conn, user_id: int):
+        """(id, content, theme, story_id, question_order) 或 None"""
+        return conn.execute(
+            text("""
+                SELECT q.id, q.content, q.theme, q.story_id, q.question_order
+                FROM questions q
+                WHERE q.user_id = :uid
+                ORDER BY q.id DESC
+                LIMIT 1
+            """),
+            {"uid": user_id},
+        ).fetchone()
+
+    def answer_context(self, conn, question_id: int, user_id: int, now: int) -> list:
+        """
+        submit_answer 的單一讀取查詢
+        每列為 (question_order, theme, story_id, 主題題數, 故事題數, 同主題其他題的回答, 其他題回答的 minhash,
+        預取候選的草稿, 預取候選的追問, 本題的題庫範本)；
+        其他題涵蓋該使用者所有主題，回答全文只在同主題時帶出，其餘為 NULL；
+        預取候選只在屬於本題且 expires_at > now 時帶出，其餘為 NULL；
+        沒有其他題目時只有一列、回答與 minhash 為 NULL；題目不存在時為空 list。
+        """
+        return conn.execute(
+            text("""
+                SELECT q.question_order, q.theme, q.story_id,
+                       (SELECT COALESCE(SUM(c.question_count), 0) FROM user_question_counts c
+                         WHERE c.user_id = q.user_id AND c.theme = q.theme),
+                       (SELECT COALESCE(SUM(c.question_count), 0) FROM user_question_counts c
+                         WHERE c.user_id = q.user_id AND c.theme = q.theme AND c.story_id = q.story_id),
+                       CASE WHEN hq.theme = q.theme THEN h.answer END,
+                       h.minhash,
+                       p.basis, p.question, q.template_id
+                FROM questions q
+                LEFT JOIN question_prefetch p
+                  ON p.user_id = q.user_id AND p.question_id = q.id AND p.expires_at > :now
+                LEFT JOIN questions hq
+                  ON hq.user_id = q.user_id AND hq.id <> q.id
+                LEFT JOIN answers h
+                  ON h.user_id = q.user_id AND h.question_id = hq.id
+                WHERE q.id = :qid AND q.user_id = :uid
+                ORDER BY hq.question_order, h.id
+            """),
+            {"qid": question_id, "uid": user_id, "now": now},
+        ).fetchall()
+
+    def transcript(self, conn, user_id: int) -> list:
+        """
+        依題序的 (theme, story_id, question, answer, image_path, detail_score, emotion_score, reflection_score, redundancy)
+        未回答時 answer 與分數為 NULL；分數尚未回填（背景評分中）時也為 NULL
+        """
+        return conn.execute(
+            text("""
+                SELECT q.theme, q.story_id, q.content AS question, a.answer, ai.image_path,
+                       a.detail_score, a.emotion_score, a.reflection_score, a.redundancy
+                FROM questions q
+                LEFT JOIN answers a ON q.id = a.question_id AND a.user_id = :user_id
+                LEFT JOIN answer_images ai ON ai.question_id = q.id AND ai.user_id = :user_id
+                WHERE q.user_id = :user_id
+                ORDER BY q.question_order
+            """),
+            {"user_id": user_id},
+        ).fetchall()
+
+    def delete_for_user(self, conn, user_id: int) -> None:
+        conn.execute(text("DELETE FROM questions WHERE user_id = :user_id"), {"user_id": user_id})
+
+
+class AnswerRepo:
+    def create(self, conn, user_id: int, question_id: int, answer: str, metrics: dict) -> int:
+        return conn.execute(
+            text("""
+                INSERT INTO answers
+                    (user_id, question_id, answer,
+                     detail_score, emotion_score, reflection_score, redundancy, length, minhash, score_source)
+                VALUES (:uid, :qid, :ans, :d, :e, :r, :red, :l, :sig, :src)
+                RETURNING id
+            """),
+            {
+                "uid": user_id,
+                "qid": question_id,
+                "ans": answer,
+                "d":   metrics["detail_score"],
+                "e":   metrics["emotion_score"],
+                "r":   metrics["reflection_score"],
+                "red": metrics["redundancy"],
+                "l":   metrics["length"],
+                "sig": metrics["minhash"],
+                "src": metrics["score_source"],
+            },
+        ).fetchone()[0]
+
+    def set_scores(self, conn, answer_id: int, detail: float, emotion: float, reflection: float) -> int:
+        """回填背景 LLM 評分，回傳更新筆數（回答已被 reset 刪除時為 0）"""
+        return conn.execute(
+            text("""UPDATE answers
+                     SET detail_score = :d, emotion_score = :e, reflection_score = :r, score_source = 'llm'
+                     WHERE id = :aid"""),
+            {"d": detail, "e": emotion, "r": reflection, "aid": answer_id},
+        ).rowcount
+
+    def score_sources(self, conn) -> dict:
+        """各評分來源的回答數：local（本地預評分）、llm、fallback（同步評分失敗的中間分數），尚未評分為 pending"""
+        rows = conn.execute(
+            text("SELECT COALESCE(score_source, 'pending'), COUNT(*) FROM answers GROUP BY score_source")
+        ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def add_image(self, conn, user_id: int, question_id: int, path: str) -> None:
+        conn.execute(
+            text("INSERT INTO answer_images (user_id, question_id, image_path) VALUES (:user_id, :question_id, :path)"),
+            {"user_id": user_id, "question_id": question_id, "path": path},
+        )
+
+    def delete_for_user(self, conn, user_id: int) -> None:
+        conn.execute(text("DELETE FROM answers WHERE user_id = :user_id"), {"user_id": user_id})
+
+
+class BiographyRepo:
+    def create(self, conn, user_id: int, content: str, style: str, language: str, created_at: datetime) -> int:
+        return conn.execute(
+            text("""
+                INSERT INTO biographies (user_id, content, style, language, created_at)
+                VALUES (:user_id, :content, :style, :language, :created_at)
+                RETURNING id
+            """),
+            {"user_id": user_id, "content": content, "style": style, "language": language, "created_at": created_at},
+        ).fetchone()[0]
+
+    def latest(self, conn, user_id: int):
+        """(id, content, style, created_at) 或 None"""
+        return conn.execute(
+            text("SELECT id, content, style, created_at FROM biographies WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 1"),
+            {"user_id": user_id},
+        ).fetchone()
+
+    def versions(self, conn, user_id: int) -> list:
+        """新到舊的 (id, title, style, language, created_at)"""
+        return conn.execute(
+            text("SELECT id, title, style, language, created_at FROM biographies WHERE user_id = :user_id ORDER BY created_at DESC"),
+            {"user_id": user_id},
+        ).fetchall()
+
+    def get(self, conn, biography_id: int, user_id: int):
+        """(content, style, language) 或 None（不存在或不屬於該使用者）"""
+        return conn.execute(
+            text("SELECT content, style, language FROM biographies WHERE id = :biography_id AND user_id = :user_id"),
+            {"biography_id": biography_id, "user_id": user_id},
+        ).fetchone()
+
+    def page(self, conn, user_id: int, after_id: int, limit: int) -> list:
+        """id 大於 after_id 的下一批 (id, style, language, created_at, content)，依 id 排序（鍵集分頁）"""
+        return conn.execute(
+            text("""
+                SELECT id, style, language, created_at, content FROM biographies
+                WHERE user_id = :user_id AND id > :after_id
+                ORDER BY id LIMIT :limit
+            """),
+            {"user_id": user_id, "after_id": after_id, "limit": limit},
+        ).fetchall()
+
+    def update(self, conn, biography_id: int, user_id: int, content: str | None = None, title: str | None = None) -> int:
+        """只更新有給的欄位，回傳更新筆數"""
+        update_fields = []
+        params = {"biography_id": biography_id, "user_id": user_id}
+        if content:
+            update_fields.append("content = :content")
+            params["content"] = content
+        if title is not None:
+            update_fields.append("title = :title")
+            params["title"] = title
+        return conn.execute(
+            text(f"UPDATE biographies SET {', '.join(update_fields)} WHERE id = :biography_id AND user_id = :user_id"),
+            params,
+        ).rowcount
+
+
+class ProgressRepo:
+    """
+    每位使用者的進度計數（user_progress / user_question_counts）
+    請在寫入 answers / questions 的同一交易中呼叫，計數才會與資料保持一致。
+    """
+
+    def record_question(self, conn, user_id: int, theme: str, story_id: int) -> None:
+        conn.execute(
+            text("""
+                INSERT INTO user_question_counts (user_id, theme, story_id, question_count)
+                VALUES (:uid, :thm, :sid, 1)
+                ON CONFLICT (user_id, theme, story_id)
+                DO UPDATE SET question_count = user_question_counts.question_count + 1
+            """),
+            {"uid": user_id, "thm": theme, "sid": story_id},
+        )
+
+    def record_answer(self, conn, user_id: int, length: int, aqi: float | None = None) -> None:
+        """新增一筆回答；aqi 為 None 表示分數稍後由 record_scores 補上"""
+        scored = 0 if aqi is None else 1
+        conn.execute(
+            text("""
+                INSERT INTO user_progress (user_id, answer_count, scored_count, score_sum, total_length)
+                VALUES (:uid, 1, :scored, :aqi, :len)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    answer_count = user_progress.answer_count + 1,
+                    scored_count = user_progress.scored_count + excluded.scored_count,
+                    score_sum    = user_progress.score_sum + excluded.score_sum,
+                    total_length = user_progress.total_length + excluded.total_length
+            """),
+            {"uid": user_id, "scored": scored, "aqi": aqi or 0, "len": length},
+        )
+
+    def record_scores(self, conn, user_id: int, aqi: float) -> None:
+        """背景評分完成後補上分數"""
+        conn.execute(
+            text("""UPDATE user_progress
+                     SET scored_count = scored_count + 1, score_sum = score_sum + :aqi
+                     WHERE user_id = :uid"""),
+            {"uid": user_id, "aqi": aqi},
+        )
+
+    def get(self, conn, user_id: int) -> dict:
+        row = conn.execute(
+            text("""SELECT answer_count, scored_count, score_sum, total_length
+                     FROM user_progress WHERE user_id = :uid"""),
+            {"uid": user_id},
+        ).fetchone()
+        if not row:
+            return {"answered": 0, "avg_aqi": 0, "total_length": 0}
+        answered, scored, score_sum, total_length = row
+        return {
+            "answered": answered,
+            "avg_aqi": score_sum / scored if scored else 0,
+            "total_length": total_length,
+        }
+
+    def reset(self, conn, user_id: int) -> None:
+        conn.execute(text("DELETE FROM user_progress WHERE user_id = :uid"), {"uid": user_id})
+        conn.execute(text("DELETE FROM user_question_counts WHERE user_id = :uid"), {"uid": user_id})
+
+
+class RevokedTokenRepo:
+    def add(self, conn, jti: str, user_id: int, expires_at: int) -> None:
+        conn.execute(
+            text("""INSERT INTO revoked_tokens (jti, user_id, expires_at)
+                     VALUES (:jti, :uid, :exp)
+                     ON CONFLICT (jti) DO NOTHING"""),
+            {"jti": jti, "uid": user_id, "exp": expires_at},
+        )
+
+    def active(self, conn, now: int) -> list:
+        """
+        尚未過期的 (jti, expires_at)，供各 worker 同步
+        不以 id 當游標：PostgreSQL 的 id 不保證依提交順序可見，增量讀取可能漏掉較晚提交的小 id。
+        """
+        return conn.execute(
+            text("SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > :now"),
+            {"now": now},
+        ).fetchall()
+
+    def purge_expired(self, conn, now: int) -> int:
+        return conn.execute(
+            text("DELETE FROM revoked_tokens WHERE expires_at <= :now"), {"now": now}
+        ).rowcount
+
+
+class PrefetchRepo:
+    def save(self, conn, user_id: int, question_id: int, basis: str, question: str, expires_at: int) -> None:
+        """每位使用者一筆，新的候選覆寫舊的"""
+        conn.execute(
+            text("""INSERT INTO question_prefetch (user_id, question_id, basis, question, expires_at)
+                     VALUES (:uid, :qid, :basis, :question, :exp)
+                     ON CONFLICT (user_id) DO UPDATE SET
+                       question_id = excluded.question_id, basis = excluded.basis,
+                       question = excluded.question, expires_at = excluded.expires_at"""),
+            {"uid": user_id, "qid": question_id, "basis": basis, "question": question, "exp": expires_at},
+        )
+
+    def delete_for_user(self, conn, user_id: int) -> None:
+        conn.execute(text("DELETE FROM question_prefetch WHERE user_id = :uid"), {"uid": user_id})
+
+
+class QuestionTemplateRepo:
+    def record(self, conn, template_id: str, aqi: float) -> None:
+        """範本產生的題目收到一則已評分的回答"""
+        conn.execute(
+            text("""INSERT INTO question_template_stats (template_id, answered, aqi_sum)
+                     VALUES (:tid, 1, :aqi)
+                     ON CONFLICT (template_id) DO UPDATE SET
+                       answered = question_template_stats.answered + 1,
+                       aqi_sum = question_template_stats.aqi_sum + excluded.aqi_sum"""),
+            {"tid": template_id, "aqi": aqi},
+        )
+
+    def record_for_answer(self, conn, answer_id: int, aqi: float) -> None:
+        """背景評分回填時使用：回答所屬題目不是題庫題目時不做任何事"""
+        conn.execute(
+            text("""INSERT INTO question_template_stats (template_id, answered, aqi_sum)
+                     SELECT q.template_id, 1, :aqi
+                     FROM answers a JOIN questions q ON q.id = a.question_id
+                     WHERE a.id = :aid AND q.template_id IS NOT NULL
+                     ON CONFLICT (template_id) DO UPDATE SET
+                       answered = question_template_stats.answered + 1,
+                       aqi_sum = question_template_stats.aqi_sum + excluded.aqi_sum"""),
+            {"aid": answer_id, "aqi": aqi},
+        )
+
+    def stats(self, conn) -> list:
+        """全部範本的 (template_id, answered, aqi_sum)"""
+        return conn.execute(
+            text("SELECT template_id, answered, aqi_sum FROM question_template_stats")
+        ).fetchall()
+
+
+class _JobQueue:
+    """
+    資料表工作佇列的共用領取邏輯
+    claim 以單一 UPDATE ... RETURNING 原子地領取最舊的一筆待處理工作，
+    running 超過 stale_after 秒的工作視為 worker 已掛，可重新領取。
+    has_ready 是同樣條件的唯讀查詢，閒置輪詢時先確認有工作才開寫入交易。
+    """
+    table = ""
+    ready_status = ""
+    ready_filter = ""  # 待處理工作額外的可領取條件
+    claim_columns = ""
+
+    def __init__(self, dialect):
+        self.dialect = dialect
+
+    def _ready(self) -> str:
+        return f"""((status = '{self.ready_status}' {self.ready_filter})
+                   OR (status = 'running' AND started_at < {self.dialect.STALE_BEFORE}))"""
+
+    def has_ready(self, conn, stale_after: int) -> bool:
+        return conn.execute(
+            text(f"SELECT 1 FROM {self.table} WHERE {self._ready()} LIMIT 1"),
+            {"stale": stale_after},
+        ).fetchone() is not None
+
+    def claim(self, conn, stale_after: int):
+        return conn.execute(
+            text(f"""
+                UPDATE {self.table}
+                SET status = 'running', attempts = attempts + 1, started_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM {self.table}
+                    WHERE {self._ready()}
+                    ORDER BY id
+                    LIMIT 1
+                    {self.dialect.SKIP_LOCKED}
+                )
+                RETURNING {self.claim_columns}
+            """),
+            {"stale": stale_after},
+        ).fetchone()
+
+
+class ScoreJobRepo(_JobQueue):
+    table = "score_jobs"
+    ready_status = "pending"
+    ready_filter = "AND (not_before IS NULL OR not_before <= CURRENT_TIMESTAMP)"
+    claim_columns = "id, answer_id, user_id, answer, attempts"
+
+    def enqueue(self, conn, answer_id: int, user_id: int, answer: str) -> None:
+        conn.execute(
+            text("""INSERT INTO score_jobs (answer_id, user_id, answer)
+                     VALUES (:aid, :uid, :ans)"""),
+            {"aid": answer_id, "uid": user_id, "ans": answer},
+        )
+
+    def pending_count(self, conn, user_id: int) -> int:
+        return conn.execute(
+            text("""SELECT COUNT(*) FROM score_jobs
+                     WHERE user_id = :uid AND status IN ('pending', 'running')"""),
+            {"uid": user_id},
+        ).fetchone()[0]
+
+    def finish(self, conn, job_id: int, status: str, error: str | None = None) -> None:
+        conn.execute(
+            text("""UPDATE score_jobs
+                     SET status = :status, error = :err, finished_at = CURRENT_TIMESTAMP
+                     WHERE id = :jid"""),
+            {"status": status, "err": error, "jid": job_id},
+        )
+
+    def retry(self, conn, job_id: int, error: str, delay: int) -> None:
+        """退回 pending，delay 秒後才能再被領取"""
+        conn.execute(
+            text(f"""UPDATE score_jobs
+                      SET status = 'pending', error = :err, finished_at = CURRENT_TIMESTAMP,
+                          not_before = {self.dialect.AFTER_DELAY}
+                      WHERE id = :jid"""),
+            {"err": error, "delay": delay, "jid": job_id},
+        )
+
+    def delete_for_user(self, conn, user_id: int) -> None:
+        conn.execute(text("DELETE FROM score_jobs WHERE user_id = :user_id"), {"user_id": user_id})
+
+
+class GenerationJobRepo(_JobQueue):
+    table = "generation_jobs"
+    ready_status = "queued"
+    claim_columns = "id, user_id, params, attempts"
+
+    def submit(self, conn, user_id: int, params: str, params_hash: str) -> tuple[int, bool]:
+        """
+        放入工作，回傳 (job_id, created)
+        部分唯一索引保證同時只有一筆進行中的相同工作，衝突時回傳既有那一筆。
+        PostgreSQL 上衝突的工作可能在 INSERT 與 SELECT 之間完成，此時重新嘗試 INSERT。
+        """
+        while True:
+            row = conn.execute(
+                text("""INSERT INTO generation_jobs (user_id, params, params_hash)
+                         VALUES (:uid, :params, :hash)
+                         ON CONFLICT DO NOTHING
+                         RETURNING id"""),
+                {"uid": user_id, "params": params, "hash": params_hash},
+            ).fetchone()
+            if row:
+                return row[0], True
+            row = conn.execute(
+                text("""SELECT id FROM generation_jobs
+                         WHERE user_id = :uid AND params_hash = :hash
+                         AND status IN ('queued', 'running')"""),
+                {"uid": user_id, "hash": params_hash},
+            ).fetchone()
+            if row:
+                return row[0], False
+
+    def get(self, conn, job_id: int, user_id: int):
+        """工作欄位加上完成的自傳（LEFT JOIN，未完成時為 NULL）"""
+        return conn.execute(
+            text("""
+                SELECT j.id, j.status, j.params, j.error, j.created_at, j.started_at, j.finished_at,
+                       b.id, b.content, b.style, b.language, b.created_at
+                FROM generation_jobs j
+                LEFT JOIN biographies b ON b.id = j.biography_id
+                WHERE j.id = :jid AND j.user_id = :uid
+            """),
+            {"jid": job_id, "uid": user_id},
+        ).fetchone()
+
+    def finish(self, conn, job_id: int, status: str, biography_id: int | None = None, error: str | None = None) -> None:
+        conn.execute(
+            text("""UPDATE generation_jobs
+                     SET status = :status, biography_id = :bid, error = :err,
+                         finished_at = CASE WHEN :status IN ('done', 'failed') THEN CURRENT_TIMESTAMP END
+                     WHERE id = :jid"""),
+            {"status": status, "bid": biography_id, "err": error, "jid": job_id},
+        )
+
+
+class Repositories:
+    """一個後端的全部 repository，dialect 提供語法不同的 SQL 片段"""
+
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.users = UserRepo()
+        self.plans = PlanRepo()
+        self.questions = QuestionRepo()
+        self.answers = AnswerRepo()
+        self.biographies = BiographyRepo()
+        self.progress = ProgressRepo()
+        self.revoked_tokens = RevokedTokenRepo()
+        self.prefetch = PrefetchRepo()
+        self.question_templates = QuestionTemplateRepo()
+        self.score_jobs = ScoreJobRepo(dialect)
+        self.generation_jobs = GenerationJobRepo(dialect)
@@ -0,0 +1,20 @@
+# repositories/postgres.py
+"""
+PostgreSQL 後端
+--------------------------------------------------
+多個 API 節點共用一個資料庫，背景 worker 會真正同時領取工作：
+子查詢加上 FOR UPDATE SKIP LOCKED，避免兩個 worker 領到同一筆，
+也不會互相等待被鎖住的列。逾時與重試時間用 make_interval。
+"""
+from repositories import base
+
+
+class PostgresDialect:
+    name = "postgresql"
+    STALE_BEFORE = "CURRENT_TIMESTAMP - make_interval(secs => :stale)"
+    AFTER_DELAY = "CURRENT_TIMESTAMP + make_interval(secs => :delay)"
+    SKIP_LOCKED = "FOR UPDATE SKIP LOCKED"
+
+
+def make_repositories() -> base.Repositories:
+    return base.Repositories(PostgresDialect())
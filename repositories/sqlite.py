@@ -0,0 +1,19 @@
+# repositories/sqlite.py
+"""
+SQLite 後端
+--------------------------------------------------
+單一 writer（db.py 的 WRITE_ENGINE 以 BEGIN IMMEDIATE 序列化寫入），
+佇列領取不需要列鎖；逾時與重試時間用 datetime('now', ...)。PRAGMA 見 db.py。
+"""
+from repositories import base
+
+
+class SQLiteDialect:
+    name = "sqlite"
+    STALE_BEFORE = "datetime('now', '-' || :stale || ' seconds')"
+    AFTER_DELAY = "datetime('now', '+' || :delay || ' seconds')"
+    SKIP_LOCKED = ""
+
+
+def make_repositories() -> base.Repositories:
+    return base.Repositories(SQLiteDialect())
@@ -1,14 +1,21 @@
 from flask import Blueprint, request, jsonify
-from passlib.hash import pbkdf2_sha256
 import sqlite3
 import config
-import jwt
-from datetime import datetime, timedelta
-from config import ENGINE, SECRET_KEY
-from sqlalchemy.sql import text
+from db import READ_ENGINE, WRITE_ENGINE
+from repositories import repos
+from services import auth, passwords
+from sqlalchemy.exc import IntegrityError
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def _busy():
+    """雜湊佇列已滿，請用戶端稍後重試"""
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
@@ -21,17 +28,15 @@ def register():
         print(f"Received email: {email}")  # 增加日誌
         if not email or not password:
             return jsonify({"error": "Email and password are required"}), 400
-        hashed_password = pbkdf2_sha256.hash(password)
-        with ENGINE.connect() as conn:
-            conn.execute(
-                text("INSERT INTO users (email, password) VALUES (:email, :password)"),
-                {"email": email, "password": hashed_password}
-            )
-            conn.commit()
+        hashed_password = passwords.hash_password(password)  # 在雜湊 process pool 中計算
+        with WRITE_ENGINE.begin() as conn:
+            repos.users.create(conn, email, hashed_password)
         return jsonify({"message": "User registered successfully"}), 201
+    except passwords.PasswordPoolBusy:
+        return _busy()
     except Exception as e:
         print(f"Registration error: {str(e)}")  # 增加日誌
-        if "UNIQUE constraint failed" in str(e):
+        if isinstance(e, IntegrityError):  # email 唯一鍵衝突（SQLite / PostgreSQL 皆同）
             return jsonify({"error": "Email already exists"}), 409
         return jsonify({"error": f"Registration failed: {str(e)}"}), 500
 
@@ -44,18 +49,26 @@ def login():
     if not email or not password:
         return jsonify({"error": "Email and password are required"}), 400
 
-    with ENGINE.connect() as conn:
-        result = conn.execute(
-            text("SELECT id, password FROM users WHERE email = :email"),
-            {"email": email}
-        )
-        user = result.fetchone()
-
-    if user and pbkdf2_sha256.verify(password, user[1]):
-        token = jwt.encode({
-            'user_id': user[0],
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, SECRET_KEY, algorithm="HS256")
-        return jsonify({"token": token}), 200
-    else:
-        return jsonify({"error": "Invalid email or password"}), 401
\ No newline at end of file
+    with READ_ENGINE.connect() as conn:
+        user = repos.users.by_email(conn, email)
+
+    if not user:
+        return jsonify({"error": "Invalid email or password"}), 401
+    try:
+        ok, new_hash = passwords.verify_password(password, user[1])
+    except passwords.PasswordPoolBusy:
+        return _busy()
+    if not ok:
+        return jsonify({"error": "Invalid email or password"}), 401
+    if new_hash:
+        # 雜湊參數已過時（rounds 低於 PASSWORD_MIN_ROUNDS）：以目前設定重新雜湊後寫回
+        with WRITE_ENGINE.begin() as conn:
+            repos.users.update_password(conn, user[0], new_hash)
+    return jsonify({"token": auth.issue_token(user[0])}), 200
+
+@auth_bp.route('/logout', methods=['POST'])
+@auth.token_required
+def logout():
+    # 撤銷目前的 token，其他 worker 在下次同步撤銷清單後也會拒絕它
+    auth.revoke(auth.bearer_token(), request.token_claims)
+    return jsonify({"message": "Logged out"}), 200
@@ -1,20 +1,18 @@
 # routes/biography.py
-from flask import Blueprint, jsonify, request,  send_file, Flask
+from flask import Blueprint, jsonify, request,  send_file, Flask, Response, stream_with_context
 import config
-import jwt
-from functools import wraps
-from openai import OpenAI
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-import io
-from config import ENGINE
-from sqlalchemy.sql import text
+import json
+import time
+from db import READ_ENGINE, WRITE_ENGINE
+from repositories import repos
 from flask_caching import Cache
 from datetime import datetime
 import os
 import logging
-from services.follow_up import get_next_question as ai_get_next_question, evaluate_answer
+from services.auth import token_required
+from services.follow_up import score_and_follow_up, bank_follow_up
+from services import scoring_queue, prefetch, question_bank
+from services import biography_writer, generation_jobs, export, audio_uploads, transcription, images
 
 # 設置日誌
 
@@ -26,50 +24,30 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
 
 biography_bp = Blueprint('biography', __name__)
-UPLOAD_FOLDER = 'static/uploads'
 
 THEMES = ["童年", "教育", "職業", "家庭", "夢想"]
 MAX_QUESTIONS_PER_THEME = 18  # 3 個故事 × 6 題
 MAX_QUESTIONS_PER_STORY = 6
+# submit_answer 的 SQL 陳述式上限：讀取 1 + 回答 INSERT 1 + 進度 1 + 評分佇列或題庫統計 1 + 下一題 INSERT 1 + 題數 1（tests/test_submit_answer_queries.py 檢查）
+SUBMIT_ANSWER_MAX_STATEMENTS = 6
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def token_required(f):
-    @wraps(f)
-    def decorator(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token or not token.startswith('Bearer '):
-            return jsonify({"error": "Token is missing"}), 401
-        try:
-            token = token.split(" ")[1]
-            payload = jwt.decode(token, config.SECRET_KEY, algorithms=["HS256"])
-            request.user_id = payload['user_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
-        return f(*args, **kwargs)
-    return decorator
-
 @biography_bp.route('/reset', methods=['POST'])
 @token_required
 def reset_questions():
     user_id = request.user_id
     try:
-        with ENGINE.connect() as conn:
-            # 刪除用戶的所有回答
-            conn.execute(
-                text("DELETE FROM answers WHERE user_id = :user_id"),
-                {"user_id": user_id}
-            )
+        with WRITE_ENGINE.begin() as conn:
+            # 刪除尚未評分的工作與用戶的所有回答
+            repos.score_jobs.delete_for_user(conn, user_id)
+            repos.answers.delete_for_user(conn, user_id)
             # 刪除用戶的所有問題
-            conn.execute(
-                text("DELETE FROM questions WHERE user_id = :user_id"),
-                {"user_id": user_id}
-            )
-            conn.commit()
+            repos.questions.delete_for_user(conn, user_id)
+            repos.progress.reset(conn, user_id)
+            repos.prefetch.delete_for_user(conn, user_id)
         return jsonify({"message": "Questions and answers reset successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to reset: {str(e)}"}), 500
@@ -85,17 +63,38 @@ def upload_image():
     if not question_id or not file:
         return jsonify({"error": "缺少 question_id 或檔案"}), 400
 
-    filename = f"{user_id}_{question_id}_{file.filename}"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
+    # 以內容雜湊存檔，相同圖片只存一份；縮圖在背景產生
+    try:
+        digest, filepath = images.save_upload(file.stream)
+    except images.ImageRejected as e:
+        return jsonify({"error": str(e)}), 400
+
+    with WRITE_ENGINE.begin() as conn:
+        repos.answers.add_image(conn, user_id, question_id, filepath)
+    return jsonify({
+        "message": "圖片上傳成功",
+        "path": filepath,
+        "thumbnail": images.rendition_url(digest, "thumb"),
+        "web": images.rendition_url(digest, "web"),
+    }), 200
+
+def _plan_next(theme, story_id, total_theme_questions, total_story_questions):
+    """
+    本題答完後的去向：(下一題主題, story_id, 固定題目)，全部主題都完成時為 None
+    固定題目為 None 表示繼續追問同一個故事（由 LLM 產生）
+    """
+    if total_story_questions < MAX_QUESTIONS_PER_STORY:
+        return theme, story_id, None
+    if total_theme_questions < MAX_QUESTIONS_PER_THEME:
+        # 開啟新故事（同主題）
+        return theme, story_id + 1, f"除了剛才提到的，關於你的{theme}還有什麼其他特別的經歷嗎？"
+    # 切換主題或結束
+    idx = THEMES.index(theme)
+    if idx + 1 < len(THEMES):
+        next_theme = THEMES[idx + 1]
+        return next_theme, 1, f"關於你的{next_theme}，有什麼特別的經歷嗎？"
+    return None
 
-    with ENGINE.connect() as conn:
-        conn.execute(
-            text("INSERT INTO answer_images (user_id, question_id, image_path) VALUES (:user_id, :question_id, :path)"),
-            {"user_id": user_id, "question_id": question_id, "path": filepath}
-        )
-        conn.commit()
-    return jsonify({"message": "圖片上傳成功", "path": filepath}), 200
 
 @biography_bp.route('/answer', methods=['POST'])
 @token_required
@@ -108,143 +107,78 @@ def submit_answer():
 
     if not question_id or not answer:
         return jsonify({"error": "Question ID and answer are required"}), 400
-    
-    with ENGINE.connect() as conn:
-        row = conn.execute(
-            text("""
-                SELECT question_order, theme, story_id
-                FROM questions
-                WHERE id = :qid AND user_id = :uid
-            """),
-            {"qid": question_id, "uid": user_id}
-        ).fetchone()
-        if not row:
-            return jsonify({"error": "Invalid question ID"}), 404
-        current_order, current_theme, current_story_id = row
-        next_order = current_order + 1
-    
-        # 儲存回答
-        conn.execute(
-            text("""INSERT INTO answers (user_id, question_id, answer)
-                     VALUES (:uid, :qid, :ans)"""),
-            {"uid": user_id, "qid": question_id, "ans": answer}
-        )
-        # 2) 取得同主題歷史回答（不含本題）
-        history_rows = conn.execute(
-            text("""
-                SELECT a.answer
-                FROM answers a
-                JOIN questions q ON a.question_id = q.id
-                WHERE a.user_id = :uid
-                AND q.theme = :thm
-                AND a.question_id <> :qid
-                ORDER BY a.id
-            """),
-            {"uid": user_id, "thm": current_theme, "qid": question_id},
-        ).fetchall()
-        hist_texts = [r[0] for r in history_rows]
-
-        # ③ 計算回答品質指標
-        metrics = evaluate_answer(answer, hist_texts)
-
-        # 4) 把分數寫回 answers
-        conn.execute(
-            text("""
-                UPDATE answers SET
-                    detail_score     = :d,
-                    emotion_score    = :e,
-                    reflection_score = :r,
-                    redundancy       = :red,
-                    length           = :l
-                WHERE user_id = :uid
-                AND question_id = :qid
-            """),
-            {
-                "d":   metrics["detail_score"],
-                "e":   metrics["emotion_score"],
-                "r":   metrics["reflection_score"],
-                "red": metrics["redundancy"],
-                "l":   metrics["length"],
-                "uid": user_id,
-                "qid": question_id,
-            },
-        )
-
-        # 取出當前問題資訊
-        row = conn.execute(
-            text("""SELECT question_order, theme, story_id
-                     FROM questions
-                     WHERE id = :qid AND user_id = :uid"""),
-            {"qid": question_id, "uid": user_id}
-        ).fetchone()
-        if not row:
-            return jsonify({"error": "Invalid question ID"}), 404
-        current_order, current_theme, current_story_id = row
-        next_order = current_order + 1
-
-        # 取得本主題與本故事的已提問數
-        total_theme_questions = conn.execute(
-            text("""SELECT COUNT(*) FROM questions
-                     WHERE user_id=:uid AND theme=:thm"""),
-            {"uid": user_id, "thm": current_theme}
-        ).fetchone()[0]
-        total_story_questions = conn.execute(
-            text("""SELECT COUNT(*) FROM questions
-                     WHERE user_id=:uid AND theme=:thm AND story_id=:sid"""),
-            {"uid": user_id, "thm": current_theme, "sid": current_story_id}
-        ).fetchone()[0]
-
-        # ------------------ 產生下一個問題 ------------------
-        if total_story_questions < MAX_QUESTIONS_PER_STORY:
-            # ① 撈歷史回答（同主題）
-            history_rows = conn.execute(
-                text("""SELECT a.answer FROM answers a
-                         JOIN questions q ON a.question_id=q.id
-                         WHERE a.user_id=:uid AND q.theme=:thm
-                         ORDER BY q.question_order"""),
-                {"uid": user_id, "thm": current_theme}
-            ).fetchall()
-            history_texts = [r[0] for r in history_rows if r[0]]
-
-            # ② 呼叫智能追問模組
-            next_question = ai_get_next_question(answer, current_theme, history_texts)
-            next_story_id = current_story_id
-
-        elif total_theme_questions < MAX_QUESTIONS_PER_THEME:
-            # 開啟新故事（同主題）
-            next_story_id = current_story_id + 1
-            next_question = f"除了剛才提到的，關於你的{current_theme}還有什麼其他特別的經歷嗎？"
+
+    # ------------------ ① 讀取階段：單一查詢取回題目、計數、同主題歷史與預取候選 ------------------
+    # 每列為一筆其他題目與其回答（同主題才帶全文）及簽章（不含本題）；沒有時為 answer 為 NULL 的一列
+    with READ_ENGINE.connect() as conn:
+        rows = repos.questions.answer_context(conn, question_id, user_id, int(time.time()))
+    if not rows:
+        return jsonify({"error": "Invalid question ID"}), 404
+    (current_order, current_theme, current_story_id, total_theme_questions, total_story_questions,
+     _, _, prefetch_basis, prefetched, answered_template) = rows[0]
+    next_order = current_order + 1
+    hist_texts = [r[5] for r in rows if r[5]]
+    # 重複度以簽章比對該使用者所有既有回答（不限主題）
+    hist_signatures = [bytes(r[6]) for r in rows if r[6] is not None]
+
+    # ------------------ ② 決定下一題的去向 ------------------
+    plan = _plan_next(current_theme, current_story_id, total_theme_questions, total_story_questions)
+    completed = plan is None
+    if not completed:
+        current_theme, next_story_id, next_question = plan  # 換主題時更新以便 insert
+
+    # 追問用的歷史回答（同主題，依題序，含本題）；None 表示不需追問
+    # QUESTION_BANK_FRACTION 比例的題目由題庫追問；輸入中預取的候選仍符合最終回答時直接採用；都不是時才呼叫 LLM
+    follow_up_history = None
+    template_id = None
+    if not completed and next_question is None:
+        banked = None
+        if question_bank.serves(question_id):
+            banked = bank_follow_up(answer, current_theme, hist_texts + [answer])
+        if banked:
+            template_id, next_question = banked
+        elif prefetch.fits(prefetch_basis, answer):
+            next_question = prefetched
         else:
-            # 切換主題或結束
-            idx = THEMES.index(current_theme)
-            if idx + 1 < len(THEMES):
-                next_theme = THEMES[idx + 1]
-                next_story_id = 1
-                next_question = f"關於你的{next_theme}，有什麼特別的經歷嗎？"
-                current_theme = next_theme  # 更新以便 insert
-            else:
-                conn.commit()
-                return jsonify({"message": "All themes completed, ready for biography generation"}), 200
-
-        # 插入下一題
-        new_qid = conn.execute(
-            text("""INSERT INTO questions
-                     (user_id, content, question_order, theme, story_id)
-                     VALUES (:uid, :cnt, :ord, :thm, :sid)
-                     RETURNING id"""),
-            {
-                "uid": user_id,
-                "cnt": next_question,
-                "ord": next_order,
-                "thm": current_theme,
-                "sid": next_story_id,
-            }
-        ).fetchone()[0]
-        conn.commit()
+            follow_up_history = hist_texts + [answer]
+
+    # ------------------ ③ 評分與追問並行 ------------------
+    # ASYNC_SCORING 開啟時，LLM 分數交給背景佇列回填，只等追問
+    metrics, follow_up_question = score_and_follow_up(
+        answer, current_theme, hist_signatures, follow_up_history,
+        llm_score=not config.ASYNC_SCORING,
+    )
+    if follow_up_history is not None:
+        next_question = follow_up_question
+
+    # ------------------ ④ 寫入階段（單一短交易） ------------------
+    with WRITE_ENGINE.begin() as conn:
+        answer_id = repos.answers.create(conn, user_id, question_id, answer, metrics)
+        repos.progress.record_answer(conn, user_id, metrics["length"], metrics["aqi"])
+        if metrics["aqi"] is None:
+            scoring_queue.enqueue(conn, answer_id, user_id, answer)
+        elif answered_template is not None and metrics["score_source"] != "fallback":
+            # 本題來自題庫：分數已知時立即計入範本品質，否則由評分佇列回填時計入；LLM 失敗的中間分數不計入
+            repos.question_templates.record(conn, answered_template, metrics["aqi"])
+
+        if completed:
+            new_qid = None
+        else:
+            # 插入下一題
+            new_qid = repos.questions.create(
+                conn, user_id, next_question, next_order, current_theme, next_story_id, template_id
+            )
+            repos.progress.record_question(conn, user_id, current_theme, next_story_id)
+
+    if metrics["aqi"] is None:
+        scoring_queue.notify()
+    if completed:
+        return jsonify({"message": "All themes completed, ready for biography generation"}), 200
 
     return jsonify({
         "message": "Answer submitted, next question generated",
-        "aqi": metrics["aqi"],
+        "aqi": metrics["aqi"],  # 背景評分時為 None，完成後可由 /progress 看到
+        "scoring": "pending" if metrics["aqi"] is None else "done",
         "question": {
             "id": new_qid,
             "content": next_question,
@@ -253,84 +187,160 @@ def submit_answer():
             "story_id": next_story_id,
         }
     }), 200
-@biography_bp.route('/answer/audio', methods=['POST'])
+
+
+@biography_bp.route('/answer/draft', methods=['POST'])
 @token_required
-def transcribe_audio():
-    """上傳音訊回答 -> Whisper 轉錄 -> 儲存回答 -> 產生下一題"""
+def answer_draft():
+    """
+    輸入中的草稿 → 預取下一題
+    --------------------------------------------------
+    body：{"question_id", "draft"}；前端在使用者停頓輸入時呼叫（不寫入 answers）。
+    本題答完後要追問時，背景以草稿產生候選追問供 submit_answer 採用；
+    開新故事、換主題時直接回傳固定題目。回應 202，不等待 LLM。
+    """
     user_id = request.user_id
-
-    # 參數驗證
-    if 'file' not in request.files:
-        return jsonify({"error": "缺少音訊檔案"}), 400
-    file = request.files['file']
-    if not file.filename:
-        return jsonify({"error": "未選擇檔案"}), 400
-    question_id = request.form.get('question_id')
+    data = request.get_json() or {}
+    question_id = data.get('question_id')
+    draft = (data.get('draft') or '').strip()
     if not question_id:
-        return jsonify({"error": "缺少 question_id"}), 400
-    language = request.form.get('language', 'zh')  # 預設為中文
+        return jsonify({"error": "Question ID is required"}), 400
+
+    with READ_ENGINE.connect() as conn:
+        rows = repos.questions.answer_context(conn, question_id, user_id, int(time.time()))
+    if not rows:
+        return jsonify({"error": "Invalid question ID"}), 404
+    _, theme, story_id, total_theme_questions, total_story_questions, _, _, basis, _, _ = rows[0]
+
+    plan = _plan_next(theme, story_id, total_theme_questions, total_story_questions)
+    if plan is None:
+        return jsonify({"next": "completed"}), 202
+    if plan[2] is not None:
+        return jsonify({"next": "fixed", "question": plan[2]}), 202
+
+    # 由題庫追問的題目提交時不需 LLM，不必預取
+    scheduled = False
+    if (not question_bank.serves(question_id) and len(draft) >= config.PREFETCH_MIN_CHARS
+            and not prefetch.fits(basis, draft)):
+        scheduled = prefetch.schedule(user_id, question_id, draft, theme, [r[5] for r in rows if r[5]])
+    return jsonify({"next": "follow_up", "prefetching": scheduled}), 202
+
+
+def _upload_error(e: audio_uploads.UploadError):
+    if isinstance(e, audio_uploads.UploadNotFound):
+        return jsonify({"error": str(e)}), 404
+    if isinstance(e, audio_uploads.OffsetMismatch):
+        return jsonify({"error": str(e), "received": e.received}), 409
+    if isinstance(e, audio_uploads.UploadTooLarge):
+        return jsonify({"error": str(e)}), 413
+    return jsonify({"error": str(e)}), 400
+
+
+@biography_bp.route('/audio/uploads', methods=['POST'])
+@token_required
+def create_audio_upload():
+    """建立分塊上傳：{"filename", "size"} -> upload_id"""
+    data = request.get_json() or {}
+    try:
+        upload = audio_uploads.create(request.user_id, data.get('filename'), int(data.get('size') or 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "size must be an integer"}), 400
+    except audio_uploads.UploadError as e:
+        return _upload_error(e)
+    return jsonify(upload), 201
 
-    # 保存檔案
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-    file.save(filepath)
 
-    # Whisper 轉錄
+@biography_bp.route('/audio/uploads/<upload_id>', methods=['GET'])
+@token_required
+def audio_upload_status(upload_id):
+    """續傳前查詢已收到的 bytes 數"""
     try:
-        client = OpenAI(api_key=config.OPENAI_API_KEY)
-        with open(filepath, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language=language  # 使用用戶選擇的語言
-            )
-        text = transcription.text
-    except Exception as e:
-        return jsonify({"error": f"轉錄失敗：{str(e)}"}), 500
-    finally:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-
-    # 寫入 answers，並重用 submit_answer 的邏輯以產生下一題
-    with ENGINE.connect() as conn:
-        conn.execute(
-            text("INSERT INTO answers (user_id, question_id, answer) VALUES (:uid, :qid, :ans)"),
-            {"uid": user_id, "qid": question_id, "ans": text},
-        )
-        conn.commit()
-
-    # 直接重用 submit_answer 流程
-    request.get_json = lambda: {"question_id": question_id, "answer": text}
-    return submit_answer()
-@biography_bp.route('/transcribe-only', methods=['POST'])
+        return jsonify(audio_uploads.status(request.user_id, upload_id)), 200
+    except audio_uploads.UploadError as e:
+        return _upload_error(e)
+
+
+@biography_bp.route('/audio/uploads/<upload_id>', methods=['PUT'])
 @token_required
-def transcribe_only():
-    user_id = request.user_id
+def append_audio_chunk(upload_id):
+    """?offset=<bytes>，body 為該塊的原始內容"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"error": "offset is required"}), 400
+    try:
+        received = audio_uploads.append(request.user_id, upload_id, offset, request.stream)
+    except audio_uploads.UploadError as e:
+        return _upload_error(e)
+    return jsonify({"upload_id": upload_id, "received": received}), 200
+
+
+@biography_bp.route('/audio/uploads/<upload_id>/complete', methods=['POST'])
+@token_required
+def complete_audio_upload(upload_id):
+    """收齊後回傳 audio_hash，供 /answer/audio、/transcribe-only 使用"""
+    try:
+        audio_hash = audio_uploads.complete(request.user_id, upload_id)
+    except audio_uploads.UploadError as e:
+        return _upload_error(e)
+    return jsonify({"audio_hash": audio_hash}), 200
 
-    if 'file' not in request.files:
-        return jsonify({"error": "缺少音訊檔案"}), 400
-    file = request.files['file']
-    if not file.filename:
-        return jsonify({"error": "未選擇檔案"}), 400
-    language = request.form.get('language', 'zh')  # 預設為中文
 
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-    file.save(filepath)
+def _transcribe_request(user_id):
+    """
+    表單帶 audio_hash（分塊上傳完成的檔案）或 file（一次上傳）
+    回傳 (逐字稿, None) 或 (None, 錯誤回應)；成功後刪除音檔，失敗時保留以便以同一個 audio_hash 重試
+    已轉錄過的 audio_hash 先查快取，音檔已刪除也能取得逐字稿
+    """
+    language = request.form.get('language', 'zh')  # 預設為中文
+    try:
+        audio_hash = request.form.get('audio_hash')
+        if audio_hash:
+            text = transcription.cached(audio_hash, language)
+            if text is not None:
+                audio_uploads.discard(user_id, audio_hash)
+                return text, None
+        else:
+            file = request.files.get('file')
+            if file is None:
+                return None, (jsonify({"error": "缺少音訊檔案"}), 400)
+            if not file.filename:
+                return None, (jsonify({"error": "未選擇檔案"}), 400)
+            audio_hash = audio_uploads.save_stream(user_id, file.filename, file.stream)
+        path = audio_uploads.path_for(user_id, audio_hash)
+    except audio_uploads.UploadError as e:
+        return None, _upload_error(e)
 
-    client = OpenAI(api_key=config.OPENAI_API_KEY)
     try:
-        with open(filepath, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language=language  # 使用用戶選擇的語言
-            )
-        text = transcription.text
+        text = transcription.transcribe(path, audio_hash, language)
     except Exception as e:
-        return jsonify({"error": f"轉錄失敗：{str(e)}"}), 500
-    finally:
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        return None, (jsonify({"error": f"轉錄失敗：{str(e)}"}), 500)
+    audio_uploads.discard(user_id, audio_hash)
+    return text, None
+
+
+@biography_bp.route('/answer/audio', methods=['POST'])
+@token_required
+def transcribe_audio():
+    """上傳音訊回答 -> 轉錄 -> 儲存回答 -> 產生下一題"""
+    user_id = request.user_id
+    question_id = request.form.get('question_id')
+    if not question_id:
+        return jsonify({"error": "缺少 question_id"}), 400
 
+    transcript, error = _transcribe_request(user_id)
+    if error:
+        return error
+
+    # 直接重用 submit_answer 流程（由它寫入 answers 與進度計數）
+    request.get_json = lambda: {"question_id": question_id, "answer": transcript}
+    return submit_answer()
+
+@biography_bp.route('/transcribe-only', methods=['POST'])
+@token_required
+def transcribe_only():
+    text, error = _transcribe_request(request.user_id)
+    if error:
+        return error
     return jsonify({"transcription": text}), 200
 
 @biography_bp.route('/generate', methods=['POST'])
@@ -342,108 +352,170 @@ def generate_biography():
        data = request.get_json()
        if not data:
            return jsonify({"error": "No JSON data provided"}), 400
-           
-       style = data.get('style', '自然')
-       language = data.get('language', '中文')
-       length = data.get('length', '500 字')
-       usage = data.get('usage', '個人紀錄')
-       emotion = data.get('emotion', '積極')
-       aim = data.get('aim', '展示個人經歷')
-
-       with ENGINE.connect() as conn:
-           result = conn.execute(
-               text("SELECT theme, COUNT(*) FROM questions WHERE user_id = :user_id GROUP BY theme"),
-               {"user_id": user_id}
-           )
-           theme_counts = dict(result.fetchall())
-
-           result = conn.execute(
-                text("""
-                    SELECT q.theme, q.content AS question, a.answer, ai.image_path
-                    FROM questions q
-                    LEFT JOIN answers a ON q.id = a.question_id AND a.user_id = :user_id
-                    LEFT JOIN answer_images ai ON ai.question_id = q.id AND ai.user_id = :user_id
-                    WHERE q.user_id = :user_id
-                    ORDER BY q.question_order
-                """),
-                {"user_id": user_id}
-            )
-           qa_data = []
-           for row in result.fetchall():
-                qa_data.append({
-                    "theme": row[0],
-                    "question": row[1],
-                    "answer": row[2] or "未回答",
-                    "image_path": row[3]  # 可能為 None
-                })
-
-           if not qa_data:
-               return jsonify({"error": "No data available to generate biography"}), 400
-
-           answer_count = sum(1 for qa in qa_data if qa["answer"] != "未回答")
-           total_length = sum(len(qa["answer"]) for qa in qa_data if qa["answer"] != "未回答")
-           if answer_count < 5 or total_length < 200:
-               return jsonify({"error": "Insufficient data for biography generation"}), 400
-
-           # 格式化問答資料為逐字稿
-           qa_text = ""
-           for qa in qa_data:
-                qa_text += f"主題：{qa['theme']}\n問題：{qa['question']}\n回答：{qa['answer']}\n"
-                if qa['image_path']:
-                    fixed_path = qa["image_path"].replace("\\", "/")
-                    print("修正後圖：", fixed_path)
-                    qa_text += f"相關圖片：{fixed_path}\n"
-                qa_text += "\n"
-
-
-           # 新 prompt 格式
-           prompt = f"{qa_text}\n根據這份逐字稿/素材，請幫我改寫成一篇自傳，風格為{style}，字數{length}以上，用途為{usage}明確，具備{emotion}的情感，內容需保留真實感與可讀性，目的是{aim}。如果有相關圖片路徑，請在適當段落中以 ![圖片說明](圖片路徑) 的 markdown 格式嵌入圖片。"
-
-           try:
-               client = OpenAI(api_key=config.OPENAI_API_KEY)
-               response = client.chat.completions.create(
-                   model="gpt-4o",
-                   messages=[{"role": "user", "content": prompt}],
-                   max_tokens=800,
-                   temperature=0.9
-               )
-               biography_content = response.choices[0].message.content.strip()
-           except Exception as e:
-               logger.error(f"OpenAI API error: {str(e)}")
-               return jsonify({"error": "Failed to generate biography with AI"}), 500
-            
-           now = datetime.now()
-           result = conn.execute(
-                text("""
-                    INSERT INTO biographies (user_id, content, style, language, created_at)
-                    VALUES (:user_id, :content, :style, :language, :created_at)
-                    RETURNING id
-                """),
-                {
-                    "user_id": user_id,
-                    "content": biography_content,
-                    "style": style,
-                    "language": language,
-                    "created_at": now
-                }
-            )
-           biography_id = result.fetchone()[0]
-           conn.commit()
-
-           return jsonify({
-               "biography": {
-                   "id": biography_id,
-                   "content": biography_content,
-                   "style": style,
-                   "language": language,
-                   "created_at": datetime.now().isoformat()
-               }
-           }), 200
+       try:
+           opts = biography_writer.parse_options(data)
+       except biography_writer.InvalidOptions as e:
+           return jsonify({"error": str(e)}), 400
+
+       with READ_ENGINE.connect() as conn:
+           qa_data = biography_writer.load_qa_data(conn, user_id)
+       error = biography_writer.check_sufficient(qa_data)
+       if error:
+           return jsonify({"error": error}), 400
+
+       try:
+           biography_content = biography_writer.write(qa_data, opts)
+       except Exception as e:
+           logger.error(f"OpenAI API error: {str(e)}")
+           return jsonify({"error": "Failed to generate biography with AI"}), 500
+
+       with WRITE_ENGINE.begin() as conn:
+           biography = biography_writer.save_biography(conn, user_id, biography_content, opts)
+       return jsonify({"biography": biography}), 200
 
    except Exception as e:
        logger.error(f"Generate biography error: {str(e)}")
        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
-       
+
+
+@biography_bp.route('/generate/batch', methods=['POST'])
+@token_required
+def generate_biography_batch():
+    """
+    一次生成多個版本
+    --------------------------------------------------
+    body：{"variants": [{"style": "正式", "language": "中文", "length": "800 字"}, ...], 其他參數同 /generate}
+    每個 variant 覆寫請求層級的參數。問答只讀取、整理一次，各版本同時生成；
+    全部成功後在同一個交易中寫入 biographies，回傳順序與 variants 相同，任一版本失敗則都不寫入。
+    """
+    user_id = request.user_id
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+        variants, error = biography_writer.parse_variants(data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        with READ_ENGINE.connect() as conn:
+            qa_data = biography_writer.load_qa_data(conn, user_id)
+        error = biography_writer.check_sufficient(qa_data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        try:
+            contents = biography_writer.write_many(qa_data, variants)
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            return jsonify({"error": "Failed to generate biography with AI"}), 500
+
+        with WRITE_ENGINE.begin() as conn:
+            biographies = [
+                biography_writer.save_biography(conn, user_id, content, opts)
+                for content, opts in zip(contents, variants)
+            ]
+        return jsonify({"biographies": biographies}), 200
+
+    except Exception as e:
+        logger.error(f"Generate biography batch error: {str(e)}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+def _sse(payload, event=None):
+    """組一筆 Server-Sent Event"""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@biography_bp.route('/generate/stream', methods=['POST'])
+@token_required
+def generate_biography_stream():
+    """
+    串流版 /generate（text/event-stream）
+    --------------------------------------------------
+    每段內容（sections 為逐個故事，single 為逐個 token）以 `data: {"delta": ...}` 送出；完成並寫入 biographies 後送
+    `event: done` 帶完整 biography，失敗則送 `event: error`。
+    參數與 /generate 相同；瀏覽器請以 fetch + ReadableStream 讀取（EventSource 不支援 POST）。
+    """
+    user_id = request.user_id
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    try:
+        opts = biography_writer.parse_options(data)
+    except biography_writer.InvalidOptions as e:
+        return jsonify({"error": str(e)}), 400
+
+    with READ_ENGINE.connect() as conn:
+        qa_data = biography_writer.load_qa_data(conn, user_id)
+    error = biography_writer.check_sufficient(qa_data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    def events():
+        parts = []
+        try:
+            for delta in biography_writer.write_stream(qa_data, opts):
+                parts.append(delta)
+                yield _sse({"delta": delta})
+        except Exception as e:
+            logger.error(f"OpenAI stream error: {str(e)}")
+            yield _sse({"error": "Failed to generate biography with AI"}, event="error")
+            return
+
+        try:
+            with WRITE_ENGINE.begin() as conn:
+                biography = biography_writer.save_biography(conn, user_id, "".join(parts).strip(), opts)
+        except Exception as e:
+            logger.error(f"Save biography error: {str(e)}")
+            yield _sse({"error": f"Internal server error: {str(e)}"}, event="error")
+            return
+        yield _sse({"biography": biography}, event="done")
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # 關閉 Nginx 緩衝
+    )
+
+@biography_bp.route('/generate/jobs', methods=['POST'])
+@token_required
+def submit_generation_job():
+    """
+    背景生成：回傳 job id 後由 worker 執行，參數與 /generate 相同
+    同一使用者以相同參數重複提交時回傳進行中的那一筆（deduplicated=true）。
+    """
+    user_id = request.user_id
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    try:
+        opts = biography_writer.parse_options(data)
+    except biography_writer.InvalidOptions as e:
+        return jsonify({"error": str(e)}), 400
+
+    with READ_ENGINE.connect() as conn:
+        qa_data = biography_writer.load_qa_data(conn, user_id)
+    error = biography_writer.check_sufficient(qa_data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    job_id, created = generation_jobs.submit(user_id, opts)
+    return jsonify({"job_id": job_id, "status_url": f"/biography/generate/jobs/{job_id}",
+                    "deduplicated": not created}), 202
+
+
+@biography_bp.route('/generate/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_generation_job(job_id):
+    """查詢生成工作狀態：queued / running / done / failed，done 時附上 biography"""
+    user_id = request.user_id
+    with READ_ENGINE.connect() as conn:
+        job = generation_jobs.get_job(conn, user_id, job_id)
+    if not job:
+        return jsonify({"error": "Job not found or unauthorized"}), 404
+    return jsonify({"job": job}), 200
+
 @biography_bp.route("/next-question", methods=["GET"])
 @token_required
 def get_next_question():
@@ -452,97 +524,68 @@ def get_next_question():
     若還沒有任何問題，就自動建立第一題。
     """
     user_id = request.user_id
-    with ENGINE.connect() as conn:
-        row = conn.execute(
-            text("""
-                SELECT q.id, q.content, q.theme, q.story_id, q.question_order
-                FROM questions q
-                WHERE q.user_id = :uid
-                ORDER BY q.id DESC
-                LIMIT 1
-            """),
-            {"uid": user_id}
-        ).fetchone()
-
-        # 若還沒出第一題→產生初始主題／問題
-        if row is None:
-            first_theme = THEMES[0]
-            first_question = f"在你的{first_theme}中，你最難忘的回憶是什麼？"
-            new_id = conn.execute(
-                text("""
-                    INSERT INTO questions (user_id, content, question_order, theme, story_id)
-                    VALUES (:uid, :cnt, 1, :thm, 1)
-                    RETURNING id
-                """),
-                {"uid": user_id, "cnt": first_question, "thm": first_theme},
-            ).fetchone()[0]
-            conn.commit()
-            return jsonify({
-                "question": {
-                    "id": new_id,
-                    "content": first_question,
-                    "theme": first_theme,
-                    "story_id": 1,
-                    "question_order": 1,
-                }
-            })
-
-        # 已有題目→直接回給前端
-        qid, content, theme, story_id, order = row
+    with READ_ENGINE.connect() as conn:
+        row = repos.questions.latest(conn, user_id)
+
+    # 若還沒出第一題→產生初始主題／問題
+    if row is None:
+        first_theme = THEMES[0]
+        first_question = f"在你的{first_theme}中，你最難忘的回憶是什麼？"
+        with WRITE_ENGINE.begin() as conn:
+            new_id = repos.questions.create(conn, user_id, first_question, 1, first_theme, 1)
+            repos.progress.record_question(conn, user_id, first_theme, 1)
         return jsonify({
             "question": {
-                "id": qid,
-                "content": content,
-                "theme": theme,
-                "story_id": story_id,
-                "question_order": order,
+                "id": new_id,
+                "content": first_question,
+                "theme": first_theme,
+                "story_id": 1,
+                "question_order": 1,
             }
         })
 
+    # 已有題目→直接回給前端
+    qid, content, theme, story_id, order = row
+    return jsonify({
+        "question": {
+            "id": qid,
+            "content": content,
+            "theme": theme,
+            "story_id": story_id,
+            "question_order": order,
+        }
+    })
+
 
 @biography_bp.route('/progress', methods=['GET'])
 @token_required
 def get_progress():
     user_id = request.user_id
-    with ENGINE.connect() as conn:
-        answered = conn.execute(
-            text("SELECT COUNT(*) FROM answers WHERE user_id=:uid"),
-            {"uid": user_id}
-        ).fetchone()[0]
-
-        total_questions = len(THEMES) * MAX_QUESTIONS_PER_THEME
-        theme_coverage = answered / total_questions if total_questions else 0
-
-        avg_aqi = conn.execute(
-            text("SELECT AVG((detail_score+emotion_score+reflection_score)/3) FROM answers "
-                 "WHERE user_id=:uid"),
-            {"uid": user_id}
-        ).fetchone()[0] or 0
-
-        total_length = conn.execute(
-            text("SELECT COALESCE(SUM(length),0) FROM answers WHERE user_id=:uid"),
-            {"uid": user_id}
-        ).fetchone()[0]
+    with READ_ENGINE.connect() as conn:
+        # user_progress 隨每次寫入遞增，這裡只做主鍵查找
+        stats = repos.progress.get(conn, user_id)
+        pending_scores = scoring_queue.pending_count(conn, user_id)
+
+    answered = stats["answered"]
+    total_questions = len(THEMES) * MAX_QUESTIONS_PER_THEME
+    theme_coverage = answered / total_questions if total_questions else 0
 
     return jsonify({
         "answered": answered,
         "remaining": total_questions - answered,
         "theme_coverage": theme_coverage,
-        "avg_aqi": avg_aqi,
-        "total_length": total_length
+        "avg_aqi": stats["avg_aqi"],
+        "total_length": stats["total_length"],
+        "pending_scores": pending_scores  # 仍在等待背景評分的回答數
     }), 200
 
 @biography_bp.route('/preview', methods=['GET'])
 @token_required
 def preview_biography():
     user_id = request.user_id
-    with ENGINE.connect() as conn:
+    with READ_ENGINE.connect() as conn:
         # 獲取最新自傳
-        result = conn.execute(
-            text("SELECT id, content, style, created_at FROM biographies WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 1"),
-            {"user_id": user_id}
-        )
-        biography = result.fetchone()
+        biography = repos.biographies.latest(conn, user_id)
         if not biography:
             return jsonify({"error": "No biography generated yet"}), 404
 
@@ -567,39 +610,23 @@ def edit_biography():
     if not biography_id or (not new_content and new_title is None):
         return jsonify({"error": "Biography ID and new content or title are required"}), 400
 
-    update_fields = []
-    params = {"biography_id": biography_id, "user_id": user_id}
-
+    with WRITE_ENGINE.begin() as conn:
+        updated = repos.biographies.update(conn, biography_id, user_id, content=new_content, title=new_title)
+    if updated == 0:
+        return jsonify({"error": "Biography not found or unauthorized"}), 404
     if new_content:
-        update_fields.append("content = :content")
-        params["content"] = new_content
-
-    if new_title is not None:
-        update_fields.append("title = :title")
-        params["title"] = new_title
-
-    with ENGINE.connect() as conn:
-        result = conn.execute(
-            text(f"UPDATE biographies SET {', '.join(update_fields)} WHERE id = :biography_id AND user_id = :user_id"),
-            params
-        )
-        if result.rowcount == 0:
-            return jsonify({"error": "Biography not found or unauthorized"}), 404
-        conn.commit()
+        export.invalidate(biography_id)
     return jsonify({"message": "Biography updated successfully"}), 200
     
 @biography_bp.route('/versions', methods=['GET'])
 @token_required
 def list_biography_versions():
     user_id = request.user_id
-    with ENGINE.connect() as conn:
+    with READ_ENGINE.connect() as conn:
         # 獲取所有自傳版本
-        result = conn.execute(
-            text("SELECT id, title, style, language, created_at FROM biographies WHERE user_id = :user_id ORDER BY created_at DESC"),
-            {"user_id": user_id}
-        )
+        rows = repos.biographies.versions(conn, user_id)
 
-        versions = [{"id": row[0], "title": row[1], "style": row[2], "language": row[3], "created_at": row[4].isoformat() if isinstance(row[4], datetime) else str(row[4])} for row in result.fetchall()]
+        versions = [{"id": row[0], "title": row[1], "style": row[2], "language": row[3], "created_at": row[4].isoformat() if isinstance(row[4], datetime) else str(row[4])} for row in rows]
 
 
         if not versions:
@@ -607,37 +634,46 @@ def list_biography_versions():
 
         return jsonify({"versions": versions}), 200
 
+@biography_bp.route('/export-all', methods=['GET'])
+@token_required
+def export_all_biographies():
+    """所有版本打包成 ZIP，邊產生邊串流（format：txt / md / pdf）"""
+    user_id = request.user_id
+    format = request.args.get('format', 'pdf')
+    if format not in export.ARCHIVE_FORMATS:
+        return jsonify({"error": "Unsupported format"}), 400
+
+    with READ_ENGINE.connect() as conn:
+        if not repos.biographies.page(conn, user_id, 0, 1):
+            return jsonify({"error": "No biographies found"}), 404
+
+    return Response(
+        export.stream_zip(user_id, format),
+        mimetype='application/zip',
+        headers={"Content-Disposition": f'attachment; filename="biographies_{format}.zip"'},
+    )
+
+
 @biography_bp.route('/export/<int:biography_id>', methods=['GET'])
 @token_required
 def export_biography(biography_id):
     user_id = request.user_id
     format = request.args.get('format', 'pdf')  # 預設 PDF，可選 'txt'
 
-    with ENGINE.connect() as conn:
+    with READ_ENGINE.connect() as conn:
         # 獲取指定自傳
-        result = conn.execute(
-            text("SELECT content, style, language FROM biographies WHERE id = :biography_id AND user_id = :user_id"),
-            {"biography_id": biography_id, "user_id": user_id}
-        )
-        biography = result.fetchone()
-        if not biography:
-            return jsonify({"error": "Biography not found or unauthorized"}), 404
-
-        content, style, language = biography
-        filename = f"biography_{biography_id}_{style}_{language}"
-
-        if format == 'pdf':
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            styles = getSampleStyleSheet()
-            story = [Paragraph(content.replace('\n', '<br/>'), styles['Normal'])]
-            doc.build(story)
-            buffer.seek(0)
-            return send_file(buffer, as_attachment=True, download_name=f"{filename}.pdf", mimetype='application/pdf')
-        elif format == 'txt':
-            buffer = io.BytesIO(content.encode('utf-8'))
-            buffer.seek(0)
-            return send_file(buffer, as_attachment=True, download_name=f"{filename}.txt", mimetype='text/plain')
-        else:
-            return jsonify({"error": "Unsupported format"}), 400
+        biography = repos.biographies.get(conn, biography_id, user_id)
+    if not biography:
+        return jsonify({"error": "Biography not found or unauthorized"}), 404
+
+    content, style, language = biography
+    if format not in export.FORMATS:
+        return jsonify({"error": "Unsupported format"}), 400
+
+    # 內容未變時直接回傳磁碟上的既有檔案；If-None-Match 相符時回 304
+    path, etag = export.get_or_render(biography_id, content, format)
+    response = send_file(path, as_attachment=True, download_name=f"biography_{biography_id}_{style}_{language}.{format}",
+                         mimetype=export.MIMETYPES[format], etag=etag, conditional=True)
+    response.cache_control.private = True
+    return response
     
\ No newline at end of file
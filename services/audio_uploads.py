@@ -0,0 +1,199 @@
+# services/audio_uploads.py
+"""
+音訊分塊 / 續傳上傳
+--------------------------------------------------
+檔案放在 AUDIO_UPLOAD_DIR/<user_id>/，不同用戶、同名檔案不會互相覆蓋：
+- create()：建立上傳，回傳 upload_id（<upload_id>.part + <upload_id>.json）
+- append()：在指定 offset 寫入一塊；offset 可小於已收到的長度（重送同一塊無害），
+  大於時拋 OffsetMismatch，前端以 status() 取得 received 後從該處續傳
+- complete()：收齊後計算 sha256，改名為 <sha256><副檔名>，之後以雜湊指稱這個檔案
+save_stream() 供一次上傳整個檔案的舊端點使用，同樣以內容雜湊命名。
+超過 AUDIO_UPLOAD_TTL 未寫入（上傳中的以最後一塊的寫入時間為準）或未轉錄的檔案
+在該用戶下次建立上傳時清除。
+"""
+from __future__ import annotations
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+import config
+
+CHUNK_SIZE = 64 * 1024  # 讀寫緩衝
+DEFAULT_EXT = ".webm"  # 前端 MediaRecorder 的格式
+
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_EXT_RE = re.compile(r"^\.[a-z0-9]{1,5}$")
+
+
+class UploadError(Exception):
+    """請求內容不正確（400）"""
+
+
+class UploadNotFound(UploadError):
+    pass
+
+
+class UploadTooLarge(UploadError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, received: int):
+        super().__init__(f"Upload out of order or incomplete, {received} bytes received")
+        self.received = received
+
+
+def _user_dir(user_id: int) -> str:
+    return os.path.join(config.AUDIO_UPLOAD_DIR, str(int(user_id)))
+
+
+def _ext(filename: str | None) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _EXT_RE.match(ext) else DEFAULT_EXT
+
+
+def _paths(user_id: int, upload_id: str) -> tuple[str, str]:
+    if not _UPLOAD_ID_RE.match(upload_id or ""):
+        raise UploadNotFound("Unknown upload")
+    base = os.path.join(_user_dir(user_id), upload_id)
+    return base + ".part", base + ".json"
+
+
+def _load_meta(meta_path: str) -> dict:
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadNotFound("Unknown upload")
+
+
+def _last_write(path: str) -> float:
+    """.json 建立後不再修改，上傳中的檔案以同一上傳 .part 的最後寫入時間為準"""
+    base, ext = os.path.splitext(path)
+    if ext == ".json":
+        try:
+            return os.path.getmtime(base + ".part")
+        except FileNotFoundError:
+            pass
+    return os.path.getmtime(path)
+
+
+def purge_stale(user_id: int) -> None:
+    cutoff = time.time() - config.AUDIO_UPLOAD_TTL
+    for path in glob.glob(os.path.join(_user_dir(user_id), "*")):
+        try:
+            if _last_write(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def create(user_id: int, filename: str | None, size: int) -> dict:
+    if size <= 0:
+        raise UploadError("size must be positive")
+    if size > config.AUDIO_MAX_BYTES:
+        raise UploadTooLarge(f"Audio larger than {config.AUDIO_MAX_BYTES} bytes")
+    purge_stale(user_id)
+    os.makedirs(_user_dir(user_id), exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _paths(user_id, upload_id)
+    open(part_path, "wb").close()
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"ext": _ext(filename), "size": size}, f)
+    return {"upload_id": upload_id, "size": size, "received": 0, "chunk_size": config.AUDIO_CHUNK_SIZE}
+
+
+def status(user_id: int, upload_id: str) -> dict:
+    part_path, meta_path = _paths(user_id, upload_id)
+    meta = _load_meta(meta_path)
+    try:
+        received = os.path.getsize(part_path)
+    except FileNotFoundError:
+        raise UploadNotFound("Unknown upload")
+    return {"upload_id": upload_id, "size": meta["size"], "received": received}
+
+
+def append(user_id: int, upload_id: str, offset: int, stream) -> int:
+    """從 offset 寫入 stream 的內容，回傳目前已收到的長度"""
+    part_path, meta_path = _paths(user_id, upload_id)
+    size = _load_meta(meta_path)["size"]
+    received = status(user_id, upload_id)["received"]
+    if offset < 0 or offset > received:
+        raise OffsetMismatch(received)
+
+    position = offset
+    with open(part_path, "r+b") as f:
+        f.seek(offset)
+        while chunk := stream.read(CHUNK_SIZE):
+            if position + len(chunk) > size:
+                raise UploadTooLarge("Chunk goes past the declared size")
+            f.write(chunk)
+            position += len(chunk)
+    return max(received, position)
+
+
+def _finalize(user_id: int, tmp_path: str, digest: str, ext: str) -> str:
+    final = os.path.join(_user_dir(user_id), digest + ext)
+    os.replace(tmp_path, final)  # 同一內容重複上傳時直接覆蓋
+    return digest
+
+
+def complete(user_id: int, upload_id: str) -> str:
+    """收齊後改名為內容雜湊，回傳 audio_hash"""
+    part_path, meta_path = _paths(user_id, upload_id)
+    meta = _load_meta(meta_path)
+    received = status(user_id, upload_id)["received"]
+    if received != meta["size"]:
+        raise OffsetMismatch(received)
+
+    h = hashlib.sha256()
+    with open(part_path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    digest = _finalize(user_id, part_path, h.hexdigest(), meta["ext"])
+    os.remove(meta_path)
+    return digest
+
+
+def save_stream(user_id: int, filename: str | None, stream) -> str:
+    """一次上傳的整個檔案：邊寫入邊計算雜湊，回傳 audio_hash"""
+    os.makedirs(_user_dir(user_id), exist_ok=True)
+    h = hashlib.sha256()
+    written = 0
+    fd, tmp_path = tempfile.mkstemp(dir=_user_dir(user_id), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := stream.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > config.AUDIO_MAX_BYTES:
+                    raise UploadTooLarge(f"Audio larger than {config.AUDIO_MAX_BYTES} bytes")
+                h.update(chunk)
+                f.write(chunk)
+        return _finalize(user_id, tmp_path, h.hexdigest(), _ext(filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def path_for(user_id: int, audio_hash: str) -> str:
+    if not _HASH_RE.match(audio_hash or ""):
+        raise UploadNotFound("Unknown audio")
+    matches = glob.glob(os.path.join(_user_dir(user_id), audio_hash + ".*"))
+    if not matches:
+        raise UploadNotFound("Unknown audio")
+    return matches[0]
+
+
+def discard(user_id: int, audio_hash: str) -> None:
+    """轉錄成功後刪除音檔（逐字稿已進快取）"""
+    try:
+        os.remove(path_for(user_id, audio_hash))
+    except (UploadNotFound, FileNotFoundError):
+        pass
@@ -0,0 +1,196 @@
+# services/auth.py
+"""
+JWT 驗證中介層（所有 blueprint 共用）
+--------------------------------------------------
+- token_required：驗證 Authorization: Bearer <token>，成功後設定 request.user_id
+- 驗證過的 token 以 sha256(token) 為鍵放進有上限的 LRU 快取，直到 token 的 exp，
+  /progress、/generate/jobs/<id> 等輪詢端點不必每次重算 HMAC 與解析 JSON
+- 撤銷清單以 jti 為鍵放在記憶體 dict（O(1) 查詢），實際紀錄存在 revoked_tokens，
+  背景執行緒每 AUTH_REVOCATION_SYNC 秒重新讀取所有未過期的紀錄，其他 worker / 主機的登出也會生效
+  （過期紀錄在登出時清除，表只包含 AUTH_TOKEN_TTL 內的登出，整批讀取的成本很低）
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+import jwt
+from flask import jsonify, request
+
+import config
+from db import READ_ENGINE, WRITE_ENGINE
+from repositories import repos
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+_JWT = jwt.PyJWT()  # 共用同一個 decoder，不必每次建立
+
+
+class TokenRevoked(jwt.InvalidTokenError):
+    pass
+
+
+class TokenCache:
+    """token 雜湊 → claims 的 LRU 快取；取出時已過 exp 的項目視同不存在"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            claims = self._items.get(key)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return claims
+
+    def set(self, key: str, claims: dict) -> None:
+        with self._lock:
+            self._items[key] = claims
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class RevocationList:
+    """記憶體中的已撤銷 jti；背景執行緒定期從 revoked_tokens 同步，請求路徑只查 dict"""
+
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self._revoked: dict[str, int] = {}  # jti → exp
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def sync(self) -> None:
+        now = int(time.time())
+        with READ_ENGINE.connect() as conn:
+            rows = repos.revoked_tokens.active(conn, now)
+        with self._lock:
+            # 與現有項目合併而非取代：本 process 剛登出、讀取時還沒提交的 jti 不會被蓋掉
+            for jti, expires_at in rows:
+                self._revoked[jti] = expires_at
+            self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+
+    def add(self, jti: str, expires_at: int) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Revocation sync error: {str(e)}")
+
+    def start(self) -> None:
+        """先同步一次再啟動背景執行緒（每個 process 只啟動一次）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="revocation-sync", daemon=True)
+        self.sync()
+        self._thread.start()
+
+
+_cache = TokenCache(config.AUTH_CACHE_SIZE)
+_revoked = RevocationList(config.AUTH_REVOCATION_SYNC)
+
+
+def start_revocation_sync() -> None:
+    """app 啟動（遷移完成）後呼叫"""
+    _revoked.start()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_token(user_id: int) -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {
+            "user_id": user_id,
+            "iat": now,
+            "exp": now + config.AUTH_TOKEN_TTL,
+            "jti": uuid.uuid4().hex,
+        },
+        config.SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+
+def verify(token: str) -> dict:
+    """
+    回傳 claims；過期拋 jwt.ExpiredSignatureError，撤銷拋 TokenRevoked，
+    其他無效情況拋 jwt.InvalidTokenError。
+    """
+    key = _token_key(token)
+    claims = _cache.get(key)
+    if claims is None:
+        claims = _JWT.decode(token, config.SECRET_KEY, algorithms=[ALGORITHM])
+        if "exp" not in claims:
+            raise jwt.InvalidTokenError("Token has no expiry")
+        _cache.set(key, claims)
+    # 舊版 token 沒有 jti，以 token 雜湊作為撤銷鍵
+    if _revoked.is_revoked(claims.get("jti", key)):
+        raise TokenRevoked("Token has been revoked")
+    return claims
+
+
+def revoke(token: str, claims: dict) -> None:
+    """登出：寫入撤銷清單（到 token 過期為止）並移出本 process 的快取"""
+    key = _token_key(token)
+    jti = claims.get("jti", key)
+    with WRITE_ENGINE.begin() as conn:
+        repos.revoked_tokens.add(conn, jti, claims["user_id"], int(claims["exp"]))
+        repos.revoked_tokens.purge_expired(conn, int(time.time()))
+    _revoked.add(jti, int(claims["exp"]))
+    _cache.discard(key)
+
+
+def bearer_token() -> str | None:
+    header = request.headers.get('Authorization')
+    if not header or not header.startswith('Bearer '):
+        return None
+    return header.split(" ")[1]
+
+
+def token_required(f):
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        token = bearer_token()
+        if not token:
+            return jsonify({"error": "Token is missing"}), 401
+        try:
+            claims = verify(token)
+        except jwt.ExpiredSignatureError:
+            return jsonify({"error": "Token has expired"}), 401
+        except TokenRevoked:
+            return jsonify({"error": "Token has been revoked"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "Invalid token"}), 401
+        request.user_id = claims['user_id']
+        request.token_claims = claims
+        return f(*args, **kwargs)
+    return decorator
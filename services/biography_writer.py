@@ -0,0 +1,179 @@
+# services/biography_writer.py
+"""
+自傳生成的共用步驟
+--------------------------------------------------
+/generate、/generate/stream、/generate/batch 與背景工作共用：讀取問答 → 檢查資料量 → 生成 → 寫入 biographies。
+BIOGRAPHY_ENGINE=single（預設）時整份問答放入單一 prompt，素材由 context_builder 依 token 預算整理
+（必要時改用故事 / 主題摘要），/generate/stream 逐 token 串流；
+sections 時由 section_writer 逐故事平行寫段落再串接，只重寫內容變動的故事，串流以整段為單位。
+regenerate=true 時略過快取重新生成，並覆寫快取中的舊結果。
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator
+
+import config
+from repositories import repos
+from services import llm, context_builder, section_writer
+
+MIN_ANSWERS = 5
+MIN_TOTAL_LENGTH = 200
+MAX_OPTION_CHARS = 100  # 文字參數會直接放進 prompt，限制長度
+MAX_TEMPERATURE = 2.0   # OpenAI 允許的上限
+MAX_VARIANTS = 6  # /generate/batch 單次請求的版本數上限
+
+_TEXT_OPTIONS = {
+    "style": "自然",
+    "language": "中文",
+    "length": "500 字",
+    "usage": "個人紀錄",
+    "emotion": "積極",
+    "aim": "展示個人經歷",
+}
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.LLM_MAX_WORKERS, thread_name_prefix="variants")
+
+
+class InvalidOptions(ValueError):
+    """請求參數格式錯誤，routes 回傳 400"""
+
+
+def parse_options(data: dict) -> dict:
+    """請求參數與預設值；格式錯誤時拋出 InvalidOptions"""
+    opts = {}
+    for name, default in _TEXT_OPTIONS.items():
+        value = data.get(name, default)
+        if isinstance(value, int) and not isinstance(value, bool) and name == "length":
+            value = f"{value} 字"
+        if not isinstance(value, str) or not value.strip() or len(value) > MAX_OPTION_CHARS:
+            raise InvalidOptions(f"{name} must be a non-empty string of at most {MAX_OPTION_CHARS} characters")
+        opts[name] = value.strip()
+    temperature = data.get('temperature', 0.9)
+    if isinstance(temperature, bool) or not isinstance(temperature, (int, float, str)):
+        raise InvalidOptions("temperature must be a number")
+    try:
+        temperature = float(temperature)
+    except ValueError:
+        raise InvalidOptions("temperature must be a number") from None
+    if not 0 <= temperature <= MAX_TEMPERATURE:  # 同時排除 NaN
+        raise InvalidOptions(f"temperature must be between 0 and {MAX_TEMPERATURE:g}")
+    opts["temperature"] = temperature  # 0 時結果可重現並走 LLM 快取
+    regenerate = data.get("regenerate", False)
+    if not isinstance(regenerate, bool):
+        raise InvalidOptions("regenerate must be a boolean")
+    opts["regenerate"] = regenerate
+    return opts
+
+
+def load_qa_data(conn, user_id: int) -> list[dict]:
+    return [
+        {
+            "theme": row[0],
+            "story_id": row[1],
+            "question": row[2],
+            "answer": row[3] or "未回答",
+            "image_path": row[4],  # 可能為 None
+            "detail_score": row[5],
+            "emotion_score": row[6],
+            "reflection_score": row[7],
+            "redundancy": row[8],
+        }
+        for row in repos.questions.transcript(conn, user_id)
+    ]
+
+
+def check_sufficient(qa_data: list[dict]) -> str | None:
+    """資料不足時回傳錯誤訊息，足夠則回傳 None"""
+    if not qa_data:
+        return "No data available to generate biography"
+    answered = [qa["answer"] for qa in qa_data if qa["answer"] != "未回答"]
+    if len(answered) < MIN_ANSWERS or sum(len(a) for a in answered) < MIN_TOTAL_LENGTH:
+        return "Insufficient data for biography generation"
+    return None
+
+
+def build_prompt(qa_data: list[dict], opts: dict, qa_text: str | None = None) -> str:
+    # 問答素材（逐字稿或摘要），總長不超過 CONTEXT_TOKEN_BUDGET；多版本生成時由呼叫端先算好傳入
+    if qa_text is None:
+        qa_text = context_builder.build_context(qa_data)
+
+    return (
+        f"{qa_text}\n根據這份逐字稿/素材，請幫我改寫成一篇自傳，風格為{opts['style']}，"
+        f"字數{opts['length']}以上，用途為{opts['usage']}明確，具備{opts['emotion']}的情感，"
+        f"內容需保留真實感與可讀性，目的是{opts['aim']}。"
+        "如果有相關圖片路徑，請在適當段落中以 ![圖片說明](圖片路徑) 的 markdown 格式嵌入圖片。"
+    )
+
+
+def llm_params(opts: dict) -> dict:
+    """傳給 llm.chat / llm.chat_stream 的參數"""
+    return {
+        "model": "gpt-4o",
+        "max_tokens": 800,
+        "temperature": opts["temperature"],
+        "refresh": opts.get("regenerate", False),  # 舊的背景工作參數沒有這個欄位
+    }
+
+
+def write(qa_data: list[dict], opts: dict) -> str:
+    """生成完整自傳內容；LLM 錯誤直接往外拋"""
+    if config.BIOGRAPHY_ENGINE == "sections":
+        return section_writer.write(qa_data, opts)
+    return llm.chat(messages=[{"role": "user", "content": build_prompt(qa_data, opts)}], **llm_params(opts))
+
+
+def write_stream(qa_data: list[dict], opts: dict) -> Iterator[str]:
+    """逐段 yield 自傳內容（sections 為逐個故事，single 為逐個 token）"""
+    if config.BIOGRAPHY_ENGINE == "sections":
+        return section_writer.write_stream(qa_data, opts)
+    return llm.chat_stream(messages=[{"role": "user", "content": build_prompt(qa_data, opts)}], **llm_params(opts))
+
+
+def parse_variants(data: dict) -> tuple[list[dict], str | None]:
+    """
+    /generate/batch 的 variants：每項可覆寫 style / language / length 等參數，其餘沿用請求層級的值
+    回傳 (各版本參數, 錯誤訊息)
+    """
+    variants = data.get('variants')
+    if not isinstance(variants, list) or not variants:
+        return [], "variants must be a non-empty list"
+    if len(variants) > MAX_VARIANTS:
+        return [], f"At most {MAX_VARIANTS} variants per request"
+    if not all(isinstance(v, dict) for v in variants):
+        return [], "Each variant must be an object"
+    base = {k: v for k, v in data.items() if k != 'variants'}
+    try:
+        return [parse_options({**base, **v}) for v in variants], None
+    except InvalidOptions as e:
+        return [], str(e)
+
+
+def write_many(qa_data: list[dict], variants: list[dict]) -> list[str]:
+    """
+    一次生成多個版本，回傳順序與 variants 相同；任何一個失敗即往外拋
+    問答素材只整理一次，各版本同時送出，同時呼叫數仍受 llm 的併發上限限制。
+    """
+    if config.BIOGRAPHY_ENGINE == "sections":
+        return section_writer.write_many(qa_data, variants)
+    qa_text = context_builder.build_context(qa_data)
+    return list(_EXECUTOR.map(
+        lambda opts: llm.chat(
+            messages=[{"role": "user", "content": build_prompt(qa_data, opts, qa_text)}],
+            **llm_params(opts)
+        ),
+        variants,
+    ))
+
+
+def save_biography(conn, user_id: int, content: str, opts: dict) -> dict:
+    """寫入 biographies，回傳 API 使用的 biography 物件"""
+    now = datetime.now()
+    biography_id = repos.biographies.create(conn, user_id, content, opts["style"], opts["language"], now)
+    return {
+        "id": biography_id,
+        "content": content,
+        "style": opts["style"],
+        "language": opts["language"],
+        "created_at": now.isoformat()
+    }
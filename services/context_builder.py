@@ -0,0 +1,221 @@
+# services/context_builder.py
+"""
+自傳生成的問答素材（token 預算）
+--------------------------------------------------
+把使用者的問答整理成 prompt 素材，總長不超過 CONTEXT_TOKEN_BUDGET：
+0. 全部放得下就逐字放入（未回答的題目不列入）
+1. 去掉與同主題先前回答高度重複的回答（redundancy ≥ REDUNDANT_AT，每個故事至少留一筆）
+2. 依故事排名由低到高改成故事摘要，直到估計長度放得下
+3. 仍超出時依主題排名由低到高改成主題摘要（由該主題的故事摘要再摘要）
+4. 最後保險：截斷到預算內
+排名 = 三項分數平均 ×（1 − redundancy）；分數尚未回填時以 0.5 計。
+摘要走 llm.chat（temperature 0、強制快取），快取鍵涵蓋摘要輸入，
+重複生成時只有內容變動的故事 / 主題需要重新摘要。摘要失敗時改用排名最高的回答節錄，不讓生成失敗。
+token 以 tiktoken 計算（有安裝時），否則以中日韓字元 1 token、其他字元 4 字 1 token 估算。
+"""
+from __future__ import annotations
+import logging
+import math
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from services import llm
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # 未安裝或無法下載編碼表
+    _ENCODING = None
+
+logger = logging.getLogger(__name__)
+
+REDUNDANT_AT = 0.5  # redundancy 為 MinHash 的 Jaccard 估計值，改寫重講約 0.5~0.75
+STORY_SUMMARY_TOKENS = 250
+THEME_SUMMARY_TOKENS = 400
+NEUTRAL_SCORE = 0.5
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.LLM_MAX_WORKERS, thread_name_prefix="context")
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def answer_rank(qa: dict) -> float:
+    scores = [qa[k] for k in ("detail_score", "emotion_score", "reflection_score") if qa.get(k) is not None]
+    quality = sum(scores) / len(scores) if scores else NEUTRAL_SCORE
+    return quality * (1 - (qa.get("redundancy") or 0))
+
+
+def image_lines(qas: list[dict]) -> str:
+    lines = ""
+    for qa in qas:
+        if qa["image_path"]:
+            fixed_path = qa["image_path"].replace("\\", "/")
+            lines += f"相關圖片：{fixed_path}\n"
+    return lines
+
+
+def render_answers(qas: list[dict]) -> str:
+    text = ""
+    for qa in qas:
+        text += f"主題：{qa['theme']}\n問題：{qa['question']}\n回答：{qa['answer']}\n"
+        text += image_lines([qa])
+        text += "\n"
+    return text
+
+
+def _render_summary(label: str, summary: str, qas: list[dict]) -> str:
+    return f"{label}摘要：\n{summary}\n{image_lines(qas)}\n"
+
+
+def _extract(qas: list[dict], max_tokens: int) -> str:
+    """摘要失敗時的退路：依排名節錄回答到 max_tokens"""
+    out = ""
+    for qa in sorted(qas, key=answer_rank, reverse=True):
+        piece = qa["answer"].strip() + "\n"
+        if count_tokens(out + piece) > max_tokens:
+            break
+        out += piece
+    return out.strip() or truncate(qas[0]["answer"], max_tokens)
+
+
+def _summarize(prompt: str, max_tokens: int, fallback) -> str:
+    try:
+        return llm.chat(
+            messages=[{"role": "user", "content": prompt}],
+            model=config.CONTEXT_SUMMARY_MODEL,
+            temperature=0,
+            max_tokens=max_tokens,
+            cache=True,
+        )
+    except Exception as e:
+        logger.warning(f"Context summary failed, using extract: {str(e)}")
+        return fallback()
+
+
+def summarize_story(theme: str, qas: list[dict]) -> str:
+    ranked = sorted(qas, key=answer_rank, reverse=True)
+    limit = STORY_SUMMARY_TOKENS
+    prompt = (
+        f"以下是受訪者在「{theme}」主題中同一段故事的問答，依重要性排序。"
+        f"請以第一人稱整理成約 {limit} 個 token 以內的摘要，保留具體的人物、地點、時間與情感細節，"
+        "不要加入問答中沒有的內容，只輸出摘要本身。\n\n"
+        + render_answers(ranked)
+    )
+    return _summarize(prompt, limit, lambda: _extract(qas, limit))
+
+
+def summarize_theme(theme: str, story_summaries: list[str], qas: list[dict]) -> str:
+    limit = THEME_SUMMARY_TOKENS
+    prompt = (
+        f"以下是受訪者在「{theme}」主題下各段故事的摘要。"
+        f"請合併成約 {limit} 個 token 以內的第一人稱摘要，保留最具體、最有情感的細節，只輸出摘要本身。\n\n"
+        + "\n\n".join(story_summaries)
+    )
+    return _summarize(prompt, limit, lambda: _extract(qas, limit))
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:  # 二分找出最長可放入的前綴
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def build_context(qa_data: list[dict], budget: int | None = None) -> str:
+    """回傳放入 prompt 的問答素材（依主題、故事順序）"""
+    budget = config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    stories: OrderedDict[tuple, list[dict]] = OrderedDict()
+    for qa in qa_data:
+        if qa["answer"] != "未回答":
+            stories.setdefault((qa["theme"], qa.get("story_id")), []).append(qa)
+    if not stories:
+        return ""
+
+    # ---------- 0. 全部逐字 ----------
+    blocks = {key: render_answers(qas) for key, qas in stories.items()}
+    cost = {key: count_tokens(text) for key, text in blocks.items()}
+    if sum(cost.values()) <= budget:
+        return "".join(blocks.values())
+
+    # ---------- 1. 去掉高度重複的回答 ----------
+    for key, qas in stories.items():
+        best = max(qas, key=answer_rank)
+        kept = [qa for qa in qas if qa is best or (qa.get("redundancy") or 0) < REDUNDANT_AT]
+        if len(kept) < len(qas):
+            stories[key] = kept
+            blocks[key] = render_answers(kept)
+            cost[key] = count_tokens(blocks[key])
+    if sum(cost.values()) <= budget:
+        return "".join(blocks.values())
+
+    # ---------- 2. 低排名故事改為摘要 ----------
+    # 摘要長度受 max_tokens 限制，可先估算需要摘要哪些故事，再平行呼叫
+    story_rank = {key: sum(map(answer_rank, qas)) / len(qas) for key, qas in stories.items()}
+    to_summarize = []
+    estimate = sum(cost.values())
+    for key in sorted(stories, key=story_rank.get):
+        if estimate <= budget:
+            break
+        summary_cost = STORY_SUMMARY_TOKENS + count_tokens(image_lines(stories[key])) + 10
+        if summary_cost < cost[key]:
+            to_summarize.append(key)
+            estimate += summary_cost - cost[key]
+    story_summaries = dict(zip(
+        to_summarize,
+        _EXECUTOR.map(lambda key: summarize_story(key[0], stories[key]), to_summarize),
+    ))
+    for key, summary in story_summaries.items():
+        blocks[key] = _render_summary(f"主題：{key[0]}（故事 {key[1]}）", summary, stories[key])
+        cost[key] = count_tokens(blocks[key])
+    if sum(cost.values()) <= budget:
+        return "".join(blocks.values())
+
+    # ---------- 3. 低排名主題改為主題摘要 ----------
+    themes: OrderedDict[str, list[tuple]] = OrderedDict()
+    for key in stories:
+        themes.setdefault(key[0], []).append(key)
+    theme_rank = {t: sum(story_rank[k] for k in keys) / len(keys) for t, keys in themes.items()}
+    theme_blocks = {t: "".join(blocks[k] for k in keys) for t, keys in themes.items()}
+    theme_cost = {t: sum(cost[k] for k in keys) for t, keys in themes.items()}
+    to_merge = []
+    estimate = sum(theme_cost.values())
+    for theme in sorted(themes, key=theme_rank.get):
+        if estimate <= budget:
+            break
+        to_merge.append(theme)
+        estimate += THEME_SUMMARY_TOKENS - theme_cost[theme]
+    # 主題摘要以故事摘要為輸入：補齊要合併的主題中尚未摘要的故事
+    missing = [k for t in to_merge for k in themes[t] if k not in story_summaries]
+    story_summaries.update(zip(
+        missing,
+        _EXECUTOR.map(lambda key: summarize_story(key[0], stories[key]), missing),
+    ))
+    theme_qas = {t: [qa for k in themes[t] for qa in stories[k]] for t in to_merge}
+    merged = _EXECUTOR.map(
+        lambda t: summarize_theme(t, [story_summaries[k] for k in themes[t]], theme_qas[t]),
+        to_merge,
+    )
+    for theme, summary in zip(to_merge, merged):
+        theme_blocks[theme] = _render_summary(f"主題：{theme}", summary, theme_qas[theme])
+
+    # ---------- 4. 保險 ----------
+    context = "".join(theme_blocks.values())
+    if count_tokens(context) > budget:
+        logger.warning(f"Context still over budget after theme summaries, truncating to {budget} tokens")
+        context = truncate(context, budget)
+    return context
@@ -0,0 +1,30 @@
+# services/db_metrics.py
+"""
+每個請求的 SQL 陳述式計數
+--------------------------------------------------
+在所有 Engine 的 before_cursor_execute 上計數，存在 flask.g；
+回應帶 X-SQL-Statements header，方便壓測與基準腳本檢查陳述式預算。
+背景 worker 不在請求中，不列入計數。
+"""
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    # 交易控制（db.py 的 BEGIN IMMEDIATE）不算在陳述式預算內
+    if has_request_context() and not statement.startswith(("BEGIN", "COMMIT", "ROLLBACK")):
+        g.sql_statements = g.get("sql_statements", 0) + 1
+
+
+def statement_count() -> int:
+    """目前請求已執行的陳述式數"""
+    return g.get("sql_statements", 0)
+
+
+def init_app(app) -> None:
+    @app.after_request
+    def _add_header(response):
+        response.headers["X-SQL-Statements"] = str(statement_count())
+        return response
@@ -0,0 +1,278 @@
+# services/export.py
+"""
+自傳匯出（PDF / TXT）與磁碟快取
+--------------------------------------------------
+- 產物存於 EXPORT_CACHE_DIR/<biography_id>/<內容雜湊>.<格式>，
+  雜湊涵蓋內容、格式與排版參數，內容不變時直接回傳既有檔案，雜湊同時作為 ETag
+- /edit 修改內容後呼叫 invalidate() 刪除該自傳的舊產物
+- PDF 逐段產生 Flowable（標題 / 段落 / 圖片），使用可換行的中文字型，
+  不再把全文塞進單一 Paragraph
+- markdown 圖片 ![說明](路徑) 以檔名對應到 static/uploads，嵌入的是 services.images 的 pdf 尺寸版本
+同一份產物同時只會有一個執行緒在產生，其他請求等待後直接使用結果。
+stream_zip() 把使用者所有版本邊產生邊寫成 ZIP 串流：分批讀取版本、逐檔分塊寫入，
+記憶體用量與版本數量無關。
+"""
+from __future__ import annotations
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+import config
+from db import READ_ENGINE
+from repositories import repos
+from services import images
+
+logger = logging.getLogger(__name__)
+
+MIMETYPES = {"pdf": "application/pdf", "txt": "text/plain"}
+ARCHIVE_FORMATS = ("txt", "md", "pdf")
+ARCHIVE_PAGE_SIZE = 20  # 每次從資料庫讀取的版本數
+CHUNK_SIZE = 64 * 1024
+RENDER_VERSION = "2"  # 排版邏輯變更時遞增，讓舊快取自然失效
+
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(([^)\s]+)\)")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+
+_font_lock = threading.Lock()
+_font_name: str | None = None
+_render_locks: dict[str, threading.Lock] = {}
+_render_locks_guard = threading.Lock()
+
+
+def _pdf_font() -> str:
+    """註冊並回傳 PDF 使用的字型名稱（每個 process 一次）"""
+    global _font_name
+    with _font_lock:
+        if _font_name is None:
+            if config.PDF_FONT_PATH:
+                # TTF 子集嵌入，讀者端不需安裝字型
+                pdfmetrics.registerFont(TTFont("BiographyCJK", config.PDF_FONT_PATH, subfontIndex=0))
+                _font_name = "BiographyCJK"
+            else:
+                pdfmetrics.registerFont(UnicodeCIDFont("MSung-Light"))
+                _font_name = "MSung-Light"
+        return _font_name
+
+
+def content_hash(content: str, fmt: str) -> str:
+    font = (config.PDF_FONT_PATH or "MSung-Light") if fmt == "pdf" else ""
+    h = hashlib.sha256()
+    for part in (RENDER_VERSION, fmt, font, content):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _styles() -> dict[str, ParagraphStyle]:
+    font = _pdf_font()
+    base = getSampleStyleSheet()
+    body = ParagraphStyle("BioBody", parent=base["Normal"], fontName=font, fontSize=11, leading=18,
+                          wordWrap="CJK", spaceAfter=8, firstLineIndent=22)
+    styles = {"body": body, "caption": ParagraphStyle("BioCaption", parent=body, fontSize=9, leading=13,
+                                                       firstLineIndent=0, alignment=1)}
+    for level, size in ((1, 18), (2, 15), (3, 13)):
+        styles[f"h{level}"] = ParagraphStyle(f"BioH{level}", parent=base[f"Heading{level}"], fontName=font,
+                                             fontSize=size, leading=size * 1.4, wordWrap="CJK")
+    return styles
+
+
+def _inline(text: str) -> str:
+    return _BOLD_RE.sub(r"<b>\1</b>", escape(text))
+
+
+def _image_flowable(path: str, max_width: float, max_height: float):
+    try:
+        width, height = ImageReader(path).getSize()
+    except Exception as e:
+        logger.warning(f"Skip unreadable image {path}: {str(e)}")
+        return None
+    scale = min(max_width / width, max_height / height, 1.0)
+    return Image(path, width=width * scale, height=height * scale)
+
+
+def _flowables(content: str, styles: dict, max_width: float, max_height: float):
+    """逐段產生 Flowable：每個非空行一段，# 標題，段落中的圖片拆成獨立區塊"""
+    paragraph: list[str] = []
+
+    def flush():
+        text = "".join(paragraph).strip()
+        paragraph.clear()
+        if text:
+            yield Paragraph(_inline(text), styles["body"])
+
+    for raw in content.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        heading = _HEADING_RE.match(line)
+        if heading:
+            level = min(len(heading.group(1)), 3)
+            yield Paragraph(_inline(heading.group(2)), styles[f"h{level}"])
+            continue
+        pos = 0
+        for m in _IMAGE_RE.finditer(line):
+            paragraph.append(line[pos:m.start()])
+            pos = m.end()
+            path = images.for_export(m.group(2))
+            if path is None:
+                logger.warning(f"Image not found in {images.UPLOAD_DIR}: {m.group(2)}")
+                continue
+            image = _image_flowable(path, max_width, max_height)
+            if image is None:
+                continue
+            yield from flush()
+            yield image
+            if m.group(1):
+                yield Paragraph(_inline(m.group(1)), styles["caption"])
+            yield Spacer(1, 6)
+        paragraph.append(line[pos:])
+        yield from flush()
+
+
+def _render_pdf(content: str, out) -> None:
+    doc = SimpleDocTemplate(out, pagesize=A4, leftMargin=2.2 * cm, rightMargin=2.2 * cm,
+                            topMargin=2 * cm, bottomMargin=2 * cm)
+    styles = _styles()
+    doc.build(list(_flowables(content, styles, doc.width, doc.height * 0.6)))
+
+
+def _render_txt(content: str, out) -> None:
+    out.write(content.encode("utf-8"))
+
+
+_RENDERERS = {"pdf": _render_pdf, "txt": _render_txt}
+FORMATS = tuple(_RENDERERS)
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _render_locks_guard:
+        return _render_locks.setdefault(path, threading.Lock())
+
+
+def get_or_render(biography_id: int, content: str, fmt: str) -> tuple[str, str]:
+    """回傳 (檔案路徑, ETag)；快取不存在時產生並以 rename 原子寫入"""
+    digest = content_hash(content, fmt)
+    root = os.path.abspath(config.EXPORT_CACHE_DIR)  # send_file 會把相對路徑接在 app 目錄下
+    directory = os.path.join(root, str(biography_id))
+    path = os.path.join(directory, f"{digest[:32]}.{fmt}")
+    if os.path.exists(path):
+        return path, digest
+
+    lock = _lock_for(path)
+    with lock:
+        if not os.path.exists(path):
+            # 暫存檔放在快取根目錄：產生期間 invalidate() 刪掉子目錄也不受影響
+            os.makedirs(root, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=root, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    _RENDERERS[fmt](content, out)
+                os.makedirs(directory, exist_ok=True)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+    with _render_locks_guard:
+        _render_locks.pop(path, None)
+    return path, digest
+
+
+def invalidate(biography_id: int) -> None:
+    """刪除該自傳所有已產生的匯出檔"""
+    shutil.rmtree(os.path.join(config.EXPORT_CACHE_DIR, str(biography_id)), ignore_errors=True)
+
+
+class _ZipSink(io.RawIOBase):
+    """ZipFile 的輸出目標：不可 seek，累積寫入的位元組，由 drain() 取出後清空"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe_name(value) -> str:
+    return re.sub(r"[^\w.-]+", "_", str(value)).strip("_") or "x"
+
+
+def _archive_text(content: str, archived: dict[str, str]) -> str:
+    """把 markdown 圖片路徑改寫為壓縮檔內的 images/<檔名>（pdf 尺寸版本），並記錄需要打包的檔案"""
+    def relink(m):
+        path = images.for_export(m.group(2))
+        if path is None:
+            return m.group(0)
+        name = os.path.basename(path)
+        archived[name] = path
+        return f"![{m.group(1)}](images/{name})"
+    return _IMAGE_RE.sub(relink, content)
+
+
+def stream_zip(user_id: int, fmt: str):
+    """
+    產生 ZIP 內容的 generator（供 Flask Response 串流）
+    txt / md 會改寫圖片連結並附上 images/；pdf 走 get_or_render 的磁碟快取，圖片已內嵌。
+    """
+    sink = _ZipSink()
+    archived: dict[str, str] = {}
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        after_id = 0
+        while True:
+            # 每批用完即歸還連線，下載時間長也不會佔住讀取連線池
+            with READ_ENGINE.connect() as conn:
+                rows = repos.biographies.page(conn, user_id, after_id, ARCHIVE_PAGE_SIZE)
+            if not rows:
+                break
+            for biography_id, style, language, created_at, content in rows:
+                after_id = biography_id
+                name = f"biography_{biography_id}_{_safe_name(style)}_{_safe_name(language)}.{fmt}"
+                if fmt == "pdf":
+                    path, _ = get_or_render(biography_id, content, "pdf")
+                    yield from _write_file(zf, sink, name, path, zipfile.ZIP_STORED)
+                else:
+                    data = _archive_text(content, archived).encode("utf-8")
+                    with zf.open(name, "w") as entry:
+                        for start in range(0, len(data), CHUNK_SIZE):
+                            entry.write(data[start:start + CHUNK_SIZE])
+                            yield sink.drain()
+                yield sink.drain()
+        for name, path in archived.items():
+            yield from _write_file(zf, sink, f"images/{name}", path, zipfile.ZIP_STORED)
+    yield sink.drain()  # central directory
+
+
+def _write_file(zf: zipfile.ZipFile, sink: _ZipSink, name: str, path: str, compression: int):
+    info = zipfile.ZipInfo.from_file(path, name)
+    info.compress_type = compression
+    with open(path, "rb") as src, zf.open(info, "w") as entry:
+        while chunk := src.read(CHUNK_SIZE):
+            entry.write(chunk)
+            yield sink.drain()
+    yield sink.drain()
@@ -1,84 +1,329 @@
 from __future__ import annotations
-from openai import OpenAI
 import config
+import logging
 import re
-import random
+import threading
 from typing import List, Dict
-from functools import lru_cache
-import difflib
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
+from services import llm, question_bank, redundancy
+from services.llm_cache import CACHE
+
+logger = logging.getLogger(__name__)
 
 # ========= 輔助函式（若專案已有同名工具，可刪除此處） =========
-CLIENT = OpenAI(api_key=config.OPENAI_API_KEY)
+def _is_json(content: str) -> bool:
+    try:
+        json.loads(content)
+        return True
+    except ValueError:
+        return False
+
+
+SCORE_MODEL = "gpt-4o"
+SCORE_PARAMS = {"max_tokens": 50, "temperature": 0}
+BATCH_TOKENS_PER_ANSWER = 30
+
+
+def _score_messages(text: str) -> list[dict]:
+    prompt = (
+        "你是一位寫作老師，請以 0-1 分評估以下文字的："
+        "detail(具體程度)、emotion(情感豐富度)、reflection(自省/價值觀)。\n"
+        f"文字：'''{text}'''\n"
+        "請只回 JSON，如：{\"detail\":0.8,\"emotion\":0.6,\"reflection\":0.5}"
+    )
+    return [
+        {"role": "system", "content": "請嚴格依格式回傳"},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _parse_scores(data: dict) -> tuple[float, float, float]:
+    return float(data.get("detail", 0)), float(data.get("emotion", 0)), float(data.get("reflection", 0))
+
 
-@lru_cache(maxsize=64)
 def _llm_score(text: str) -> tuple[float, float, float]:
     """
     呼叫 GPT，回傳 detail / emotion / reflection 三分數 0~1
-    加 lru_cache，可避免同段文字重算
+    temperature=0，經由 llm_cache 跨 worker 共用，避免同段文字重算；LLM 呼叫或解析失敗時拋出例外（不快取）
     """
+    content = llm.chat(
+        model=SCORE_MODEL,
+        messages=_score_messages(text),
+        validate=_is_json,
+        **SCORE_PARAMS,
+    )
+    return _parse_scores(json.loads(content))
+
+
+def _llm_score_batch(texts: list[str]) -> list[tuple[float, float, float]]:
+    """一次評多段文字；回應不是等長的 JSON 陣列時拋出 ValueError，由呼叫端改為逐段評分"""
+    answers = "".join(
+        f'<answer id="{i + 1}">{text.replace("</answer>", "")}</answer>\n' for i, text in enumerate(texts)
+    )
     prompt = (
-        "你是一位寫作老師，請以 0-1 分評估以下文字的："
+        "你是一位寫作老師，請以 0-1 分分別評估以下每段 <answer> 的："
         "detail(具體程度)、emotion(情感豐富度)、reflection(自省/價值觀)。\n"
-        f"文字：'''{text}'''\n"
-        "請只回 JSON，如：{\"detail\":0.8,\"emotion\":0.6,\"reflection\":0.5}"
+        f"{answers}"
+        f"只回傳長度為 {len(texts)} 的 JSON 陣列，依 id 順序每段一個物件，"
+        "如：[{\"detail\":0.8,\"emotion\":0.6,\"reflection\":0.5}]"
     )
-    try:
-        rsp = CLIENT.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "請嚴格依格式回傳"},
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=50,
-            temperature=0,
-        )
-        data = json.loads(rsp.choices[0].message.content.strip())
-        return float(data.get("detail", 0)), float(data.get("emotion", 0)), float(
-            data.get("reflection", 0)
-        )
-    except Exception:
-        # 若 LLM 失敗，給中間分數避免中斷
-        return 0.5, 0.5, 0.5
+    content = llm.chat(
+        model=SCORE_MODEL,
+        messages=[
+            {"role": "system", "content": "請嚴格依格式回傳"},
+            {"role": "user", "content": prompt},
+        ],
+        max_tokens=BATCH_TOKENS_PER_ANSWER * len(texts) + 20,
+        temperature=0,
+        cache=False,  # 結果改以單段評分的快取鍵逐段寫入
+    )
+    data = json.loads(content)
+    if not isinstance(data, list) or len(data) != len(texts) or not all(isinstance(d, dict) for d in data):
+        raise ValueError(f"Expected a JSON array of {len(texts)} objects")
+    return [_parse_scores(d) for d in data]
 
 
-# ========= ② 重複度計算 =========
-def _redundancy(curr: str, history: list[str]) -> float:
-    if not history:
-        return 0.0
-    last = history[-1]
-    return difflib.SequenceMatcher(None, curr, last).ratio()
+class _ScoreBatcher:
+    """
+    微批次評分
+    --------------------------------------------------
+    同一 process 內進行中的評分呼叫少於 idle_below（預設為 LLM_MAX_CONCURRENCY，即連線名額未滿）時
+    直接逐段送出，低負載時不多等 window、也不把可平行的呼叫串成一次較長的呼叫；
+    否則 window 秒內到達的評分請求（不分使用者）合併成一次 _llm_score_batch，
+    滿 max_size 筆立即送出；結果依原文分送給各個等待中的呼叫端。
+    每段結果以單段評分的快取鍵寫入 llm_cache，命中快取的文字不進批次。
+    批次回應無法解析時改為逐段 _llm_score（平行）；逐段仍失敗的例外原樣交給等待該段的呼叫端，
+    批次內不產生替代分數。
+    """
+
+    def __init__(self, window: float, max_size: int, idle_below: int):
+        self.window = window
+        self.max_size = max_size
+        self.idle_below = idle_below
+        self.batches = 0   # 本 process 計數
+        self.answers = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, Future]] = []
+        self._timer: threading.Timer | None = None
+        self._inflight = 0  # 進行中的評分呼叫（單段或批次）
+        self._fallback = ThreadPoolExecutor(max_workers=max(1, max_size), thread_name_prefix="score-fallback")
+
+    def score(self, text: str) -> tuple[float, float, float]:
+        if self.window <= 0 or self.max_size <= 1:
+            return _llm_score(text)
+        cached = self._cached(text)
+        if cached is not None:
+            return cached
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            batch = None
+            if len(self._pending) >= self.max_size or self._inflight < self.idle_below:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._run(batch)  # 湊滿或目前空閒時由呼叫端直接送出，不等計時器
+        return future.result()
+
+    def _cached(self, text: str) -> tuple[float, float, float] | None:
+        try:
+            hit = CACHE.get(CACHE.make_key(SCORE_MODEL, _score_messages(text), SCORE_PARAMS))
+            return _parse_scores(json.loads(hit)) if hit is not None else None
+        except Exception:
+            return None
+
+    def _take(self) -> list[tuple[str, Future]]:
+        """呼叫端須持有 _lock；取出的批次計入進行中呼叫，由 _run 結束時扣回"""
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if batch:
+            self._inflight += 1
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch: list[tuple[str, Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        with self._lock:
+            self.batches += 1
+            self.answers += len(batch)
+        try:
+            results = self._score_texts(texts)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+        for text, future in batch:
+            if isinstance(results[text], BaseException):
+                future.set_exception(results[text])
+            else:
+                future.set_result(results[text])
+
+    def _score_texts(self, texts: list[str]) -> dict:
+        """文字 → 分數或該段評分時的例外"""
+        if len(texts) == 1:
+            try:
+                return {texts[0]: _llm_score(texts[0])}
+            except Exception as e:
+                return {texts[0]: e}
+        try:
+            results = dict(zip(texts, _llm_score_batch(texts)))
+            self._remember(results)
+            return results
+        except Exception as e:
+            logger.warning(f"Batch scoring of {len(texts)} answers failed, scoring one by one: {str(e)}")
+            with self._lock:
+                self.fallbacks += 1
+        futures = {text: self._fallback.submit(_llm_score, text) for text in texts}
+        return {text: future.exception() or future.result() for text, future in futures.items()}
+
+    @staticmethod
+    def _remember(results: dict) -> None:
+        try:
+            for text, (d, e, r) in results.items():
+                key = CACHE.make_key(SCORE_MODEL, _score_messages(text), SCORE_PARAMS)
+                CACHE.set(key, SCORE_MODEL, json.dumps({"detail": d, "emotion": e, "reflection": r}))
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
+
+
+_BATCHER = _ScoreBatcher(
+    config.SCORE_BATCH_WINDOW, config.SCORE_BATCH_MAX, idle_below=config.LLM_MAX_CONCURRENCY
+)
+
+
+def score_answer(text: str) -> tuple[float, float, float]:
+    """LLM 評分的入口：經由微批次（SCORE_BATCH_WINDOW 為 0 時直接逐段呼叫）"""
+    return _BATCHER.score(text)
+
+
+# ========= ② 本地預評分 =========
+# 只用字數、情感詞、反思詞、具體細節與重複度估分；信心 ≥ PRESCORE_CONFIDENCE 時直接採用，
+# 其餘（較長、內容不明確的回答）才送 LLM 評分（score_answer）。
+TRIVIAL_ANSWERS = {
+    "是", "不是", "對", "不對", "有", "沒有", "好", "嗯", "還好", "普通", "沒什麼", "沒有特別的",
+    "不知道", "不記得", "記不得", "忘了", "忘記了", "不想說", "跳過",
+}
+FEELING_WORDS = ("感覺", "覺得", "心情", "感動", "想念")
+REFLECTION_MARKERS = (
+    "學到", "明白", "體會", "領悟", "反省", "意義", "影響", "回想", "現在想來",
+    "後來才", "如果能", "感謝", "珍惜", "成長", "價值",
+)
+_CONCRETE_RE = re.compile(
+    r"\d+|[一二三四五六七八九十]+(?:歲|年級|年|月|號)|市|縣|鎮|村|路|街|學校|國小|國中|高中|大學|公司|醫院"
+)
+_PUNCT_RE = re.compile(r"[\s，。！？、；：,.!?;:…~～]+")
+CONFIDENT_BELOW = 60  # 字數低於此值時信心隨字數遞減地高於 0
+
+
+def prescore(answer: str, redundancy_score: float) -> tuple[float, float, float, float]:
+    """回傳 (detail, emotion, reflection, confidence)，皆為 0~1"""
+    text = _PUNCT_RE.sub("", answer)
+    length = len(text)
+    if text in TRIVIAL_ANSWERS or extract_key_element(text) == DEFAULT_ELEMENT:
+        return 0.05, 0.05, 0.05, 0.95
+
+    emotion_hits = sum(text.count(w) for words in EMOTION_WORDS.values() for w in words)
+    emotion_hits += sum(text.count(w) for w in FEELING_WORDS)
+    reflection_hits = sum(text.count(m) for m in REFLECTION_MARKERS)
+    concrete = len(_CONCRETE_RE.findall(text))
+
+    detail = min(1.0, 0.05 + length / 400 + 0.1 * concrete) * (1 - redundancy_score / 2)
+    emotion = min(1.0, 0.1 + 0.2 * emotion_hits)
+    reflection = min(1.0, 0.05 + 0.25 * reflection_hits)
+    if redundancy_score >= 0.85:
+        confidence = 0.9  # 幾乎重講先前的回答，沒有新內容可評
+    else:
+        confidence = max(0.0, 1 - length / CONFIDENT_BELOW)
+    return detail, emotion, reflection, confidence
 
 
 # ========= ③ 公開 evaluate_answer =========
-def evaluate_answer(answer: str, history: list[str]) -> dict:
+FALLBACK_SCORE = 0.5  # 同步評分時 LLM 失敗的中間分數
+
+
+def evaluate_answer(answer: str, history: list[bytes]) -> dict:
     """
+    history 為該使用者既有回答的 MinHash 簽章（answers.minhash）
+    本地預評分信心足夠時不呼叫 LLM。
+    同步路徑不因 LLM 失敗而中斷提交：改給中間分數 FALLBACK_SCORE，score_source 標為 fallback；
+    背景佇列直接呼叫 score_answer 以便重試。
     回傳：
         {
           detail_score, emotion_score, reflection_score,
-          redundancy, length, aqi
+          redundancy, length, aqi, minhash, score_source
         }
     """
-    d, e, r = _llm_score(answer)
-    red = _redundancy(answer, history)
-    length = len(answer)
-    return {
+    metrics = local_metrics(answer, history)
+    if metrics["aqi"] is not None:
+        return metrics
+    source = "llm"
+    try:
+        d, e, r = score_answer(answer)
+    except Exception as exc:
+        logger.warning(f"LLM scoring failed, using fallback score: {str(exc)}")
+        d = e = r = FALLBACK_SCORE
+        source = "fallback"
+    metrics.update({
         "detail_score": d,
         "emotion_score": e,
         "reflection_score": r,
-        "redundancy": red,
-        "length": length,
         "aqi": (d + e + r) / 3,
+        "score_source": source,
+    })
+    return metrics
+
+
+def local_metrics(answer: str, history: list[bytes]) -> dict:
+    """
+    只計算不需 LLM 的指標（重複度、長度、本地預評分）；
+    預評分信心不足時三項分數留 None（score_source 為 None），由 LLM 或背景評分佇列回填。
+    重複度為與所有既有回答中最相似一則的 MinHash 相似度（services/redundancy.py），
+    minhash 為本回答的簽章，隨回答寫入 answers。
+    """
+    signature = redundancy.signature(answer)
+    redundancy_score = redundancy.score(signature, history)
+    metrics = {
+        "detail_score": None,
+        "emotion_score": None,
+        "reflection_score": None,
+        "redundancy": redundancy_score,
+        "length": len(answer),
+        "aqi": None,
+        "minhash": signature,
+        "score_source": None,
     }
+    d, e, r, confidence = prescore(answer, redundancy_score)
+    if confidence >= config.PRESCORE_CONFIDENCE:
+        metrics.update({
+            "detail_score": d,
+            "emotion_score": e,
+            "reflection_score": r,
+            "aqi": (d + e + r) / 3,
+            "score_source": "local",
+        })
+    return metrics
 EMOTION_WORDS = {
     "正面": ["開心", "喜悅", "興奮", "快樂", "自豪"],
     "負面": ["難過", "失落", "憤怒", "挫折", "害怕"],
 }
 
+DEFAULT_ELEMENT = "這段經歷"
+
 def extract_key_element(text: str) -> str:
     """簡易抓取第一個可能的人物／地點／事件名詞"""
     match = re.search(r"[A-Za-z\u4e00-\u9fff]{2,}", text)
-    return match.group(0) if match else "這段經歷"
+    return match.group(0) if match else DEFAULT_ELEMENT
 
 def analyze_emotion(text: str) -> str:
     """非常粗略的情感偵測：出現關鍵詞就標記"""
@@ -94,6 +339,43 @@ def summarize_history(history: List[str], max_len: int = 100) -> str:
     joined = " ｜ ".join(history)
     return (joined[:max_len] + "…") if len(joined) > max_len else joined
 
+FALLBACK_QUESTION = "可以再多說一些嗎？"
+
+
+def choose_strategy(answer, theme, question_count):
+    """依情況選擇最合適的追問策略"""
+    answer_length = len(answer)
+    if answer_length < 50:
+        return "detail_expansion"
+    elif any(word in answer for word in ("感覺", "覺得")):
+        return "emotional_depth"
+    elif question_count > 2:
+        return "context_connection"
+    else:
+        return "story_completion"
+
+
+def validate_question(question):
+    """檢查生成問題的品質"""
+    quality_checklist = {
+        "length_appropriate": 15 <= len(question) <= 50,
+        "not_yes_no": not any(w in question for w in ("是不是", "有沒有", "會不會")),
+        "encourages_narrative": any(w in question for w in ("怎麼", "什麼", "為什麼", "如何")),
+        "emotionally_engaging": any(w in question for w in ("感受", "想法", "心情", "覺得"))
+    }
+    score = sum(quality_checklist.values())
+    return score >= 3, quality_checklist
+
+
+def bank_follow_up(answer: str, theme: str, history: List[str]) -> tuple[str, str] | None:
+    """
+    由題庫產生追問，不呼叫 LLM
+    策略與 LLM 追問相同（choose_strategy），題目同樣須通過 validate_question。
+    回傳 (template_id, 題目)；沒有合適範本時為 None。
+    """
+    strategy = choose_strategy(answer, theme, len(history))
+    return question_bank.pick(theme, strategy, answer, validate=lambda q: validate_question(q)[0])
+
 # ========= 使用者提供的核心邏輯 =========
 
 def generate_follow_up_question(user_answer, current_theme, question_history, story_context):
@@ -208,52 +490,9 @@ def generate_follow_up_question(user_answer, current_theme, question_history, st
         }
     }
 
-    # 3. 智能策略選擇
-    def choose_strategy(answer, theme, question_count):
-        """依情況選擇最合適的追問策略"""
-        answer_length = len(answer)
-        if answer_length < 50:
-            return "detail_expansion"
-        elif any(word in answer for word in ("感覺", "覺得")):
-            return "emotional_depth"
-        elif question_count > 2:
-            return "context_connection"
-        else:
-            return "story_completion"
-
-    # 4. 問題品質檢查
-    def validate_question(question):
-        """檢查生成問題的品質"""
-        quality_checklist = {
-            "length_appropriate": 15 <= len(question) <= 50,
-            "not_yes_no": not any(w in question for w in ("是不是", "有沒有", "會不會")),
-            "encourages_narrative": any(w in question for w in ("怎麼", "什麼", "為什麼", "如何")),
-            "emotionally_engaging": any(w in question for w in ("感受", "想法", "心情", "覺得"))
-        }
-        score = sum(quality_checklist.values())
-        return score >= 3, quality_checklist
-
-    # 5. 備用問題庫
-    def generate_fallback_question(theme, answer):
-        """當 AI 生成的問題品質不佳時使用"""
-        fallback_questions = {
-            "童年": [
-                "能再詳細描述一下當時的場景嗎？",
-                "那時你的心情如何？",
-                "這件事對你有什麼特別意義？"
-            ],
-            "教育": [
-                "這段學習經歷如何影響了你？",
-                "你從中學到了什麼重要收穫？",
-                "有沒有特別印象深刻的老師或同學？"
-            ],
-            "職業": [
-                "工作中最有成就感的時刻是什麼？",
-                "遇過哪些重大的職涯轉折？",
-                "這份工作帶給你什麼人生啟發？"
-            ],
-        }
-        return random.choice(fallback_questions.get(theme, ["可以再多說一些嗎？"]))
+    # 3. 智能策略選擇：choose_strategy（模組層級，題庫共用）
+    # 4. 問題品質檢查：validate_question（模組層級，題庫共用）
+    # 5. 備用問題庫：bank_follow_up（services/question_bank.py）
 
     # 6. 主要追問生成函式
     def generate_smart_follow_up(answer, theme, history):
@@ -267,8 +506,7 @@ def generate_follow_up_question(user_answer, current_theme, question_history, st
         }
         full_prompt = follow_up_strategies[strategy]["prompt_template"].format(**prompt_data)
 
-        client = OpenAI(api_key=config.OPENAI_API_KEY)
-        response = client.chat.completions.create(
+        question = llm.chat(
             model="gpt-4o",
             messages=[
                 {
@@ -278,12 +516,12 @@ def generate_follow_up_question(user_answer, current_theme, question_history, st
                 {"role": "user", "content": full_prompt}
             ],
             max_tokens=150,
-            temperature=0.8
+            temperature=0.8,
         )
-        question = response.choices[0].message.content.strip()
         is_valid, _ = validate_question(question)
         if not is_valid:
-            question = generate_fallback_question(theme, answer)
+            banked = bank_follow_up(answer, theme, history)
+            question = banked[1] if banked else FALLBACK_QUESTION
         return question
 
     # 封裝成閉包供外部調用
@@ -303,3 +541,36 @@ def get_next_question(answer: str, theme: str, history: List[str]) -> str:
     """
     generator = generate_follow_up_question(answer, theme, history, {})
     return generator(answer, theme, history)
+
+
+# ========= 並行管線：評分與追問同時進行 =========
+# 兩個 gpt-4o 呼叫互不相依，放進有上限的執行緒池一起送出，
+# 讓 submit_answer 的等待時間約等於一次 LLM 往返。
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.LLM_MAX_WORKERS, thread_name_prefix="llm")
+
+
+def score_and_follow_up(
+    answer: str,
+    theme: str,
+    score_history: List[bytes],
+    follow_up_history: List[str] | None = None,
+    llm_score: bool = True,
+) -> tuple[dict, str | None]:
+    """
+    同時送出 evaluate_answer 與 get_next_question
+    --------------------------------------------------
+    score_history 為既有回答的 MinHash 簽章，follow_up_history 為追問用的回答全文；
+    follow_up_history 為 None 時不產生追問（例如要開新故事或換主題），
+    llm_score=False 時只算本地指標，LLM 分數交給背景評分佇列。
+    回傳 (metrics, next_question)；不需追問時 next_question 為 None。
+    """
+    score_future = None
+    if llm_score:
+        score_future = _EXECUTOR.submit(evaluate_answer, answer, score_history)
+    follow_future = None
+    if follow_up_history is not None:
+        follow_future = _EXECUTOR.submit(get_next_question, answer, theme, follow_up_history)
+
+    metrics = score_future.result() if score_future else local_metrics(answer, score_history)
+    next_question = follow_future.result() if follow_future else None
+    return metrics, next_question
@@ -0,0 +1,115 @@
+# services/generation_jobs.py
+"""
+自傳生成背景工作
+--------------------------------------------------
+POST /generate/jobs 只寫入 generation_jobs 並回傳 job id，
+LLM 呼叫在背景 worker 進行，不占用 gunicorn 的請求處理 worker。
+同一使用者以相同參數重複提交時，回傳進行中的同一筆工作。
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+
+import config
+from db import READ_ENGINE, WRITE_ENGINE
+from repositories import repos
+from services import biography_writer
+from services.worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 2
+STALE_AFTER = 900  # 秒，running 超過 15 分鐘視為 worker 已掛，重新領取
+
+
+def _params_hash(opts: dict) -> str:
+    return hashlib.sha256(json.dumps(opts, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def submit(user_id: int, opts: dict) -> tuple[int, bool]:
+    """
+    放入生成工作，回傳 (job_id, created)
+    已有相同參數的進行中工作時 created 為 False。
+    """
+    with WRITE_ENGINE.begin() as conn:
+        job_id, created = repos.generation_jobs.submit(
+            conn, user_id, json.dumps(opts, ensure_ascii=False), _params_hash(opts)
+        )
+    if created:
+        _pool.notify()
+    return job_id, created
+
+
+def get_job(conn, user_id: int, job_id: int) -> dict | None:
+    row = repos.generation_jobs.get(conn, job_id, user_id)
+    if not row:
+        return None
+    job = {
+        "id": row[0],
+        "status": row[1],
+        "params": json.loads(row[2]),
+        "error": row[3],
+        "created_at": str(row[4]) if row[4] else None,
+        "started_at": str(row[5]) if row[5] else None,
+        "finished_at": str(row[6]) if row[6] else None,
+        "biography": None,
+    }
+    if row[7] is not None:
+        job["biography"] = {
+            "id": row[7],
+            "content": row[8],
+            "style": row[9],
+            "language": row[10],
+            "created_at": str(row[11]),
+        }
+    return job
+
+
+def _has_ready() -> bool:
+    """唯讀檢查是否有可領取的工作，閒置輪詢時避免每次都開寫入交易"""
+    with READ_ENGINE.connect() as conn:
+        return repos.generation_jobs.has_ready(conn, STALE_AFTER)
+
+
+def _claim():
+    with WRITE_ENGINE.begin() as conn:
+        return repos.generation_jobs.claim(conn, STALE_AFTER)
+
+
+def _finish(job_id: int, status: str, biography_id: int | None = None, error: str | None = None, conn=None) -> None:
+    if conn is not None:
+        repos.generation_jobs.finish(conn, job_id, status, biography_id, error)
+        return
+    with WRITE_ENGINE.begin() as conn:
+        repos.generation_jobs.finish(conn, job_id, status, biography_id, error)
+
+
+def _process(job) -> None:
+    job_id, user_id, params, attempts = job
+    opts = json.loads(params)
+    with READ_ENGINE.connect() as conn:
+        qa_data = biography_writer.load_qa_data(conn, user_id)
+    error = biography_writer.check_sufficient(qa_data)
+    if error:
+        _finish(job_id, "failed", error=error)
+        return
+
+    try:
+        content = biography_writer.write(qa_data, opts)
+    except Exception as e:
+        logger.error(f"Generation job {job_id} failed: {str(e)}")
+        _finish(job_id, "failed" if attempts >= MAX_ATTEMPTS else "queued", error=str(e))
+        return
+
+    with WRITE_ENGINE.begin() as conn:
+        biography = biography_writer.save_biography(conn, user_id, content, opts)
+        _finish(job_id, "done", biography_id=biography["id"], conn=conn)
+
+
+_pool = WorkerPool("generation-worker", _claim, _process, has_work=_has_ready)
+
+
+def start_workers(n: int = config.GENERATION_WORKERS) -> None:
+    """啟動背景生成執行緒（每個 process 只啟動一次）"""
+    _pool.start(n)
@@ -0,0 +1,167 @@
+# services/images.py
+"""
+回答圖片處理
+--------------------------------------------------
+- 原檔以內容雜湊存成 static/uploads/<sha256>.<格式>，相同圖片只存一份，answer_images 指向這個檔案
+- 上傳時只做串流寫入、雜湊與格式檢查（Pillow 讀檔頭，不解碼整張圖）；
+  縮圖在背景執行緒產生，請求不必等待
+- 衍生版本存於 static/uploads/renditions/<sha256>_<種類>.jpg，長邊上限見 RENDITIONS，
+  套用 EXIF 方向並去除中繼資料；匯出 PDF / ZIP 一律使用 pdf 版本，不嵌入原始大圖
+所有衍生檔都可由原檔重建：重複產生、多個 worker 同時產生皆無害（暫存檔 + rename）。
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+import config
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.path.join("static", "uploads")
+RENDITION_DIR = os.path.join(UPLOAD_DIR, "renditions")
+RENDITIONS = {"thumb": 320, "web": 1280, "pdf": 1600}  # 長邊像素上限
+FORMATS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.IMAGE_WORKERS, thread_name_prefix="images")
+
+
+class ImageRejected(Exception):
+    """不是支援的圖片、檔案過大或像素過多"""
+
+
+def rendition_path(digest: str, kind: str) -> str:
+    return os.path.join(RENDITION_DIR, f"{digest}_{kind}.jpg")
+
+
+def rendition_url(digest: str, kind: str) -> str:
+    return "/" + rendition_path(digest, kind).replace(os.sep, "/")
+
+
+def _probe(path: str) -> str:
+    """回傳副檔名；只讀檔頭判斷格式與尺寸"""
+    try:
+        with Image.open(path) as img:
+            fmt, (width, height) = img.format, img.size
+    except Image.DecompressionBombError:
+        raise ImageRejected("Image has too many pixels")
+    except (UnidentifiedImageError, OSError):
+        raise ImageRejected("Unsupported image format")
+    if fmt not in FORMATS:
+        raise ImageRejected("Unsupported image format")
+    if width * height > config.IMAGE_MAX_PIXELS:
+        raise ImageRejected("Image has too many pixels")
+    return FORMATS[fmt]
+
+
+def save_upload(stream) -> tuple[str, str]:
+    """
+    串流寫入暫存檔並計算 sha256，通過檢查後改名為 <sha256>.<格式>
+    回傳 (digest, 原檔路徑)；相同內容已存在時直接沿用，不另存
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    h = hashlib.sha256()
+    written = 0
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := stream.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > config.IMAGE_MAX_BYTES:
+                    raise ImageRejected(f"Image larger than {config.IMAGE_MAX_BYTES} bytes")
+                h.update(chunk)
+                f.write(chunk)
+        ext = _probe(tmp_path)
+        digest = h.hexdigest()
+        path = os.path.join(UPLOAD_DIR, digest + ext)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    schedule_renditions(digest, path)
+    return digest, path
+
+
+def make_rendition(digest: str, src: str, kind: str) -> str:
+    """產生（或沿用已存在的）衍生版本，回傳路徑"""
+    out = rendition_path(digest, kind)
+    if os.path.exists(out):
+        return out
+    size = RENDITIONS[kind]
+    os.makedirs(RENDITION_DIR, exist_ok=True)
+    with Image.open(src) as img:
+        img.draft("RGB", (size, size))  # JPEG 直接以較低解析度解碼，大圖省記憶體與時間
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size), Image.LANCZOS)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        tmp = f"{out}.{uuid.uuid4().hex}.tmp"
+        try:
+            img.save(tmp, "JPEG", quality=85, optimize=True, progressive=True)
+            os.replace(tmp, out)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return out
+
+
+def generate_renditions(digest: str, src: str) -> None:
+    for kind in RENDITIONS:
+        try:
+            make_rendition(digest, src, kind)
+        except Exception as e:
+            logger.error(f"Rendition {kind} for {digest[:12]} failed: {str(e)}")
+
+
+def schedule_renditions(digest: str, src: str) -> None:
+    _EXECUTOR.submit(generate_renditions, digest, src)
+
+
+def resolve(path: str) -> str | None:
+    """markdown / 資料庫中的圖片路徑 → static/uploads 下的實際檔案（只取檔名，不接受其他目錄）"""
+    name = os.path.basename(path.replace("\\", "/"))
+    candidate = os.path.join(UPLOAD_DIR, name)
+    return candidate if name and os.path.isfile(candidate) else None
+
+
+def _digest_of(src: str) -> str:
+    stem = os.path.splitext(os.path.basename(src))[0]
+    if _DIGEST_RE.match(stem):
+        return stem
+    # 舊格式檔名（<user>_<question>_<檔名>）：以內容計算，與新上傳的同一張圖共用衍生檔
+    h = hashlib.sha256()
+    with open(src, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def for_export(path: str) -> str | None:
+    """匯出用的圖片檔：pdf 尺寸的衍生版本（尚未產生時當場產生）；找不到原檔回 None"""
+    src = resolve(path)
+    if src is None:
+        return None
+    try:
+        return make_rendition(_digest_of(src), src, "pdf")
+    except Exception as e:
+        logger.warning(f"Rendition for {path} failed, using original: {str(e)}")
+        return src
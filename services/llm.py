@@ -0,0 +1,208 @@
+# services/llm.py
+"""
+OpenAI 集中 gateway
+--------------------------------------------------
+整個 process 共用一個 OpenAI client（底層為 keep-alive 的 httpx 連線池），
+所有 chat / Whisper 呼叫都經過這裡：
+- 可設定的連線 / 讀取逾時
+- 可重試錯誤（連線失敗、逾時、429、5xx）以 full-jitter 指數退避重試
+- 每個 worker 的同時呼叫上限（BoundedSemaphore，LLM_MAX_CONCURRENCY），避免瞬間湧入打爆速率限制；
+  各執行緒池（LLM_MAX_WORKERS）只決定同時排隊的呼叫數，實際送出的上限以此為準
+- chat 呼叫經由 llm_cache 共用快取；chat_stream 逐段回傳 token
+"""
+from __future__ import annotations
+import logging
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+import httpx
+from openai import OpenAI, APIConnectionError, RateLimitError, InternalServerError
+
+import config
+from services.llm_cache import CACHE, cached_chat
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)  # 逾時屬於 APIConnectionError
+
+_client: OpenAI | None = None
+_client_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(config.LLM_MAX_CONCURRENCY)
+
+
+def get_client() -> OpenAI:
+    """延遲建立共用 client；SDK 內建重試關閉，改由 _with_retry 統一處理"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=config.LLM_MAX_CONCURRENCY * 2,
+                        max_keepalive_connections=config.LLM_MAX_CONCURRENCY,
+                        keepalive_expiry=60,
+                    ),
+                    timeout=httpx.Timeout(config.LLM_TIMEOUT, connect=config.LLM_CONNECT_TIMEOUT),
+                )
+                _client = OpenAI(
+                    api_key=config.OPENAI_API_KEY,
+                    http_client=http_client,
+                    max_retries=0,
+                )
+    return _client
+
+
+def _backoff(attempt: int) -> float:
+    """full jitter：0 ~ min(上限, base × 2^attempt) 之間隨機"""
+    return random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _with_retry(call: Callable, lock: bool = True):
+    """lock=False 供已自行持有 semaphore 的呼叫端使用（例如串流）"""
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        try:
+            if not lock:
+                return call()
+            with _semaphore:
+                return call()
+        except RETRYABLE_ERRORS as e:
+            if attempt >= config.LLM_MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def _create_completion(**kwargs):
+    return _with_retry(lambda: get_client().chat.completions.create(**kwargs))
+
+
+def chat(
+    messages: list[dict],
+    *,
+    model: str = "gpt-4o",
+    cache: bool | None = None,
+    validate: Callable[[str], bool] | None = None,
+    refresh: bool = False,
+    **params,
+) -> str:
+    """
+    送出 chat completion，回傳 message.content（已 strip）
+    cache / validate / refresh 的意義見 llm_cache.cached_chat。
+    """
+    return cached_chat(
+        _create_completion,
+        model=model,
+        messages=messages,
+        cache=cache,
+        validate=validate,
+        refresh=refresh,
+        **params,
+    )
+
+
+def chat_stream(
+    messages: list[dict],
+    *,
+    model: str = "gpt-4o",
+    cache: bool | None = None,
+    refresh: bool = False,
+    **params,
+) -> Iterator[str]:
+    """
+    串流 chat completion，逐段 yield 文字 delta
+    --------------------------------------------------
+    只重試建立串流的請求；開始輸出後出錯直接往外拋。
+    上游由 _STREAM_EXECUTOR 讀進佇列，併發名額在上游回應結束時就釋放，不必等慢速的 client 讀完；
+    呼叫端提前關閉 generator 時停止讀取並關閉上游連線。
+    命中快取時一次 yield 完整內容，上游完整跑完的串流會寫回快取（規則同 chat，快取錯誤只記 log）。
+    refresh=True 時不讀快取，跑完後覆寫。
+    """
+    if cache is None:
+        cache = params.get("temperature", 1) == 0
+    key = None
+    if cache:
+        key = CACHE.make_key(model, messages, params)
+        try:
+            hit = None if refresh else CACHE.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {str(e)}")
+            hit = None
+        if hit is not None:
+            yield hit
+            return
+
+    deltas: queue.Queue = queue.Queue()
+    cancelled = threading.Event()
+    _STREAM_EXECUTOR.submit(_pump_stream, deltas, cancelled, key, model, messages, params)
+    try:
+        while True:
+            item = deltas.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+_STREAM_END = object()
+_STREAM_EXECUTOR = ThreadPoolExecutor(max_workers=config.LLM_MAX_CONCURRENCY, thread_name_prefix="llm-stream")
+
+
+def _pump_stream(deltas: queue.Queue, cancelled: threading.Event, key: str | None,
+                 model: str, messages: list[dict], params: dict) -> None:
+    """持有併發名額讀完上游串流，delta 依序放入佇列，最後放入 _STREAM_END 或例外"""
+    try:
+        if cancelled.is_set():
+            return
+        parts = []
+        with _semaphore:
+            stream = _with_retry(
+                lambda: get_client().chat.completions.create(
+                    model=model, messages=messages, stream=True, **params
+                ),
+                lock=False,
+            )
+            try:
+                for chunk in stream:
+                    if cancelled.is_set():
+                        return
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        deltas.put(delta)
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+    except Exception as e:
+        deltas.put(e)
+        return
+
+    if key:
+        try:
+            CACHE.set(key, model, "".join(parts).strip())
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
+    deltas.put(_STREAM_END)
+
+
+def transcribe(filepath: str, *, language: str, model: str = "whisper-1") -> str:
+    """Whisper 轉錄；每次重試重新開檔，確保從頭上傳"""
+    def call():
+        with open(filepath, "rb") as audio_file:
+            return get_client().audio.transcriptions.create(
+                model=model,
+                file=audio_file,
+                language=language,
+            )
+    return _with_retry(call).text
@@ -0,0 +1,223 @@
+# services/llm_cache.py
+"""
+跨 process 共用的 LLM 回應快取
+--------------------------------------------------
+以 (model, messages, 參數) 的 SHA-256 為 key，把回應文字存進獨立的 SQLite 檔（路徑為 config.LLM_CACHE_DB），
+gunicorn 的多個 worker 與重啟後都能共用。支援 TTL 過期與依 last_access 的 LRU 淘汰。
+讀取只做 SELECT：last_access / hits 先記在記憶體，每 ACCESS_FLUSH_INTERVAL 秒或累積
+ACCESS_FLUSH_MAX 個 key 時以一個交易批次寫回，命中快取不會讓各 worker 搶寫入鎖。
+hit / miss 計數只存在各 process 記憶體中。檔案在第一次讀寫時才建立。
+    python -m services.llm_cache          # 查看統計
+    python -m services.llm_cache --purge  # 清除過期項目
+"""
+from __future__ import annotations
+import atexit
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+EVICT_EVERY = 100  # 每寫入 N 次檢查一次容量與過期
+ACCESS_FLUSH_INTERVAL = 5.0  # 秒，批次寫回 last_access / hits 的間隔
+ACCESS_FLUSH_MAX = 256  # 累積這麼多個命中的 key 時立即寫回
+
+
+class LLMCache:
+    def __init__(self, path: str, ttl: int, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._ready = False
+        self._touched: dict[str, tuple[float, int]] = {}  # key -> (last_access, 未寫回的命中次數)
+        self._last_flush = time.monotonic()
+        self.hits = 0    # 本 process 計數
+        self.misses = 0
+
+    # ---------- 連線 ----------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            if not self._ready:
+                self._init_db(conn)
+        return conn
+
+    def _init_db(self, conn: sqlite3.Connection) -> None:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+        self._ready = True
+
+    # ---------- key ----------
+    @staticmethod
+    def make_key(model: str, messages: list[dict], params: dict) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ---------- 讀寫 ----------
+    def get(self, key: str) -> str | None:
+        """過期項目視為未命中，留給 evict 定期刪除，讀取路徑不寫檔"""
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+        ).fetchone()
+        if row:
+            self._touch(key, now)
+            return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        self._conn().execute(
+            """INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_access, hits)
+               VALUES (?, ?, ?, ?, ?, 0)""",
+            (key, model, response, now, now),
+        )
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def _touch(self, key: str, now: float) -> None:
+        """記下命中，達到間隔或數量上限時批次寫回"""
+        with self._lock:
+            self.hits += 1
+            _, count = self._touched.get(key, (now, 0))
+            self._touched[key] = (now, count + 1)
+            due = (len(self._touched) >= ACCESS_FLUSH_MAX
+                   or time.monotonic() - self._last_flush >= ACCESS_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """把記憶體中的 last_access / hits 以單一交易寫回，回傳寫回的 key 數；失敗時捨棄（僅影響 LRU 順序）"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if not touched:
+            return 0
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE llm_cache SET last_access = MAX(last_access, ?), hits = hits + ? WHERE key = ?",
+                [(last_access, count, key) for key, (last_access, count) in touched.items()],
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.warning(f"LLM cache access flush failed: {str(e)}")
+            return 0
+        return len(touched)
+
+    def evict(self) -> int:
+        """刪除過期項目，並依 last_access 淘汰超過容量的最舊項目（先寫回最近的命中）"""
+        self.flush()
+        conn = self._conn()
+        removed = conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)
+        ).rowcount
+        overflow = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            removed += conn.execute(
+                """DELETE FROM llm_cache WHERE key IN (
+                       SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)""",
+                (overflow,),
+            ).rowcount
+        return removed
+
+    # ---------- 統計 ----------
+    def stats(self) -> dict:
+        """entries / stored_hits 來自快取檔（各 worker 已寫回的命中），hits / misses 為本 process 計數"""
+        self.flush()
+        entries, stored_hits = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM llm_cache"
+        ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "stored_hits": stored_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+CACHE = LLMCache(config.LLM_CACHE_DB, config.LLM_CACHE_TTL, config.LLM_CACHE_MAX_ENTRIES)
+atexit.register(CACHE.flush)  # worker 結束前寫回尚未同步的命中
+
+
+def cached_chat(
+    create: Callable,
+    *,
+    model: str,
+    messages: list[dict],
+    cache: bool | None = None,
+    validate: Callable[[str], bool] | None = None,
+    refresh: bool = False,
+    **params,
+) -> str:
+    """
+    包裝 chat.completions.create，回傳 message.content（已 strip）
+    --------------------------------------------------
+    cache=None 時僅在 temperature 為 0 時使用快取；True / False 可強制開關。
+    validate 不通過的回應不寫入快取（例如 JSON 解析失敗）。
+    refresh=True 時不讀快取，重新呼叫後覆寫同一個 key（使用者要求重新生成）。
+    """
+    if cache is None:
+        cache = params.get("temperature", 1) == 0
+    key = None
+    if cache:
+        key = CACHE.make_key(model, messages, params)
+        try:
+            hit = None if refresh else CACHE.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {str(e)}")
+            hit = None
+        if hit is not None:
+            return hit
+
+    response = create(model=model, messages=messages, **params)
+    content = response.choices[0].message.content.strip()
+
+    if key and (validate is None or validate(content)):
+        try:
+            CACHE.set(key, model, content)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
+    return content
+
+
+if __name__ == "__main__":
+    import sys
+    if "--purge" in sys.argv:
+        print(f"Evicted {CACHE.evict()} entries")
+    print(json.dumps(CACHE.stats(), indent=2))
@@ -0,0 +1,106 @@
+# services/passwords.py
+"""
+密碼雜湊與驗證（PBKDF2-SHA256）
+--------------------------------------------------
+雜湊是純 CPU 工作，放在專用且有上限的 process pool 執行：
+- 同時最多 PASSWORD_HASH_WORKERS 個雜湊在跑，登入尖峰不會吃掉所有核心
+- 排隊中的工作超過 PASSWORD_QUEUE_SIZE、等待 PASSWORD_QUEUE_TIMEOUT 秒仍無空位時
+  拋 PasswordPoolBusy（路由回 503），而不是無限堆積
+- rounds 由 PASSWORD_ROUNDS 決定；低於 PASSWORD_MIN_ROUNDS 的舊雜湊在登入成功時重新雜湊
+PASSWORD_HASH_WORKERS=0 時在呼叫端執行緒內直接計算（開發 / 除錯用）。
+"""
+from __future__ import annotations
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    pbkdf2_sha256__default_rounds=config.PASSWORD_ROUNDS,
+    pbkdf2_sha256__min_rounds=config.PASSWORD_MIN_ROUNDS,
+)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(config.PASSWORD_HASH_WORKERS, 1) + config.PASSWORD_QUEUE_SIZE)
+
+
+class PasswordPoolBusy(Exception):
+    """雜湊佇列已滿"""
+
+
+def _noop() -> None:
+    return None
+
+
+def _hash(password: str) -> str:
+    return _context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple[bool, str | None]:
+    return _context.verify_and_update(password, hashed)
+
+
+def start_pool() -> None:
+    """
+    建立 process pool 並立即啟動子 process
+    請在 app 啟動、背景執行緒開始之前呼叫：fork 時只有主執行緒，子 process 不會繼承其他執行緒持有的鎖。
+    """
+    global _pool
+    if config.PASSWORD_HASH_WORKERS <= 0:
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=config.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("fork"),
+            )
+            _pool.submit(_noop).result()  # fork context 會在第一次 submit 時啟動全部子 process
+
+
+def _run(fn, *args):
+    if config.PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    if not _slots.acquire(timeout=config.PASSWORD_QUEUE_TIMEOUT):
+        raise PasswordPoolBusy("Password hashing queue is full")
+    try:
+        if _pool is None:
+            start_pool()
+        try:
+            return _pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # 子 process 被系統終止（例如 OOM）：重建 pool 後重試一次
+            logger.error("Password hashing pool broken, restarting")
+            _restart_pool()
+            return _pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def _restart_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+    start_pool()
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password)
+
+
+def verify_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """
+    回傳 (是否正確, 新雜湊)
+    新雜湊不為 None 表示原雜湊的參數已過時，呼叫端應寫回資料庫。
+    """
+    return _run(_verify_and_update, password, hashed)
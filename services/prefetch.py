@@ -0,0 +1,63 @@
+# services/prefetch.py
+"""
+追問預取
+--------------------------------------------------
+使用者還在輸入時，前端把草稿送到 /biography/answer/draft；本題答完後若要追問，
+背景執行緒以草稿產生候選追問，存入 question_prefetch（每位使用者一列，PREFETCH_TTL 秒後失效）。
+submit_answer 的讀取查詢一併帶出屬於本題且未過期的候選，最終回答與草稿相符（fits）時
+直接採用，不必等待 LLM；不相符時照舊產生。開新故事、換主題的固定題目不需預取。
+同一位使用者同時只有一個預取在進行，草稿與既有候選仍相符時不重新產生。
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from db import WRITE_ENGINE
+from repositories import repos
+from services import redundancy
+from services.follow_up import get_next_question
+
+logger = logging.getLogger(__name__)
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_inflight: set[int] = set()
+_lock = threading.Lock()
+
+
+def fits(basis: str | None, answer: str) -> bool:
+    """候選是否仍適用：草稿與回答的 MinHash 相似度 ≥ PREFETCH_MIN_SIMILARITY"""
+    if not basis:
+        return False
+    if basis == answer:
+        return True
+    sig = redundancy.signature(answer)
+    return redundancy.score(sig, [redundancy.signature(basis)]) >= config.PREFETCH_MIN_SIMILARITY
+
+
+def schedule(user_id: int, question_id: int, draft: str, theme: str, history: list[str]) -> bool:
+    """
+    背景產生候選追問；history 為同主題的既有回答（不含草稿）
+    該使用者已有預取在進行時不重複送出，回傳是否已排入。
+    """
+    with _lock:
+        if user_id in _inflight:
+            return False
+        _inflight.add(user_id)
+    _EXECUTOR.submit(_prefetch, user_id, question_id, draft, theme, history)
+    return True
+
+
+def _prefetch(user_id: int, question_id: int, draft: str, theme: str, history: list[str]) -> None:
+    try:
+        # 與 submit_answer 的追問 prompt 相同
+        question = get_next_question(draft, theme, history + [draft])
+        with WRITE_ENGINE.begin() as conn:
+            repos.prefetch.save(conn, user_id, question_id, draft, question, int(time.time()) + config.PREFETCH_TTL)
+    except Exception as e:
+        logger.warning(f"Prefetch follow-up failed for user {user_id}: {str(e)}")
+    finally:
+        with _lock:
+            _inflight.discard(user_id)
@@ -0,0 +1,268 @@
+# services/question_bank.py
+"""
+追問題庫
+--------------------------------------------------
+預先寫好的追問範本，依 (主題, 追問策略) 建立索引，涵蓋全部 THEMES 與 follow_up 的四種策略。
+範本中的 {element} 以回答中的人物或地點在本機填入，找不到時只用不含 {element} 的範本，
+整個過程不呼叫 LLM。
+每個範本的品質為其題目收到的回答的平均 AQI（question_template_stats，回答取得分數時累加），
+以 PRIOR_WEIGHT 則 PRIOR_AQI 的虛擬回答平滑，加上 UCB 探索項後排序；
+統計由背景執行緒每 QUESTION_BANK_SYNC 秒同步到記憶體，挑選範本時不查資料庫。
+QUESTION_BANK_FRACTION 比例的追問直接由題庫提供（依題目 id 決定，見 serves），
+LLM 追問品質檢查不通過時也改用題庫。
+"""
+from __future__ import annotations
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from hashlib import blake2b
+from typing import Callable, NamedTuple
+
+import config
+from db import READ_ENGINE
+from repositories import repos
+
+logger = logging.getLogger(__name__)
+
+PRIOR_AQI = 0.5  # 沒有統計時假設的平均 AQI
+PRIOR_WEIGHT = 5  # 先驗相當於幾則回答
+EXPLORATION = 0.1  # UCB 探索項係數，讓回答數少的範本仍有機會被選到
+
+TEMPLATES: dict[str, dict[str, tuple[str, ...]]] = {
+    "童年": {
+        "detail_expansion": (
+            "你提到{element}，能描述一下當時的畫面嗎？那時你心裡有什麼感受？",
+            "那時候的家裡是什麼樣子？回想起來，你最先想到的是什麼心情？",
+            "能說說那天發生了什麼事嗎？當時小小的你是怎麼想的、有什麼感受？",
+        ),
+        "emotional_depth": (
+            "回想{element}，當時的你內心是什麼感受？現在再想起又有什麼不同？",
+            "小時候的這段經歷帶給你什麼樣的心情？這份感受後來怎麼影響了你？",
+            "如果能回到那個年紀，你想對當時的自己說什麼？為什麼有這樣的想法？",
+        ),
+        "context_connection": (
+            "這段童年經歷和你後來的成長有什麼關聯？你現在怎麼看待它、有什麼想法？",
+            "{element}在你往後的人生中還扮演什麼角色？你對此有什麼想法？",
+            "比起童年的其他回憶，這件事為什麼特別難忘？它帶給你什麼感受？",
+        ),
+        "story_completion": (
+            "這件事後來怎麼發展？最後的結果帶給你什麼樣的心情？",
+            "在這段故事裡，{element}扮演了什麼角色？你對此有什麼感受？",
+            "事情的轉折點是什麼時候？當下的你是怎麼想的、有什麼感受？",
+        ),
+    },
+    "教育": {
+        "detail_expansion": (
+            "你提到{element}，能描述一下當時的學習情境嗎？你有什麼感受？",
+            "那時候的教室或校園是什麼樣子？你最常想起什麼畫面和心情？",
+            "能說說那堂課或那次考試發生了什麼嗎？當時你有什麼想法和感受？",
+        ),
+        "emotional_depth": (
+            "回想{element}，當時你心裡是什麼感受？這份心情後來有什麼變化？",
+            "求學時最讓你有成就感或挫折的是什麼？那時你的心情如何？",
+            "面對當時的課業壓力，你是怎麼調適心情的？現在回頭看有什麼想法？",
+        ),
+        "context_connection": (
+            "這段求學經歷如何影響了你後來的選擇？你對此有什麼想法？",
+            "{element}帶給你的影響，後來在工作或生活中怎麼顯現？你有什麼感受？",
+            "比起其他求學階段，這段經歷為什麼特別重要？你現在對它有什麼想法？",
+        ),
+        "story_completion": (
+            "這件事後來怎麼收尾？你從中得到了什麼感受或想法？",
+            "在這段求學故事裡，{element}扮演了什麼角色？你對此有什麼感受？",
+            "故事中最關鍵的轉折是什麼？那時你是怎麼想的、心情如何？",
+        ),
+    },
+    "職業": {
+        "detail_expansion": (
+            "你提到{element}，能描述一下當時的工作情境嗎？你有什麼感受？",
+            "那段時間的一天通常是怎麼度過的？最讓你有感受的是什麼？",
+            "能說說那個任務是怎麼進行的嗎？當時你有什麼想法和心情？",
+        ),
+        "emotional_depth": (
+            "面對{element}，當時你心裡是什麼感受？後來又是怎麼走過來的？",
+            "工作中最有成就感的時刻是什麼？那一刻你的心情如何？",
+            "遇到挫折時，你是怎麼面對的？那段時間的心情有什麼變化？",
+        ),
+        "context_connection": (
+            "這段工作經歷和你的求學或家庭有什麼關聯？你對此有什麼想法？",
+            "{element}如何影響了你後來的職涯選擇？你現在有什麼感受？",
+            "回頭看整段職涯，這次經歷為什麼重要？它如何改變了你的想法？",
+        ),
+        "story_completion": (
+            "這件事最後的結果如何？你當時有什麼感受？",
+            "在這段經歷中，{element}扮演了什麼角色？你對此有什麼想法？",
+            "事情的關鍵轉折是什麼？當時你是怎麼做決定的、有什麼感受？",
+        ),
+    },
+    "家庭": {
+        "detail_expansion": (
+            "你提到{element}，能描述一下當時家裡的情景嗎？你有什麼感受？",
+            "那時候全家人通常怎麼相處？哪個畫面最讓你有感受？",
+            "能說說那天家裡發生了什麼事嗎？當時你有什麼感受？",
+        ),
+        "emotional_depth": (
+            "想起{element}，你心裡是什麼感受？這份感情後來有什麼變化？",
+            "這段家庭經歷讓你有什麼樣的心情？你如何面對這些感受？",
+            "如果能對家人說一句當時沒說出口的話，你會說什麼？為什麼有這個想法？",
+        ),
+        "context_connection": (
+            "這段家庭經歷如何影響你後來對待家人的方式？你有什麼想法？",
+            "{element}在你的人生中留下了什麼影響？你現在對此有什麼感受？",
+            "你的家庭和你的成長、工作之間有什麼關聯？你對此有什麼想法？",
+        ),
+        "story_completion": (
+            "這件事後來怎麼發展？家人之間的關係有什麼變化？你有什麼感受？",
+            "在這段故事裡，{element}扮演了什麼角色？你對此有什麼感受？",
+            "事情的轉折點是什麼？當時家裡的氣氛和你的心情如何？",
+        ),
+    },
+    "夢想": {
+        "detail_expansion": (
+            "你提到{element}，能具體描述一下這個夢想的樣子嗎？你有什麼感受？",
+            "這個夢想是從什麼時候開始的？當時的你有什麼想法？",
+            "為了這個夢想，你做過什麼具體的努力？過程中有什麼感受？",
+        ),
+        "emotional_depth": (
+            "想到{element}，你心裡是什麼感受？這份心情如何隨著時間改變？",
+            "追夢路上最讓你感動或失落的是什麼？那時你的心情如何？",
+            "如果這個夢想實現了，你覺得自己會有什麼感受？為什麼？",
+        ),
+        "context_connection": (
+            "這個夢想和你的童年、求學或工作經歷有什麼關聯？你有什麼想法？",
+            "{element}如何影響了你現在的生活選擇？你對此有什麼感受？",
+            "你的夢想這些年有什麼改變？你怎麼看待這些變化、有什麼想法？",
+        ),
+        "story_completion": (
+            "這個夢想後來怎麼發展？現在回頭看，你有什麼感受？",
+            "在追夢的過程中，{element}扮演了什麼角色？你對此有什麼想法？",
+            "追夢路上最關鍵的轉折是什麼？當時你有什麼想法？",
+        ),
+    },
+}
+
+PEOPLE = (
+    "外公", "外婆", "爺爺", "奶奶", "阿公", "阿嬤", "爸爸", "媽媽", "父親", "母親",
+    "哥哥", "姊姊", "姐姐", "弟弟", "妹妹", "老師", "同學", "朋友", "同事", "老闆", "主管",
+    "先生", "太太", "丈夫", "妻子", "兒子", "女兒", "孩子",
+)
+_PEOPLE_RE = re.compile("|".join(PEOPLE))
+_PLACE_RE = re.compile(r"(?:在|到|去)([\u4e00-\u9fff]{2,4}?)(?=[，。！？、；\s]|的|裡|時|念|讀|唸|住|長大|出生|工作|上班|上學|生活|旅行|$)")
+
+
+class Template(NamedTuple):
+    id: str  # 由主題、策略與內容決定；修改內容即為新範本，統計重新累積
+    theme: str
+    strategy: str
+    text: str
+
+
+def _template_id(theme: str, strategy: str, text: str) -> str:
+    return f"{zlib.crc32(f'{theme}|{strategy}|{text}'.encode('utf-8')):08x}"
+
+
+# (主題, 策略) → 範本，import 時建立一次
+_INDEX: dict[tuple[str, str], list[Template]] = {
+    (theme, strategy): [Template(_template_id(theme, strategy, t), theme, strategy, t) for t in texts]
+    for theme, strategies in TEMPLATES.items()
+    for strategy, texts in strategies.items()
+}
+
+
+class TemplateStats:
+    """記憶體中的範本統計 template_id → (回答數, AQI 總和)；背景執行緒定期整份重新載入"""
+
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self._stats: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def get(self, template_id: str) -> tuple[int, float]:
+        return self._stats.get(template_id, (0, 0.0))
+
+    def sync(self) -> None:
+        with READ_ENGINE.connect() as conn:
+            rows = repos.question_templates.stats(conn)
+        self._stats = {row[0]: (row[1], row[2]) for row in rows}
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Question bank stats sync error: {str(e)}")
+
+    def start(self) -> None:
+        """先同步一次再啟動背景執行緒（每個 process 只啟動一次）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="question-bank-sync", daemon=True)
+        self.sync()
+        self._thread.start()
+
+
+_stats = TemplateStats(config.QUESTION_BANK_SYNC)
+
+
+def start_stats_sync() -> None:
+    """app 啟動（遷移完成）後呼叫"""
+    _stats.start()
+
+
+def serves(question_id) -> bool:
+    """這一題答完後的追問是否由題庫提供；依題目 id 決定，草稿預取與提交時的判斷一致（非整數 id 一律否）"""
+    if config.QUESTION_BANK_FRACTION <= 0:
+        return False
+    try:
+        qid = int(question_id)
+    except (TypeError, ValueError):
+        return False
+    return (qid * 2654435761) % 2 ** 32 < config.QUESTION_BANK_FRACTION * 2 ** 32
+
+
+def key_element(answer: str) -> str | None:
+    """回答中第一個提到的人物，其次為「在 / 到 / 去」之後的地點；都沒有時為 None"""
+    match = _PEOPLE_RE.search(answer)
+    if match:
+        return match.group(0)
+    match = _PLACE_RE.search(answer)
+    return match.group(1) if match else None
+
+
+def quality(template: Template, total_answered: int) -> float:
+    """平滑後的平均 AQI 加上探索項；total_answered 為同一組候選範本的回答數總和"""
+    answered, aqi_sum = _stats.get(template.id)
+    mean = (aqi_sum + PRIOR_WEIGHT * PRIOR_AQI) / (answered + PRIOR_WEIGHT)
+    return mean + EXPLORATION * math.sqrt(math.log(total_answered + 1) / (answered + 1))
+
+
+def rank(theme: str, strategy: str, answer: str) -> list[Template]:
+    """可用的範本依品質由高到低；品質相同時依回答內容輪替，不會每次都挑同一題"""
+    templates = _INDEX.get((theme, strategy), [])
+    if key_element(answer) is None:
+        templates = [t for t in templates if "{element}" not in t.text]
+    total = sum(_stats.get(t.id)[0] for t in templates)
+    return sorted(
+        templates,
+        key=lambda t: (-quality(t, total), blake2b(f"{t.id}|{answer}".encode("utf-8"), digest_size=8).digest()),
+    )
+
+
+def pick(theme: str, strategy: str, answer: str,
+         validate: Callable[[str], bool] | None = None) -> tuple[str, str] | None:
+    """
+    回傳 (template_id, 題目)；validate 為題目品質檢查（follow_up.validate_question），
+    依排序逐一填入並檢查，全部不通過或沒有範本時為 None
+    """
+    element = key_element(answer)
+    for template in rank(theme, strategy, answer):
+        question = template.text.format(element=element) if element else template.text
+        if validate is None or validate(question):
+            return template.id, question
+    return None
@@ -0,0 +1,72 @@
+# services/redundancy.py
+"""
+回答重複度（MinHash）
+--------------------------------------------------
+每則回答去除空白後切成 SHINGLE 個字元一組的 shingle，以 NUM_PERM 組 multiply-shift 雜湊
+取最小值，得到固定 NUM_PERM × 4 bytes 的簽章，寫入 answers.minhash。
+新回答只需算自己的簽章，再與該使用者所有既有簽章做一次 NumPy 比對：
+相同位置相等的比例即 Jaccard 相似度的估計值，重複度取其中最大值。
+沒有任何字元的回答（shingle 集合為空）簽章全為最大值，與任何回答的相似度都視為 0。
+成本與歷史回答的字數無關，只與回答數成線性（每則 512 bytes）。
+"""
+from __future__ import annotations
+import re
+
+import numpy as np
+
+SHINGLE = 2  # 中文詞多為兩個字；最多 3（見 shingles）
+NUM_PERM = 128
+SIGNATURE_BYTES = NUM_PERM * 4
+CHUNK = 4096  # 每次處理的 shingle 數，限制暫存矩陣大小（NUM_PERM × CHUNK × 8 bytes）
+
+_WHITESPACE = re.compile(r"\s+")
+
+# 固定種子：簽章會存入資料庫，雜湊參數必須跨 process、跨版本一致
+_rng = np.random.default_rng(20240521)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)  # 奇數乘數
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype="<u4")  # 空集合的簽章
+
+
+def shingles(text: str) -> np.ndarray:
+    """不重複的 shingle 雜湊（uint64）：每個字元的 code point < 2^21，直接拼接不會碰撞（3 個字元 = 63 bits）"""
+    codes = np.frombuffer(_WHITESPACE.sub("", text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if codes.size == 0:
+        return codes
+    if codes.size < SHINGLE:
+        codes = np.pad(codes, (0, SHINGLE - codes.size))
+    n = codes.size - SHINGLE + 1
+    hashed = np.zeros(n, dtype=np.uint64)
+    for i in range(SHINGLE):
+        hashed = (hashed << np.uint64(21)) | codes[i:i + n]
+    return np.unique(hashed)
+
+
+def signature(text: str) -> bytes:
+    hashed = shingles(text)
+    mins = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, hashed.size, CHUNK):
+        chunk = hashed[start:start + CHUNK]
+        # (a·x + b) mod 2^64 取高 32 bits；uint64 乘法溢位即為 mod 2^64
+        values = (_A[:, None] * chunk[None, :] + _B[:, None]) >> np.uint64(32)
+        np.minimum(mins, values.min(axis=1), out=mins)
+    return mins.astype("<u4").tobytes()
+
+
+def similarities(sig: bytes, history: list[bytes]) -> np.ndarray:
+    """與每則歷史簽章的 Jaccard 估計值，順序同 history；任一方為空集合時為 0"""
+    vector = np.frombuffer(sig, dtype="<u4")
+    if not history or (vector == _EMPTY).all():
+        return np.zeros(len(history))
+    matrix = np.frombuffer(b"".join(history), dtype="<u4").reshape(len(history), NUM_PERM)
+    sims = (matrix == vector).mean(axis=1)
+    sims[(matrix == _EMPTY).all(axis=1)] = 0.0
+    return sims
+
+
+def score(sig: bytes, history: list[bytes]) -> float:
+    """重複度 0~1：與最相似的一則歷史回答的相似度；沒有歷史時為 0"""
+    if not history:
+        return 0.0
+    return float(similarities(sig, history).max())
@@ -0,0 +1,109 @@
+# services/scoring_queue.py
+"""
+回答評分背景佇列
+--------------------------------------------------
+submit_answer 只把回答放進 score_jobs，立即回傳下一題；
+背景 worker 取出工作、呼叫 score_answer（同 process 內同時評分的回答合併成一次 LLM 呼叫），再回填 answers 的三項分數。
+LLM 呼叫或解析失敗時工作退回 pending，並依嘗試次數指數延後 not_before，
+避免上游故障時 worker 不停重試；MAX_ATTEMPTS 次後標為 failed，不寫入替代分數。
+佇列存在資料庫，多個 gunicorn worker（或多台 API 主機）共用同一張表，
+以 UPDATE ... RETURNING 原子地領取工作，不會重複評分（SQL 見 repositories.ScoreJobRepo）。
+本地預評分（follow_up.prescore）信心足夠的回答在 submit_answer 當下就有分數，不進佇列。
+    python -m services.scoring_queue   # 查看本地 / LLM 評分比例（escalation rate）
+"""
+from __future__ import annotations
+import json
+import logging
+
+import config
+from db import READ_ENGINE, WRITE_ENGINE
+from repositories import repos
+from services.follow_up import score_answer
+from services.worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+STALE_AFTER = 300  # 秒，running 超過 5 分鐘視為 worker 已掛，重新領取
+RETRY_BACKOFF = 30      # 秒，第 n 次失敗後等待 RETRY_BACKOFF × 2^(n-1) 再重試
+RETRY_BACKOFF_MAX = 600  # 秒
+
+
+def enqueue(conn, answer_id: int, user_id: int, answer: str) -> None:
+    """在呼叫端的交易中放入評分工作（與 answers INSERT 一起提交）"""
+    repos.score_jobs.enqueue(conn, answer_id, user_id, answer)
+
+
+def notify() -> None:
+    """交易提交後呼叫，喚醒本 process 的 worker"""
+    _pool.notify()
+
+
+def pending_count(conn, user_id: int) -> int:
+    """尚未完成評分的回答數"""
+    return repos.score_jobs.pending_count(conn, user_id)
+
+
+def _has_ready() -> bool:
+    """唯讀檢查是否有可領取的工作，閒置輪詢時避免每次都開寫入交易"""
+    with READ_ENGINE.connect() as conn:
+        return repos.score_jobs.has_ready(conn, STALE_AFTER)
+
+
+def stats() -> dict:
+    """
+    全部回答的評分來源；escalation_rate 為需要 LLM 評分（含排隊中、同步評分失敗改給中間分數）的比例
+    """
+    with READ_ENGINE.connect() as conn:
+        counts = repos.answers.score_sources(conn)
+    local, llm_scored, pending = counts.get("local", 0), counts.get("llm", 0), counts.get("pending", 0)
+    fallback = counts.get("fallback", 0)
+    total = local + llm_scored + pending + fallback
+    return {
+        "local": local,
+        "llm": llm_scored,
+        "fallback": fallback,
+        "pending": pending,
+        "escalation_rate": (llm_scored + pending + fallback) / total if total else 0.0,
+    }
+
+
+def _claim():
+    with WRITE_ENGINE.begin() as conn:
+        return repos.score_jobs.claim(conn, STALE_AFTER)
+
+
+def retry_delay(attempts: int) -> int:
+    """第 attempts 次失敗後到下次重試的秒數"""
+    return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def _process(job) -> None:
+    job_id, answer_id, user_id, answer, attempts = job
+    try:
+        detail, emotion, reflection = score_answer(answer)
+        with WRITE_ENGINE.begin() as conn:
+            if repos.answers.set_scores(conn, answer_id, detail, emotion, reflection):
+                aqi = (detail + emotion + reflection) / 3
+                repos.progress.record_scores(conn, user_id, aqi)
+                repos.question_templates.record_for_answer(conn, answer_id, aqi)
+            repos.score_jobs.finish(conn, job_id, "done")
+    except Exception as e:
+        logger.error(f"Score job {job_id} failed: {str(e)}")
+        with WRITE_ENGINE.begin() as conn:
+            if attempts >= MAX_ATTEMPTS:
+                repos.score_jobs.finish(conn, job_id, "failed", error=str(e))
+            else:
+                repos.score_jobs.retry(conn, job_id, str(e), retry_delay(attempts))
+
+
+_pool = WorkerPool("score-worker", _claim, _process, has_work=_has_ready)
+
+
+def start_workers(n: int = config.SCORE_WORKERS) -> None:
+    """啟動背景評分執行緒（每個 process 只啟動一次）"""
+    _pool.start(n)
+
+
+if __name__ == "__main__":
+    print(json.dumps(stats(), indent=2))
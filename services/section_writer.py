@@ -0,0 +1,124 @@
+# services/section_writer.py
+"""
+逐故事草稿 + 串接的自傳生成
+--------------------------------------------------
+map：每個 (主題, story_id) 各自寫成一段，平行呼叫 SECTION_MODEL
+reduce：依主題、故事順序串接，每個主題前加上 `## 主題` 標題（本機組合，不再呼叫 LLM）
+每段走 llm.chat 強制快取（任何 temperature 皆然）：key 為該故事的問答、style / language / usage /
+emotion / aim、每段字數與 temperature 的雜湊，因此只新增或修改一則回答時，只有那個故事需要重寫，
+其餘段落直接命中快取。opts["regenerate"] 為真時略過快取重寫每一段並覆寫舊段落。
+每段字數 = length 的數字 ÷ 故事數，無條件進位到 WORDS_STEP 的倍數，故事數小幅變動時不影響其他段落的快取。
+任何一段失敗即整篇失敗；已完成的段落留在快取，重試時不必重寫。
+"""
+from __future__ import annotations
+import math
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+import config
+from services import llm
+from services.context_builder import render_answers
+
+WORDS_STEP = 100
+MIN_SECTION_WORDS = 100
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.LLM_MAX_WORKERS, thread_name_prefix="sections")
+
+
+def group_stories(qa_data: list[dict]) -> OrderedDict[tuple, list[dict]]:
+    """(主題, story_id) → 已回答的問答，保持原本順序"""
+    stories: OrderedDict[tuple, list[dict]] = OrderedDict()
+    for qa in qa_data:
+        if qa["answer"] != "未回答":
+            stories.setdefault((qa["theme"], qa.get("story_id")), []).append(qa)
+    return stories
+
+
+def section_words(length: str, sections: int) -> int:
+    """把全篇字數（例如「500 字」）平均分給各段；沒有數字時用下限"""
+    match = re.search(r"\d+", length or "")
+    if not match or not sections:
+        return MIN_SECTION_WORDS
+    words = math.ceil(int(match.group()) / sections / WORDS_STEP) * WORDS_STEP
+    return max(MIN_SECTION_WORDS, words)
+
+
+def section_prompt(theme: str, material: str, opts: dict, words: int) -> str:
+    """material 為該故事已排版的問答（render_answers）"""
+    return (
+        f"{material}\n以上是受訪者在「{theme}」主題中同一段故事的問答。"
+        f"請以{opts['language']}、第一人稱改寫成自傳中的一個段落，約 {words} 字，風格為{opts['style']}，"
+        f"用途為{opts['usage']}，具備{opts['emotion']}的情感，目的是{opts['aim']}。"
+        "保留具體的人物、地點、時間與細節，不要加入問答中沒有的內容，不要加標題，只輸出段落本身。"
+        "如果有相關圖片路徑，請在適當位置以 ![圖片說明](圖片路徑) 的 markdown 格式嵌入圖片。"
+    )
+
+
+def draft_section(prompt: str, temperature: float, refresh: bool = False) -> str:
+    return llm.chat(
+        messages=[{"role": "user", "content": prompt}],
+        model=config.SECTION_MODEL,
+        temperature=temperature,
+        max_tokens=config.SECTION_MAX_TOKENS,
+        cache=True,
+        refresh=refresh,
+    )
+
+
+def _draft_args(opts: dict) -> tuple[float, bool]:
+    """draft_section 除了 prompt 以外的參數"""
+    return opts["temperature"], opts.get("regenerate", False)
+
+
+def _prompts(stories: OrderedDict[tuple, list[dict]], materials: dict, opts: dict) -> list[str]:
+    words = section_words(opts["length"], len(stories))
+    return [section_prompt(key[0], materials[key], opts, words) for key in stories]
+
+
+def _assemble(stories: OrderedDict[tuple, list[dict]], drafts) -> Iterator[str]:
+    """依主題、故事順序逐段 yield，每個主題前加上標題"""
+    current_theme = None
+    for (theme, _story_id), draft in zip(stories, drafts):
+        if current_theme is not None:
+            yield "\n\n"
+        if theme != current_theme:
+            yield f"## {theme}\n\n"
+            current_theme = theme
+        yield draft
+
+
+def write_stream(qa_data: list[dict], opts: dict) -> Iterator[str]:
+    """所有段落同時開始；依主題、故事順序逐段 yield（含主題標題）"""
+    stories = group_stories(qa_data)
+    materials = {key: render_answers(qas) for key, qas in stories.items()}
+    args = _draft_args(opts)
+    drafts = _EXECUTOR.map(lambda prompt: draft_section(prompt, *args), _prompts(stories, materials, opts))
+    yield from _assemble(stories, drafts)
+
+
+def write(qa_data: list[dict], opts: dict) -> str:
+    return "".join(write_stream(qa_data, opts)).strip()
+
+
+def write_many(qa_data: list[dict], variants: list[dict]) -> list[str]:
+    """
+    一次生成多個版本：問答只分組、排版一次，所有版本的所有段落一起送進執行緒池，
+    prompt 與 temperature 都相同的段落（例如只有 length 不同且每段字數相同）只呼叫一次。
+    回傳順序與 variants 相同；任何一段失敗即往外拋。
+    """
+    stories = group_stories(qa_data)
+    materials = {key: render_answers(qas) for key, qas in stories.items()}
+    futures = {}
+    per_variant = []
+    for opts in variants:
+        keys = [(prompt, *_draft_args(opts)) for prompt in _prompts(stories, materials, opts)]
+        for key in keys:
+            if key not in futures:
+                futures[key] = _EXECUTOR.submit(draft_section, *key)
+        per_variant.append(keys)
+    return [
+        "".join(_assemble(stories, (futures[k].result() for k in keys))).strip()
+        for keys in per_variant
+    ]
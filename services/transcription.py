@@ -0,0 +1,187 @@
+# services/transcription.py
+"""
+錄音轉錄流程
+--------------------------------------------------
+1. 以音檔 sha256 + 語言 + 模型查 llm_cache，重複上傳同一檔案不再付費（快取無法讀寫時視為未命中）
+2. 長錄音依靜音切段：WAV 直接讀取，其他格式在有 ffmpeg 時轉成 16 kHz 單聲道 WAV；
+   每 30 ms 計算 RMS，在每段後半找最後一個夠長的靜音中點切開，找不到時在長度上限硬切
+3. 各段平行轉錄（AUDIO_TRANSCRIBE_WORKERS，總併發仍受 llm 的 semaphore 限制），依序接回
+無法解碼（非 WAV 且沒有 ffmpeg）或長度不超過一段時，整個檔案直接送出。
+TRANSCRIBER=stub 時改用本機假轉錄，整條流程可離線測試。
+"""
+from __future__ import annotations
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+from services import llm
+from services.llm_cache import CACHE
+
+logger = logging.getLogger(__name__)
+
+WHISPER_MODEL = "whisper-1"
+FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = 0.4
+SILENCE_DBFS = -40.0  # 低於此音量視為靜音
+READ_FRAMES = 1 << 16  # 計算音量時每次讀取的 sample 數
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.AUDIO_TRANSCRIBE_WORKERS, thread_name_prefix="transcribe")
+
+
+def _model() -> str:
+    return "stub" if config.TRANSCRIBER == "stub" else WHISPER_MODEL
+
+
+def _cache_key(audio_hash: str, language: str) -> str:
+    return CACHE.make_key(_model(), [{"role": "audio", "content": audio_hash}], {"language": language})
+
+
+def cached(audio_hash: str, language: str) -> str | None:
+    """只查快取、不需要音檔；已轉錄過（音檔可能已刪除）時直接回傳逐字稿"""
+    try:
+        return CACHE.get(_cache_key(audio_hash, language))
+    except sqlite3.Error as e:
+        logger.warning(f"Transcription cache read failed: {str(e)}")
+        return None
+
+
+def stub_transcribe(path: str, language: str) -> str:
+    """離線用的假轉錄：回傳可辨識的片段長度，不呼叫任何外部服務"""
+    try:
+        with wave.open(path, "rb") as w:
+            return f"（{language} 片段 {w.getnframes() / w.getframerate():.1f} 秒）"
+    except (wave.Error, EOFError):
+        return f"（{language} 音檔 {os.path.getsize(path)} bytes）"
+
+
+def _transcribe_one(path: str, language: str) -> str:
+    if config.TRANSCRIBER == "stub":
+        return stub_transcribe(path, language)
+    return llm.transcribe(path, language=language, model=WHISPER_MODEL)
+
+
+# ---------- 解碼與切段 ----------
+def _as_wav(path: str, workdir: str) -> str | None:
+    """回傳 16-bit PCM WAV 路徑；無法解碼時回 None"""
+    try:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() == 2:
+                return path
+    except (wave.Error, EOFError):
+        pass
+    if shutil.which("ffmpeg") is None:
+        return None
+    out = os.path.join(workdir, "decoded.wav")
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", path, "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", out],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        logger.warning(f"ffmpeg decode failed: {result.stderr.decode(errors='replace')[:200]}")
+        return None
+    return out
+
+
+def _frame_rms(w: wave.Wave_read, frame_len: int) -> np.ndarray:
+    """逐塊讀取，回傳每個 frame 的 RMS（0~1）；記憶體與錄音長度無關（除了結果陣列本身）"""
+    channels = w.getnchannels()
+    rms = []
+    carry = np.empty(0, dtype=np.float32)
+    w.rewind()
+    while True:
+        data = w.readframes(READ_FRAMES)
+        if not data:
+            break
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        samples = np.concatenate([carry, samples])
+        whole = len(samples) // frame_len * frame_len
+        if whole:
+            frames = samples[:whole].reshape(-1, frame_len)
+            rms.append(np.sqrt(np.mean(frames * frames, axis=1)))
+        carry = samples[whole:]
+    if len(carry):
+        rms.append(np.sqrt(np.mean(carry * carry, keepdims=True)))
+    return np.concatenate(rms) if rms else np.empty(0, dtype=np.float32)
+
+
+def split_points(rms: np.ndarray, max_frames: int, min_silence_frames: int) -> list[tuple[int, int]]:
+    """回傳 [(起始 frame, 結束 frame)]，每段不超過 max_frames，盡量在靜音中點切開"""
+    n = len(rms)
+    silent = (rms < 10 ** (SILENCE_DBFS / 20)).astype(np.int8)
+    edges = np.diff(np.concatenate(([0], silent, [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_runs = ends - starts >= min_silence_frames
+    midpoints = (starts[long_runs] + ends[long_runs]) // 2
+
+    segments = []
+    start = 0
+    while n - start > max_frames:
+        lo, hi = start + max_frames // 2, start + max_frames
+        candidates = midpoints[(midpoints > lo) & (midpoints <= hi)]
+        cut = int(candidates[-1]) if len(candidates) else hi
+        segments.append((start, cut))
+        start = cut
+    segments.append((start, n))
+    return segments
+
+
+def split_on_silence(path: str, workdir: str) -> list[str]:
+    """切成多個 WAV 片段並回傳路徑；不需要或無法切段時回傳 [path]"""
+    wav_path = _as_wav(path, workdir)
+    if wav_path is None:
+        return [path]
+    with wave.open(wav_path, "rb") as w:
+        rate = w.getframerate()
+        if w.getnframes() <= config.AUDIO_SEGMENT_SECONDS * rate:
+            return [path]
+        frame_len = max(int(rate * FRAME_SECONDS), 1)
+        rms = _frame_rms(w, frame_len)
+        segments = split_points(
+            rms,
+            max_frames=int(config.AUDIO_SEGMENT_SECONDS / FRAME_SECONDS),
+            min_silence_frames=int(MIN_SILENCE_SECONDS / FRAME_SECONDS),
+        )
+        paths = []
+        for i, (start, end) in enumerate(segments):
+            w.setpos(min(start * frame_len, w.getnframes()))
+            out = os.path.join(workdir, f"segment_{i:04d}.wav")
+            with wave.open(out, "wb") as seg:
+                seg.setparams(w.getparams())
+                seg.writeframes(w.readframes((end - start) * frame_len))
+            paths.append(out)
+    return paths
+
+
+# ---------- 對外介面 ----------
+def transcribe(path: str, audio_hash: str, language: str) -> str:
+    """轉錄整個音檔（快取 → 切段 → 平行轉錄 → 依序接回）"""
+    hit = cached(audio_hash, language)
+    if hit is not None:
+        return hit
+
+    with tempfile.TemporaryDirectory(prefix="transcribe_") as workdir:
+        segments = split_on_silence(path, workdir)
+        if len(segments) == 1:
+            texts = [_transcribe_one(segments[0], language)]
+        else:
+            logger.info(f"Transcribing {len(segments)} segments of {audio_hash[:12]}")
+            texts = list(_EXECUTOR.map(lambda p: _transcribe_one(p, language), segments))
+
+    # 中日韓文字不以空白分詞
+    sep = "" if language.split("-")[0] in ("zh", "ja", "ko") else " "
+    text = sep.join(t.strip() for t in texts if t and t.strip())
+    try:
+        CACHE.set(_cache_key(audio_hash, language), _model(), text)
+    except sqlite3.Error as e:
+        logger.warning(f"Transcription cache write failed: {str(e)}")
+    return text
@@ -0,0 +1,63 @@
+# services/worker_pool.py
+"""
+資料表佇列的背景執行緒池
+--------------------------------------------------
+claim() 從資料表原子地領取一筆工作（沒有則回傳 None），process(job) 執行它。
+交易提交後呼叫 notify() 可立即喚醒並直接領取；閒置時每 poll_interval 秒
+（QUEUE_IDLE_POLL）以唯讀的 has_work() 查看一次，確定有工作才開寫入交易 claim，
+用來接手其他 gunicorn worker 放入或逾時未完成的工作。
+"""
+from __future__ import annotations
+import logging
+import threading
+from typing import Callable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    def __init__(self, name: str, claim: Callable, process: Callable,
+                 has_work: Callable | None = None, poll_interval: float = config.QUEUE_IDLE_POLL):
+        self.name = name
+        self.claim = claim
+        self.process = process
+        self.has_work = has_work
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def _loop(self) -> None:
+        idle = False  # 閒置輪詢醒來時先唯讀檢查；剛啟動、被 notify 或剛做完工作則直接領取
+        while True:
+            job = None
+            try:
+                if not idle or self.has_work is None or self.has_work():
+                    job = self.claim()
+            except Exception as e:
+                logger.error(f"{self.name} claim error: {str(e)}")
+            if job is None:
+                idle = not self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            idle = False
+            try:
+                self.process(job)
+            except Exception as e:
+                logger.error(f"{self.name} job error: {str(e)}")
+
+    def start(self, n: int) -> None:
+        """啟動 n 條 daemon 執行緒（每個 process 只啟動一次）"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(n):
+                t = threading.Thread(target=self._loop, name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            logger.info(f"Started {n} {self.name} workers")
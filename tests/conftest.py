@@ -0,0 +1,72 @@
+# tests/conftest.py
+"""
+pytest 共用設定
+--------------------------------------------------
+在匯入任何專案模組前把資料庫與 LLM 快取指向暫存目錄，
+並以假的 OpenAI client 取代真正的 API（測試不需網路與金鑰）。
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+_TMP = tempfile.mkdtemp(prefix="biography-tests-")
+os.environ["DATABASE"] = os.path.join(_TMP, "database.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.environ['DATABASE']}"
+os.environ["DATABASE_READ_URL"] = os.environ["DATABASE_URL"]
+os.environ["LLM_CACHE_DB"] = os.path.join(_TMP, "llm_cache.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-for-local-runs-only")
+os.environ["LLM_MAX_RETRIES"] = "0"
+os.environ["ASYNC_SCORING"] = "0"  # 匯入 app 時不啟動背景評分 worker，測試自行領取工作
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["TRANSCRIBER"] = "stub"
+os.environ["AUDIO_UPLOAD_DIR"] = os.path.join(_TMP, "audio")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    import migrations
+    from db import WRITE_ENGINE
+
+    migrations.migrate(WRITE_ENGINE)
+
+
+class FailingOpenAI:
+    """每次呼叫都失敗的 client；ValueError 不在 RETRYABLE_ERRORS 內，不會重試"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        raise ValueError("upstream unavailable")
+
+
+@pytest.fixture
+def failing_llm(monkeypatch):
+    from services import llm
+
+    client = FailingOpenAI()
+    monkeypatch.setattr(llm, "_client", client)
+    return client
+
+
+@pytest.fixture
+def client():
+    from app import app
+
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_header():
+    from services import auth
+
+    return {"Authorization": f"Bearer {auth.issue_token(1)}"}
@@ -0,0 +1,72 @@
+# tests/test_audio_uploads.py
+"""
+分塊上傳與轉錄快取
+--------------------------------------------------
+TRANSCRIBER=stub（見 conftest.py），不呼叫 Whisper。
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import time
+import wave
+
+import config
+from services import audio_uploads, transcription
+from services.llm_cache import CACHE
+
+
+def _wav_bytes(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buf.getvalue()
+
+
+def _age(path: str, seconds: float) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_purge_keeps_upload_with_recent_chunk():
+    user_id = 7001
+    upload = audio_uploads.create(user_id, "a.wav", 100)
+    part_path, meta_path = audio_uploads._paths(user_id, upload["upload_id"])
+    _age(meta_path, config.AUDIO_UPLOAD_TTL + 60)  # 很久以前建立，剛剛才寫入一塊
+    audio_uploads.append(user_id, upload["upload_id"], 0, io.BytesIO(b"x" * 10))
+
+    audio_uploads.purge_stale(user_id)
+    assert audio_uploads.status(user_id, upload["upload_id"])["received"] == 10
+
+    _age(part_path, config.AUDIO_UPLOAD_TTL + 60)
+    audio_uploads.purge_stale(user_id)
+    assert not os.path.exists(part_path) and not os.path.exists(meta_path)
+
+
+def test_cache_errors_are_a_miss(monkeypatch, tmp_path):
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(CACHE, "get", broken)
+    monkeypatch.setattr(CACHE, "set", broken)
+    path = tmp_path / "a.wav"
+    path.write_bytes(_wav_bytes())
+    assert transcription.transcribe(str(path), "0" * 64, "zh") == "（zh 片段 1.0 秒）"
+
+
+def test_transcribed_hash_is_served_from_cache_after_discard(client, auth_header):
+    data = {"language": "zh", "file": (io.BytesIO(_wav_bytes(2.0)), "answer.wav")}
+    rsp = client.post("/biography/transcribe-only", data=data, headers=auth_header,
+                      content_type="multipart/form-data")
+    assert rsp.status_code == 200
+    text = rsp.get_json()["transcription"]
+
+    # 音檔已在轉錄後刪除，以同一個 audio_hash 重試仍取得逐字稿
+    audio_hash = hashlib.sha256(_wav_bytes(2.0)).hexdigest()
+    rsp = client.post("/biography/transcribe-only", data={"language": "zh", "audio_hash": audio_hash},
+                      headers=auth_header, content_type="multipart/form-data")
+    assert rsp.status_code == 200
+    assert rsp.get_json()["transcription"] == text
@@ -0,0 +1,37 @@
+# tests/test_auth.py
+"""
+登出與撤銷清單
+--------------------------------------------------
+登出後同一個 token 立即被拒；其他 worker 寫入的撤銷紀錄即使 id 較小、較晚提交也會同步到。
+"""
+import time
+
+from sqlalchemy import text
+
+from db import WRITE_ENGINE
+from services import auth
+
+
+def test_logout_revokes_token(client, auth_header):
+    assert client.get("/biography/progress", headers=auth_header).status_code == 200
+    assert client.post("/auth/logout", headers=auth_header).status_code == 200
+    rsp = client.get("/biography/progress", headers=auth_header)
+    assert rsp.status_code == 401
+    assert rsp.get_json()["error"] == "Token has been revoked"
+
+
+def test_sync_sees_rows_committed_out_of_id_order():
+    revoked = auth.RevocationList(sync_interval=60)
+    exp = int(time.time()) + 3600
+    with WRITE_ENGINE.begin() as conn:
+        conn.execute(text("INSERT INTO revoked_tokens (id, jti, user_id, expires_at) VALUES (900000, 'jti-late-id', 1, :exp)"),
+                     {"exp": exp})
+    revoked.sync()
+    assert revoked.is_revoked("jti-late-id")
+
+    # 模擬 PostgreSQL 上先取得較小 id、較晚才提交的另一個 worker
+    with WRITE_ENGINE.begin() as conn:
+        conn.execute(text("INSERT INTO revoked_tokens (id, jti, user_id, expires_at) VALUES (800000, 'jti-early-id', 1, :exp)"),
+                     {"exp": exp})
+    revoked.sync()
+    assert revoked.is_revoked("jti-early-id")
@@ -0,0 +1,54 @@
+# tests/test_biography_options.py
+"""
+傳記生成參數驗證
+--------------------------------------------------
+錯誤的參數應在呼叫 LLM 前就回 400，而不是在 float() 時變成 500。
+"""
+import pytest
+
+from services import biography_writer
+from services.biography_writer import InvalidOptions, parse_options
+
+
+def test_defaults():
+    opts = parse_options({})
+    assert opts["style"] == "自然"
+    assert opts["temperature"] == 0.9
+    assert opts["regenerate"] is False
+
+
+def test_numeric_strings_and_length_are_normalised():
+    opts = parse_options({"temperature": "0", "length": 800})
+    assert opts["temperature"] == 0.0
+    assert opts["length"] == "800 字"
+
+
+@pytest.mark.parametrize("data", [
+    {"temperature": "hot"},
+    {"temperature": None},
+    {"temperature": True},
+    {"temperature": [1]},
+    {"temperature": -0.1},
+    {"temperature": 2.5},
+    {"temperature": "nan"},
+    {"style": 3},
+    {"language": ""},
+    {"aim": "x" * (biography_writer.MAX_OPTION_CHARS + 1)},
+    {"regenerate": "yes"},
+])
+def test_invalid_options_raise(data):
+    with pytest.raises(InvalidOptions):
+        parse_options(data)
+
+
+@pytest.mark.parametrize("path", ["/biography/generate", "/biography/generate/stream", "/biography/generate/jobs"])
+def test_routes_reject_invalid_temperature_with_400(client, auth_header, path):
+    resp = client.post(path, json={"temperature": "hot"}, headers=auth_header)
+    assert resp.status_code == 400
+    assert "temperature" in resp.get_json()["error"]
+
+
+def test_batch_rejects_invalid_variant_with_400(client, auth_header):
+    resp = client.post("/biography/generate/batch", json={"variants": [{"temperature": "hot"}]}, headers=auth_header)
+    assert resp.status_code == 400
+    assert "temperature" in resp.get_json()["error"]
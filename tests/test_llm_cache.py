@@ -0,0 +1,59 @@
+# tests/test_llm_cache.py
+import os
+import sqlite3
+
+from services.llm_cache import ACCESS_FLUSH_MAX, LLMCache
+
+
+def _row(path: str, key: str):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_access, hits FROM llm_cache WHERE key = ?", (key,)).fetchone()
+
+
+def test_file_created_on_first_use(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMCache(path, ttl=60, max_entries=10)
+    assert not os.path.exists(path)
+    assert cache.get("missing") is None
+    assert os.path.exists(path)
+
+
+def test_hits_are_buffered_and_flushed_in_batch(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMCache(path, ttl=60, max_entries=10)
+    cache.set("k", "gpt-4o", "response")
+    created_access, _ = _row(path, "k")
+
+    for _ in range(3):
+        assert cache.get("k") == "response"
+    assert _row(path, "k") == (created_access, 0)  # 讀取不寫檔
+    assert (cache.hits, cache.misses) == (3, 0)
+
+    assert cache.flush() == 1
+    last_access, hits = _row(path, "k")
+    assert hits == 3 and last_access >= created_access
+
+
+def test_flush_when_buffer_full(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMCache(path, ttl=60, max_entries=ACCESS_FLUSH_MAX * 2)
+    for i in range(ACCESS_FLUSH_MAX):
+        cache.set(f"k{i}", "gpt-4o", "response")
+    for i in range(ACCESS_FLUSH_MAX):
+        cache.get(f"k{i}")
+    assert cache._touched == {}
+    assert _row(path, f"k{ACCESS_FLUSH_MAX - 1}")[1] == 1
+
+
+def test_expired_entry_is_a_miss_without_write(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMCache(path, ttl=60, max_entries=10)
+    cache.set("k", "gpt-4o", "response")
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE llm_cache SET created_at = created_at - 120 WHERE key = 'k'")
+
+    assert cache.get("k") is None
+    assert cache.misses == 1
+    assert _row(path, "k") is not None  # 由 evict 清除，不在讀取時刪除
+    assert cache.evict() == 1
+    assert _row(path, "k") is None
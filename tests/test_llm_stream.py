@@ -0,0 +1,47 @@
+# tests/test_llm_stream.py
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+from services import llm
+
+
+class SlowStreamOpenAI:
+    """回傳固定 delta 的串流，記錄上游是否已讀完"""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.finished = threading.Event()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        def stream():
+            for d in self.deltas:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))])
+            self.finished.set()
+        return stream()
+
+
+def test_stream_releases_slot_when_upstream_finishes(monkeypatch):
+    client = SlowStreamOpenAI(["一", "二", "三"])
+    monkeypatch.setattr(llm, "_client", client)
+    monkeypatch.setattr(llm, "_semaphore", threading.BoundedSemaphore(1))
+
+    stream = llm.chat_stream([{"role": "user", "content": "hi"}], temperature=0.7)
+    assert next(stream) == "一"
+    assert client.finished.wait(2)
+    # client 尚未讀完，名額已經釋放
+    assert llm._semaphore.acquire(timeout=2)
+    llm._semaphore.release()
+    assert list(stream) == ["二", "三"]
+
+
+def test_stream_ignores_cache_errors(monkeypatch):
+    monkeypatch.setattr(llm, "_client", SlowStreamOpenAI(["a", "b"]))
+
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(llm.CACHE, "get", broken)
+    monkeypatch.setattr(llm.CACHE, "set", broken)
+
+    assert "".join(llm.chat_stream([{"role": "user", "content": "hi"}], temperature=0)) == "ab"
@@ -0,0 +1,70 @@
+# tests/test_migrations.py
+import importlib
+import threading
+
+from sqlalchemy import create_engine, text
+
+import migrations
+
+
+def test_concurrent_migrate_applies_each_version_once(tmp_path):
+    """模擬多個 worker 同時啟動：各自的連線池同時 migrate 同一個新資料庫"""
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+    engines = [create_engine(url) for _ in range(4)]
+    barrier = threading.Barrier(len(engines))
+    ran, errors = [], []
+
+    def run(engine):
+        barrier.wait()
+        try:
+            ran.extend(migrations.migrate(engine))
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(engine,)) for engine in engines]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    names = [name for _, name in migrations.available()]
+    assert sorted(ran) == names
+    with engines[0].connect() as conn:
+        versions = [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+    assert versions == [version for version, _ in migrations.available()]
+    for engine in engines:
+        engine.dispose()
+
+
+def test_minhash_migration_recomputes_redundancy(tmp_path):
+    """0008 回填簽章時一併以 MinHash 重算 redundancy，舊的 difflib 比值不保留"""
+    from services import redundancy
+    minhash = importlib.import_module("migrations.0008_answer_minhash")
+    story = "小時候每年暑假都回外婆家，跟表哥在溪邊抓魚，傍晚外婆會煮一大鍋綠豆湯等我們回家。"
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("""CREATE TABLE answers (id INTEGER PRIMARY KEY, user_id INTEGER, question_id INTEGER,
+                                                   answer TEXT, redundancy REAL)"""))
+        conn.execute(
+            text("INSERT INTO answers (user_id, question_id, answer, redundancy) VALUES (:u, :q, :a, 0.9)"),
+            [
+                {"u": 1, "q": 1, "a": story},
+                {"u": 1, "q": 1, "a": story},                 # 同一題重答，不與自己比
+                {"u": 1, "q": 2, "a": "我在台北念大學，主修機械工程。"},
+                {"u": 1, "q": 3, "a": story + "那是我最快樂的時光。"},
+                {"u": 1, "q": 4, "a": "  "},
+                {"u": 2, "q": 5, "a": story},                 # 其他使用者不互相比對
+            ],
+        )
+        minhash.upgrade(conn)
+        rows = conn.execute(text("SELECT answer, redundancy, minhash FROM answers ORDER BY id")).fetchall()
+    engine.dispose()
+
+    reds = [row[1] for row in rows]
+    assert reds[0] == reds[1] == reds[5] == 0.0
+    assert reds[2] < 0.2
+    assert reds[3] > 0.7
+    assert reds[4] == 0.0
+    for answer, _red, sig in rows:
+        assert sig == redundancy.signature(answer)
@@ -0,0 +1,17 @@
+# tests/test_question_bank.py
+import pytest
+
+import config
+from services import question_bank
+
+
+@pytest.mark.parametrize("question_id", ["12.5", "abc", None, [1]])
+def test_serves_rejects_non_integer_ids(monkeypatch, question_id):
+    monkeypatch.setattr(config, "QUESTION_BANK_FRACTION", 1.0)
+    assert question_bank.serves(question_id) is False
+
+
+def test_serves_accepts_numeric_strings(monkeypatch):
+    monkeypatch.setattr(config, "QUESTION_BANK_FRACTION", 1.0)
+    assert question_bank.serves("12") is True
+    assert question_bank.serves(12) is True
@@ -0,0 +1,19 @@
+# tests/test_redundancy.py
+from services import redundancy
+
+STORY = "小時候每年暑假都回外婆家，跟表哥在溪邊抓魚，傍晚外婆會煮一大鍋綠豆湯等我們回家。"
+
+
+def test_repeat_scores_higher_than_unrelated_answer():
+    history = [redundancy.signature(STORY), redundancy.signature("我在台北念大學，主修機械工程。")]
+    reworded = redundancy.signature("每年暑假我都回外婆家，跟表哥在溪邊抓魚，傍晚外婆煮綠豆湯等我們。")
+    sims = redundancy.similarities(reworded, history)
+    assert sims[0] > 0.3 > sims[1]
+    assert redundancy.score(reworded, history) == sims[0]
+
+
+def test_empty_shingle_set_has_zero_similarity():
+    empty = redundancy.signature(" \n ")
+    assert redundancy.score(empty, [redundancy.signature("")]) == 0.0
+    assert redundancy.score(redundancy.signature(STORY), [empty]) == 0.0
+    assert redundancy.score(empty, []) == 0.0
@@ -0,0 +1,63 @@
+# tests/test_scoring_queue.py
+import uuid
+
+from sqlalchemy import text
+
+from db import WRITE_ENGINE
+from services import scoring_queue
+
+
+def _pending_answer() -> int:
+    """建立一筆尚未評分的回答並放入佇列，回傳 answer_id"""
+    answer = f"我小時候住在外婆家，每天傍晚幫忙餵雞。{uuid.uuid4().hex}"
+    with WRITE_ENGINE.begin() as conn:
+        answer_id = conn.execute(
+            text("INSERT INTO answers (user_id, question_id, answer) VALUES (1, 1, :ans) RETURNING id"),
+            {"ans": answer},
+        ).fetchone()[0]
+        scoring_queue.enqueue(conn, answer_id, 1, answer)
+    return answer_id
+
+
+def _job(answer_id: int):
+    with WRITE_ENGINE.connect() as conn:
+        return conn.execute(
+            text("SELECT status, attempts, not_before FROM score_jobs WHERE answer_id = :aid"), {"aid": answer_id}
+        ).fetchone()
+
+
+def test_failing_llm_backs_off_then_marks_job_failed(failing_llm):
+    answer_id = _pending_answer()
+
+    for attempt in range(1, scoring_queue.MAX_ATTEMPTS + 1):
+        assert scoring_queue._has_ready()
+        job = scoring_queue._claim()
+        assert job is not None and job[1] == answer_id and job[-1] == attempt
+        scoring_queue._process(job)
+        status, _, not_before = _job(answer_id)
+        if attempt < scoring_queue.MAX_ATTEMPTS:
+            # 退回 pending 但延後重試，不能馬上再領到
+            assert status == "pending" and not_before is not None
+            assert not scoring_queue._has_ready()
+            assert scoring_queue._claim() is None
+            with WRITE_ENGINE.begin() as conn:  # 模擬等待時間已過
+                conn.execute(text("UPDATE score_jobs SET not_before = NULL WHERE answer_id = :aid"),
+                             {"aid": answer_id})
+
+    assert scoring_queue._claim() is None
+    assert failing_llm.calls == scoring_queue.MAX_ATTEMPTS
+    status, attempts, _ = _job(answer_id)
+    assert (status, attempts) == ("failed", scoring_queue.MAX_ATTEMPTS)
+    with WRITE_ENGINE.connect() as conn:
+        scores = conn.execute(
+            text("SELECT detail_score, emotion_score, reflection_score FROM answers WHERE id = :aid"),
+            {"aid": answer_id},
+        ).fetchone()
+    assert tuple(scores) == (None, None, None)
+
+
+def test_retry_delay_grows_and_is_capped():
+    delays = [scoring_queue.retry_delay(n) for n in range(1, 10)]
+    assert delays == sorted(delays)
+    assert delays[0] == scoring_queue.RETRY_BACKOFF
+    assert delays[-1] == scoring_queue.RETRY_BACKOFF_MAX
@@ -0,0 +1,87 @@
+# tests/test_section_writer.py
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from services import biography_writer, llm, section_writer
+
+QA_DATA = [
+    {"theme": "童年", "story_id": 1, "question": "最難忘的回憶？", "answer": "和外婆去市場。", "image_path": None},
+    {"theme": "求學", "story_id": 1, "question": "印象最深的老師？", "answer": "國中的導師。", "image_path": None},
+]
+
+
+class RecordingOpenAI:
+    def __init__(self):
+        self.temperatures = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature, **kwargs):
+        self.temperatures.append(temperature)
+        content = f"段落{len(self.temperatures)}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = RecordingOpenAI()
+    monkeypatch.setattr(llm, "_client", client)
+    return client
+
+
+def _fresh_qa_data():
+    """每個測試用不同的回答，避免共用的 LLM 快取互相影響"""
+    suffix = uuid.uuid4().hex
+    return [dict(qa, answer=f"{qa['answer']}{suffix}") for qa in QA_DATA]
+
+
+@pytest.mark.parametrize("temperature", [0, 0.9])
+def test_sections_are_cached_at_any_temperature(client, temperature):
+    qa_data = _fresh_qa_data()
+    opts = biography_writer.parse_options({"temperature": temperature})
+
+    first = section_writer.write(qa_data, opts)
+    second = section_writer.write(qa_data, opts)
+
+    assert client.temperatures == [temperature, temperature]
+    assert first == second
+
+
+def test_edited_answer_only_redrafts_its_story(client):
+    qa_data = _fresh_qa_data()
+    opts = biography_writer.parse_options({})
+    section_writer.write(qa_data, opts)
+
+    qa_data[1]["answer"] += "後來我也當了老師。"
+    section_writer.write(qa_data, opts)
+    assert len(client.temperatures) == 3
+
+    section_writer.write(qa_data, biography_writer.parse_options({"temperature": 0.5}))
+    assert len(client.temperatures) == 5  # temperature 屬於快取鍵
+
+
+def test_regenerate_skips_and_overwrites_cache(client):
+    qa_data = _fresh_qa_data()
+    first = section_writer.write(qa_data, biography_writer.parse_options({}))
+
+    regenerated = section_writer.write(qa_data, biography_writer.parse_options({"regenerate": True}))
+    assert len(client.temperatures) == 4
+    assert regenerated != first
+
+    assert section_writer.write(qa_data, biography_writer.parse_options({})) == regenerated
+    assert len(client.temperatures) == 4
+
+
+def test_write_many_dedupes_identical_sections(client):
+    qa_data = _fresh_qa_data()
+    variants = [
+        biography_writer.parse_options({"length": 100}),
+        biography_writer.parse_options({"length": 150}),  # 每段同樣進位到 100 字
+        biography_writer.parse_options({"length": 100, "temperature": 0.3}),
+    ]
+
+    first, second, third = section_writer.write_many(qa_data, variants)
+
+    assert sorted(client.temperatures) == [0.3, 0.3, 0.9, 0.9]
+    assert first == second != third
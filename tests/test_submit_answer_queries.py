@@ -0,0 +1,85 @@
+# tests/test_submit_answer_queries.py
+"""
+submit_answer 的 SQL 陳述式預算：每個請求不得超過 SUBMIT_ANSWER_MAX_STATEMENTS
+以 before_cursor_execute 計數（同 services/db_metrics.py，交易控制不計），
+涵蓋同步評分、背景評分（放入佇列）與題庫追問（計入範本統計）三種寫入路徑。
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+from services import auth, llm
+
+
+class StubOpenAI:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        if "請只回 JSON" in messages[-1]["content"]:
+            content = '{"detail":0.7,"emotion":0.6,"reflection":0.5}'
+        else:
+            content = "那時候的你內心有什麼感受？這件事後來如何影響你的想法？"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class StatementCounter:
+    """只計算測試執行緒（即請求本身）的陳述式，背景 worker 不計"""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self.thread and not statement.startswith(("BEGIN", "COMMIT", "ROLLBACK")):
+            self.count += 1
+
+
+@pytest.fixture
+def stub_client(monkeypatch, client):
+    monkeypatch.setattr(llm, "_client", StubOpenAI())
+    return client
+
+
+@pytest.fixture
+def counter():
+    counter = StatementCounter()
+    event.listen(Engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(Engine, "before_cursor_execute", counter)
+
+
+@pytest.mark.parametrize("user_id, async_scoring, bank_fraction", [
+    (9001, False, 0.0),  # 同步評分 + LLM 追問
+    (9002, True, 0.0),   # LLM 分數交給佇列
+    (9003, True, 1.0),   # 全部由題庫追問，已知分數時立即記錄範本統計
+])
+def test_submit_answer_within_statement_budget(stub_client, counter, monkeypatch, user_id, async_scoring,
+                                               bank_fraction):
+    from routes.biography import SUBMIT_ANSWER_MAX_STATEMENTS
+
+    monkeypatch.setattr(config, "ASYNC_SCORING", async_scoring)
+    monkeypatch.setattr(config, "QUESTION_BANK_FRACTION", bank_fraction)
+    # 相近的回答會被本地預評分：LLM 路徑強制送 LLM / 佇列，題庫路徑則讓分數在提交時就已知
+    monkeypatch.setattr(config, "PRESCORE_CONFIDENCE", 0.5 if bank_fraction else 2.0)
+    headers = {"Authorization": f"Bearer {auth.issue_token(user_id)}"}
+
+    qid = stub_client.get("/biography/next-question", headers=headers).get_json()["question"]["id"]
+    counts = []
+    for i in range(8):
+        answer = (f"小時候住在台南，第 {i} 件難忘的事是和外婆清晨去市場買菜，"
+                  "她總是笑著和攤販聊天，那時我覺得很幸福，現在想起來才明白她的用心。")
+        counter.count = 0
+        rsp = stub_client.post("/biography/answer", json={"question_id": qid, "answer": answer}, headers=headers)
+        body = rsp.get_json()
+        assert rsp.status_code == 200, body
+        counts.append(counter.count)
+        if "question" not in body:
+            break
+        qid = body["question"]["id"]
+
+    assert 0 < min(counts) and max(counts) <= SUBMIT_ANSWER_MAX_STATEMENTS, counts
@@ -0,0 +1,48 @@
+# tests/test_worker_pool.py
+"""
+WorkerPool 輪詢行為
+--------------------------------------------------
+閒置輪詢只做唯讀的 has_work()；notify() 喚醒時直接 claim。
+"""
+import threading
+import time
+
+from services.worker_pool import WorkerPool
+
+
+class FakeQueue:
+    def __init__(self):
+        self.jobs = []
+        self.claims = 0
+        self.checks = 0
+        self.done = threading.Event()
+
+    def has_work(self):
+        self.checks += 1
+        return bool(self.jobs)
+
+    def claim(self):
+        self.claims += 1
+        return self.jobs.pop(0) if self.jobs else None
+
+    def process(self, job):
+        self.done.set()
+
+
+def test_idle_polls_are_read_only():
+    queue = FakeQueue()
+    pool = WorkerPool("test-idle", queue.claim, queue.process, has_work=queue.has_work, poll_interval=0.01)
+    pool.start(1)
+    time.sleep(0.2)
+    assert queue.checks > 5
+    assert queue.claims == 1  # 只有啟動時直接領取一次
+
+
+def test_notify_claims_without_checking():
+    queue = FakeQueue()
+    pool = WorkerPool("test-notify", queue.claim, queue.process, has_work=lambda: False, poll_interval=60)
+    pool.start(1)
+    time.sleep(0.05)
+    queue.jobs.append("job")
+    pool.notify()
+    assert queue.done.wait(2)